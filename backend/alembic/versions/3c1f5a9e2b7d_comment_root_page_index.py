@@ -0,0 +1,27 @@
+"""comment root page index
+
+Revision ID: 3c1f5a9e2b7d
+Revises: 904f38475767
+Create Date: 2026-10-18 09:12:44.318207
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c1f5a9e2b7d'
+down_revision: Union[str, None] = '904f38475767'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_comment_parent_id_created_at_id', 'comment', ['parent_id', 'created_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_comment_parent_id_created_at_id', table_name='comment')
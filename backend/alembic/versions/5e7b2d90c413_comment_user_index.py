@@ -0,0 +1,27 @@
+"""comment user index
+
+Revision ID: 5e7b2d90c413
+Revises: a81d4c6f9e20
+Create Date: 2026-10-18 11:40:05.207391
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5e7b2d90c413'
+down_revision: Union[str, None] = 'a81d4c6f9e20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_comment_user_id_created_at_id', 'comment', ['user_id', 'created_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_comment_user_id_created_at_id', table_name='comment')
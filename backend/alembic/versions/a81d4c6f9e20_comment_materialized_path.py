@@ -0,0 +1,85 @@
+"""comment materialized path
+
+Revision ID: a81d4c6f9e20
+Revises: 3c1f5a9e2b7d
+Create Date: 2026-10-18 10:02:17.554120
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a81d4c6f9e20'
+down_revision: Union[str, None] = '3c1f5a9e2b7d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BACKFILL_BATCH_SIZE = 5000
+
+comment = sa.table(
+    'comment',
+    sa.column('id', sa.Integer),
+    sa.column('parent_id', sa.Integer),
+    sa.column('path', sa.String),
+    sa.column('depth', sa.Integer),
+)
+
+
+def backfill_paths() -> None:
+    """Compute path and depth for existing comments.
+
+    Parents always have a smaller id than their replies, so walking the
+    table in id order sees every parent before its children. Comments
+    whose parent is missing become roots: their parent_id is reset to 0,
+    so root pages serve them.
+    """
+    bind = op.get_bind()
+    rows = bind.execute(
+        sa.select(comment.c.id, comment.c.parent_id).order_by(comment.c.id)
+    ).fetchall()
+    update = (
+        comment.update()
+        .where(comment.c.id == sa.bindparam('b_id'))
+        .values(
+            parent_id=sa.bindparam('b_parent_id'),
+            path=sa.bindparam('b_path'),
+            depth=sa.bindparam('b_depth'),
+        )
+    )
+    paths = {}
+    batch = []
+    for comment_id, parent_id in rows:
+        if parent_id not in paths:
+            parent_id = 0
+        parent_path, parent_depth = paths.get(parent_id, ('', -1))
+        path = f"{parent_path}{comment_id:010d}/"
+        paths[comment_id] = (path, parent_depth + 1)
+        batch.append({
+            'b_id': comment_id,
+            'b_parent_id': parent_id,
+            'b_path': path,
+            'b_depth': parent_depth + 1,
+        })
+        if len(batch) >= BACKFILL_BATCH_SIZE:
+            bind.execute(update, batch)
+            batch = []
+    if batch:
+        bind.execute(update, batch)
+
+
+def upgrade() -> None:
+    op.add_column('comment', sa.Column('path', sqlmodel.sql.sqltypes.AutoString(), nullable=False, server_default=''))
+    op.add_column('comment', sa.Column('depth', sa.Integer(), nullable=False, server_default='0'))
+    backfill_paths()
+    op.create_index('ix_comment_path_depth', 'comment', ['path', 'depth'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_comment_path_depth', table_name='comment')
+    with op.batch_alter_table('comment') as batch_op:
+        batch_op.drop_column('depth')
+        batch_op.drop_column('path')
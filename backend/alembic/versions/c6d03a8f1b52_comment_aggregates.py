@@ -0,0 +1,83 @@
+"""comment aggregates
+
+Revision ID: c6d03a8f1b52
+Revises: 5e7b2d90c413
+Create Date: 2026-10-18 14:21:46.318904
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c6d03a8f1b52'
+down_revision: Union[str, None] = '5e7b2d90c413'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BACKFILL_BATCH_SIZE = 1000
+
+comment = sa.table(
+    'comment',
+    sa.column('id', sa.Integer),
+    sa.column('parent_id', sa.Integer),
+    sa.column('path', sa.String),
+    sa.column('created_at', sa.DateTime),
+    sa.column('reply_count', sa.Integer),
+    sa.column('descendant_count', sa.Integer),
+    sa.column('last_activity_at', sa.DateTime),
+)
+
+
+def backfill_aggregates() -> None:
+    """Count the replies and descendants of existing comments.
+
+    Descendants share the comment's path as a prefix, so they fall in the
+    range [path, path with its trailing "/" replaced by "0"), which the
+    path index answers without walking the tree.
+    """
+    bind = op.get_bind()
+    below = comment.alias('below')
+    upper_bound = sa.func.substr(comment.c.path, 1, sa.func.length(comment.c.path) - 1) + '0'
+    recount = comment.update().values(
+        reply_count=sa.select(sa.func.count())
+        .where(below.c.parent_id == comment.c.id)
+        .scalar_subquery(),
+        descendant_count=sa.select(sa.func.count())
+        .where(below.c.path > comment.c.path, below.c.path < upper_bound)
+        .scalar_subquery(),
+        last_activity_at=sa.select(sa.func.max(below.c.created_at))
+        .where(below.c.path >= comment.c.path, below.c.path < upper_bound)
+        .scalar_subquery(),
+    )
+    last_id = -1
+    while True:
+        ids = bind.execute(
+            sa.select(comment.c.id)
+            .where(comment.c.id > last_id)
+            .order_by(comment.c.id)
+            .limit(BACKFILL_BATCH_SIZE)
+        ).scalars().all()
+        if not ids:
+            return
+        bind.execute(recount.where(comment.c.id.between(ids[0], ids[-1])))
+        last_id = ids[-1]
+
+
+def upgrade() -> None:
+    op.add_column('comment', sa.Column('reply_count', sa.Integer(), nullable=False, server_default='0'))
+    op.add_column('comment', sa.Column('descendant_count', sa.Integer(), nullable=False, server_default='0'))
+    op.add_column('comment', sa.Column('last_activity_at', sa.DateTime(), nullable=True))
+    backfill_aggregates()
+    with op.batch_alter_table('comment') as batch_op:
+        batch_op.alter_column('last_activity_at', existing_type=sa.DateTime(), nullable=False)
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('comment') as batch_op:
+        batch_op.drop_column('last_activity_at')
+        batch_op.drop_column('descendant_count')
+        batch_op.drop_column('reply_count')
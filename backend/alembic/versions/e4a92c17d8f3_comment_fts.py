@@ -0,0 +1,56 @@
+"""comment full-text search
+
+Revision ID: e4a92c17d8f3
+Revises: c6d03a8f1b52
+Create Date: 2026-10-18 16:05:31.842077
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4a92c17d8f3'
+down_revision: Union[str, None] = 'c6d03a8f1b52'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Same as COMMENT_FTS_DDL in app/database/models/comment.py
+FTS_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS comment_fts USING fts5(
+        content, content='comment', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS comment_fts_insert AFTER INSERT ON comment BEGIN
+        INSERT INTO comment_fts(rowid, content) VALUES (new.id, new.content);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS comment_fts_delete AFTER DELETE ON comment BEGIN
+        INSERT INTO comment_fts(comment_fts, rowid, content) VALUES ('delete', old.id, old.content);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS comment_fts_update AFTER UPDATE OF content ON comment BEGIN
+        INSERT INTO comment_fts(comment_fts, rowid, content) VALUES ('delete', old.id, old.content);
+        INSERT INTO comment_fts(rowid, content) VALUES (new.id, new.content);
+    END""",
+]
+
+
+def upgrade() -> None:
+    # Full-text search is only available on SQLite
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    for statement in FTS_DDL:
+        op.execute(statement)
+    # Index the comments that already exist
+    op.execute("INSERT INTO comment_fts(comment_fts) VALUES ('rebuild')")
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    op.execute("DROP TRIGGER IF EXISTS comment_fts_update")
+    op.execute("DROP TRIGGER IF EXISTS comment_fts_delete")
+    op.execute("DROP TRIGGER IF EXISTS comment_fts_insert")
+    op.execute("DROP TABLE IF EXISTS comment_fts")
@@ -0,0 +1,5 @@
+import time
+
+# When the app package was first imported, i.e. the start of app imports;
+# app.main reports startup phases relative to it
+IMPORT_STARTED = time.perf_counter()
@@ -0,0 +1,61 @@
+import asyncio
+import logging
+import tempfile
+
+from fastapi import APIRouter, Request
+from fastapi.responses import StreamingResponse
+
+from app.core.config import settings
+from app.database.models.comment import CommentImportResult
+from app.database.session import AsyncSessionLocal, engine
+from app.services.comment_transfer_service import (export_comments_async,
+                                                   import_comments)
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+# Uploads larger than this are spooled to disk instead of memory
+SPOOL_MAX_SIZE = 8 * 1024 * 1024
+# Upload chunks are collected up to this size and written on a worker
+# thread, so writes to the spooled file never block the event loop
+WRITE_BUFFER_SIZE = 1024 * 1024
+
+
+@router.get("/comments/export")
+async def export_all_comments():
+    # The request's own session is closed before the body is streamed,
+    # so the export opens a session that lives as long as the stream
+    async def lines():
+        async with AsyncSessionLocal() as db:
+            async for line in export_comments_async(db):
+                yield line
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+def _run_import(upload) -> CommentImportResult:
+    def progress(result: CommentImportResult) -> None:
+        logger.info(
+            "Comment import progress: %d imported, %d skipped, %d invalid",
+            result.imported, result.skipped, result.invalid,
+        )
+
+    upload.seek(0)
+    with engine.connect() as conn:
+        return import_comments(
+            conn, upload, settings.COMMENT_IMPORT_BATCH_SIZE, progress=progress
+        )
+
+
+@router.post("/comments/import", response_model=CommentImportResult)
+async def import_all_comments(request: Request):
+    with tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE) as upload:
+        buffered = bytearray()
+        async for chunk in request.stream():
+            buffered += chunk
+            if len(buffered) >= WRITE_BUFFER_SIZE:
+                await asyncio.to_thread(upload.write, buffered)
+                buffered.clear()
+        if buffered:
+            await asyncio.to_thread(upload.write, buffered)
+        return await asyncio.to_thread(_run_import, upload)
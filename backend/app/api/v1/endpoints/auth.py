@@ -2,20 +2,26 @@ from datetime import timedelta
 
 from fastapi import APIRouter, Depends, HTTPException, Response, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from app.core.security import authenticate_user, create_access_token
+from app.core.config import settings
+from app.core.rate_limit import limit_by_ip
+from app.core.security import authenticate_user_async, create_access_token
 from app.database.models.user import UserCreate
 from app.database.session import get_dbsession
-from app.services.user_service import create_user
+from app.services.user_service import create_user_async
 
 router = APIRouter()
 
 
-@router.post("/register")
-async def register(user_create: UserCreate, db: Session = Depends(get_dbsession)):
+@router.post(
+    "/register", dependencies=[Depends(limit_by_ip("register", settings.RATE_LIMIT_REGISTER))]
+)
+async def register(
+    user_create: UserCreate, db: AsyncSession = Depends(get_dbsession)
+):
     try:
-        _ = create_user(db, user_create)
+        _ = await create_user_async(db, user_create)
         return {"message": "User created successfully"}
     except HTTPException as e:
         raise e
@@ -23,18 +29,16 @@ async def register(user_create: UserCreate, db: Session = Depends(get_dbsession)
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
 
-@router.post("/login")
+@router.post(
+    "/login", dependencies=[Depends(limit_by_ip("login", settings.RATE_LIMIT_LOGIN))]
+)
 async def login(
     response: Response,
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_dbsession),
+    db: AsyncSession = Depends(get_dbsession),
 ):
-    # Try username first, then email
-    user = authenticate_user(db, form_data.username, form_data.password)
-    if not user:
-        user = authenticate_user(
-            db, form_data.username, form_data.password
-        )  # Try as email
+    # Matches either username or email in a single lookup
+    user = await authenticate_user_async(db, form_data.username, form_data.password)
 
     if not user:
         raise HTTPException(
@@ -1,27 +1,47 @@
-from typing import List
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Request, status
-from sqlmodel import Session
+import anyio
+from fastapi import (APIRouter, Depends, HTTPException, Query, Request,
+                     WebSocket, WebSocketDisconnect, status)
+from fastapi.responses import StreamingResponse
+from fastapi.websockets import WebSocketState
+from sqlmodel.ext.asyncio.session import AsyncSession
+from starlette.background import BackgroundTask
 
+from app.core.broker import Subscription, SubscriptionClosed
+from app.core.config import settings
+from app.core.rate_limit import limit_by_user
 from app.core.security import get_current_user
-from app.database.models.comment import Comment, CommentCreate, CommentResponse
-from app.database.models.user import User
-from app.database.session import get_dbsession
-from app.services.comment_service import (create_comment, get_comment,
-                                          get_comments_tree)
+from app.database.models.comment import (Comment, CommentCreate,
+                                         CommentFlatResponse, CommentResponse)
+from app.database.models.user import UserSnapshot
+from app.database.session import AsyncSessionLocal, get_dbsession
+from app.services.comment_search_service import search_comments_async
+from app.services.comment_service import (comment_feed, create_comment_async,
+                                          get_ancestors_async,
+                                          get_comment_async,
+                                          get_comments_page_async,
+                                          get_root_paths_page_async,
+                                          stream_comment_subtrees)
+from app.utils.encoders import (FastJSONResponse, comment_flat_dicts,
+                                comment_tree_dicts, dumps)
 
 router = APIRouter()
 
 
-@router.post("/", response_model=Comment)
+@router.post(
+    "/",
+    response_model=Comment,
+    dependencies=[Depends(limit_by_user("comment_create", settings.RATE_LIMIT_COMMENT_CREATE))],
+)
 async def create_new_comment(
     request: Request,
     comment_create: CommentCreate,
-    db: Session = Depends(get_dbsession),
-    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_dbsession),
+    current_user: UserSnapshot = Depends(get_current_user),
 ):
     try:
-        return create_comment(db, comment_create, current_user.id)
+        return await create_comment_async(db, comment_create, current_user.id)
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
@@ -29,21 +49,192 @@ async def create_new_comment(
 @router.get("/", response_model=List[CommentResponse])
 async def get_all_comments(
     request: Request,
-    db: Session = Depends(get_dbsession),
+    limit: int = Query(
+        settings.COMMENT_PAGE_SIZE, ge=1, le=settings.COMMENT_PAGE_SIZE_MAX
+    ),
+    cursor: Optional[str] = None,
+    max_depth: Optional[int] = Query(None, ge=0),
+    response_format: str = Query("json", alias="format", pattern="^(json|ndjson)$"),
+    db: AsyncSession = Depends(get_dbsession),
 ):
-    return get_comments_tree(db)
+    """Return one page of root comments with their replies.
+
+    The cursor for the next page is sent in the X-Next-Cursor header.
+    With format=ndjson the page is streamed as one flat comment per line,
+    each root followed by its replies, parents before children.
+    max_depth limits how deep replies are loaded; with max_depth=0 only the
+    roots are returned, and their reply_count and descendant_count are
+    enough to render collapsed threads.
+    """
+    if response_format == "ndjson":
+        return await _stream_comments_page(limit, cursor, max_depth, db)
+    try:
+        roots, next_cursor = await get_comments_page_async(db, limit, cursor, max_depth)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+    return FastJSONResponse(comment_tree_dicts(roots), headers=headers)
+
+
+async def _stream_comments_page(
+    limit: int, cursor: Optional[str], max_depth: Optional[int], db: AsyncSession
+) -> StreamingResponse:
+    try:
+        root_paths, next_cursor = await get_root_paths_page_async(db, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    # The request's session is closed before the body is sent, so the
+    # stream reads through a session of its own
+    async def lines():
+        async with AsyncSessionLocal() as stream_db:
+            async for comment in stream_comment_subtrees(
+                stream_db, root_paths, max_depth=max_depth
+            ):
+                yield dumps(comment) + b"\n"
+
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+    return StreamingResponse(lines(), media_type="application/x-ndjson", headers=headers)
+
+
+@router.get("/search", response_model=List[CommentFlatResponse])
+async def search_all_comments(
+    request: Request,
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(
+        settings.COMMENT_PAGE_SIZE, ge=1, le=settings.COMMENT_PAGE_SIZE_MAX
+    ),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_dbsession),
+):
+    """Return comments containing every word of `q`, best matches first.
+
+    A word ending in * matches any word starting with it. The cursor for
+    the next page is sent in the X-Next-Cursor header.
+    """
+    try:
+        results, next_cursor = await search_comments_async(db, q, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except NotImplementedError as e:
+        raise HTTPException(status_code=status.HTTP_501_NOT_IMPLEMENTED, detail=str(e))
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+    return FastJSONResponse(results, headers=headers)
+
+
+def _subscribe_to_feed() -> Subscription:
+    # Subscribing is the capacity check itself, so concurrent connects can
+    # never get past a separate check and then fail once the stream started
+    try:
+        return comment_feed.subscribe()
+    except OverflowError:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many live feed subscribers",
+            headers={"Retry-After": "5"},
+        )
+
+
+@router.get("/feed")
+async def get_comment_feed(request: Request):
+    """Server-Sent Events stream of new comments as they are created.
+
+    Every `comment` event carries one comment as CommentFlatResponse JSON.
+    Clients that fall too far behind are disconnected; EventSource then
+    reconnects on its own.
+    """
+    subscription = _subscribe_to_feed()
+
+    async def events():
+        try:
+            yield "retry: 5000\n\n"
+            while True:
+                message = await subscription.next(
+                    timeout=settings.COMMENT_FEED_KEEPALIVE_SECONDS
+                )
+                if message is None:
+                    yield ": keep-alive\n\n"
+                else:
+                    yield f"event: comment\ndata: {message}\n\n"
+        except SubscriptionClosed:
+            pass
+        finally:
+            subscription.close()
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        # Also releases the subscription if the body was never iterated
+        background=BackgroundTask(subscription.close),
+    )
+
+
+@router.websocket("/feed/ws")
+async def comment_feed_websocket(websocket: WebSocket):
+    """WebSocket variant of the live feed, one comment JSON per text message"""
+    try:
+        subscription = comment_feed.subscribe()
+    except OverflowError:
+        await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER)
+        return
+
+    async def watch_disconnect() -> None:
+        # Clients are not expected to send anything; this only notices them leaving
+        try:
+            while True:
+                await websocket.receive_text()
+        except WebSocketDisconnect:
+            pass
+        subscription.close()
+
+    try:
+        await websocket.accept()
+        async with anyio.create_task_group() as tg:
+            tg.start_soon(watch_disconnect)
+            try:
+                while True:
+                    message = await subscription.next()
+                    await websocket.send_text(message)
+            except SubscriptionClosed:
+                if subscription.evicted:
+                    await websocket.close(
+                        code=status.WS_1013_TRY_AGAIN_LATER, reason="Slow consumer"
+                    )
+                elif websocket.client_state == WebSocketState.CONNECTED:
+                    # The feed was closed because the server is shutting down
+                    await websocket.close(code=status.WS_1001_GOING_AWAY)
+            tg.cancel_scope.cancel()
+    finally:
+        subscription.close()
 
 
 @router.get("/{comment_id}", response_model=CommentResponse)
 async def get_single_comment(
     request: Request,
     comment_id: int,
-    db: Session = Depends(get_dbsession),
-    # current_user: User = Depends(get_current_user),
+    max_depth: Optional[int] = Query(None, ge=0),
+    db: AsyncSession = Depends(get_dbsession),
+    # current_user: UserSnapshot = Depends(get_current_user),
 ):
-    comment = get_comment(db, comment_id)
+    comment = await get_comment_async(db, comment_id, max_depth=max_depth)
     if not comment:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Comment not found"
         )
-    return comment
+    return FastJSONResponse(comment_tree_dicts([comment])[0])
+
+
+@router.get("/{comment_id}/ancestors", response_model=List[CommentFlatResponse])
+async def get_comment_ancestors(
+    request: Request,
+    comment_id: int,
+    db: AsyncSession = Depends(get_dbsession),
+):
+    """Return the comments above a comment, root first"""
+    ancestors = await get_ancestors_async(db, comment_id)
+    if ancestors is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Comment not found"
+        )
+    return FastJSONResponse(comment_flat_dicts(ancestors))
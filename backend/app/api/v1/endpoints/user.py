@@ -1,15 +1,69 @@
-from typing import Annotated
+from typing import Annotated, List, Optional
 
-from fastapi import APIRouter, Depends, Request
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from sqlmodel.ext.asyncio.session import AsyncSession
 
+from app.core.config import settings
 from app.core.security import get_current_user
-from app.database.models.user import User
+from app.database.models.comment import CommentHistoryResponse
+from app.database.models.user import UserSnapshot
+from app.database.session import get_dbsession
+from app.services.comment_service import get_user_comments_page_async
+from app.services.user_service import get_user_by_username_async
+from app.utils.encoders import FastJSONResponse
 
 router = APIRouter()
 
 
 @router.get("/me")
 async def read_current_user(
-    request: Request, current_user: Annotated[User, Depends(get_current_user)]
+    request: Request, current_user: Annotated[UserSnapshot, Depends(get_current_user)]
 ):
     return {"username": current_user.username, "email": current_user.email}
+
+
+async def _user_comments_response(
+    db: AsyncSession, user_id: int, limit: int, cursor: Optional[str]
+) -> FastJSONResponse:
+    try:
+        comments, next_cursor = await get_user_comments_page_async(db, user_id, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+    return FastJSONResponse(comments, headers=headers)
+
+
+# Declared before /{username}/comments so "me" is not taken for a username
+@router.get("/me/comments", response_model=List[CommentHistoryResponse])
+async def read_current_user_comments(
+    request: Request,
+    current_user: Annotated[UserSnapshot, Depends(get_current_user)],
+    limit: int = Query(
+        settings.COMMENT_PAGE_SIZE, ge=1, le=settings.COMMENT_PAGE_SIZE_MAX
+    ),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_dbsession),
+):
+    """Return one page of the current user's comments, newest first.
+
+    Replies carry a summary of the comment they answer in `parent`. The
+    cursor for the next page is sent in the X-Next-Cursor header.
+    """
+    return await _user_comments_response(db, current_user.id, limit, cursor)
+
+
+@router.get("/{username}/comments", response_model=List[CommentHistoryResponse])
+async def read_user_comments(
+    request: Request,
+    username: str,
+    limit: int = Query(
+        settings.COMMENT_PAGE_SIZE, ge=1, le=settings.COMMENT_PAGE_SIZE_MAX
+    ),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_dbsession),
+):
+    """Return one page of a user's comments, newest first, like /me/comments"""
+    user = await get_user_by_username_async(db, username)
+    if user is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+    return await _user_comments_response(db, user.id, limit, cursor)
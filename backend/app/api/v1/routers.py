@@ -1,8 +1,8 @@
 """API router configuration - defines all API endpoints and their security requirements"""
 from fastapi import APIRouter, Depends
 
-from app.api.v1.endpoints import auth, comment, user
-from app.core.security import get_current_user
+from app.api.v1.endpoints import admin, auth, comment, user
+from app.core.security import get_current_admin, get_current_user
 
 # Main router instance that will be included in the FastAPI app
 api_router = APIRouter()
@@ -23,3 +23,10 @@ api_router.include_router(
 api_router.include_router(
     user.router, prefix="/user", tags=["user"], dependencies=[Depends(get_current_user)]
 )
+# Admin routes require a user listed in ADMIN_USERNAMES
+api_router.include_router(
+    admin.router,
+    prefix="/admin",
+    tags=["admin"],
+    dependencies=[Depends(get_current_admin)],
+)
@@ -0,0 +1,121 @@
+"""In-process publish/subscribe for live updates"""
+import asyncio
+from typing import Dict, Optional, Set
+
+_CLOSED = object()
+
+
+class SubscriptionClosed(Exception):
+    """The subscription was closed, by the subscriber or the broker"""
+
+
+class Subscription:
+    """One subscriber's bounded queue of pending messages
+
+    A subscriber that lets its queue fill up is evicted by the broker; its
+    `evicted` flag is then set and the next read raises SubscriptionClosed.
+    """
+
+    def __init__(self, broker: "Broker", maxsize: int):
+        self.evicted = False
+        self._broker = broker
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize)
+
+    async def next(self, timeout: Optional[float] = None) -> Optional[str]:
+        """Wait for the next message, or return None once `timeout` passes
+
+        Raises:
+            SubscriptionClosed: If the subscription was closed or evicted
+        """
+        try:
+            message = await asyncio.wait_for(self._queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        if message is _CLOSED:
+            # Leave the marker in place for any later read
+            self._queue.put_nowait(_CLOSED)
+            raise SubscriptionClosed()
+        return message
+
+    def close(self) -> None:
+        self._broker.unsubscribe(self)
+
+    def _offer(self, message: str) -> bool:
+        try:
+            self._queue.put_nowait(message)
+            return True
+        except asyncio.QueueFull:
+            return False
+
+    def _terminate(self) -> None:
+        # Pending messages are dropped so the marker always fits
+        while not self._queue.empty():
+            self._queue.get_nowait()
+        self._queue.put_nowait(_CLOSED)
+
+
+class Broker:
+    """Fan messages out to every current subscriber
+
+    Publishing never waits: each subscriber has a queue of at most
+    `queue_size` messages and one that falls behind is evicted instead of
+    slowing everyone else down. An idle subscriber is just an empty queue
+    and a waiting task. All methods must be called from the event loop.
+    """
+
+    def __init__(self, queue_size: int, max_subscribers: int):
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self.published = 0
+        self.evicted = 0
+        self._subscribers: Set[Subscription] = set()
+
+    @property
+    def subscribers(self) -> int:
+        return len(self._subscribers)
+
+    def subscribe(self) -> Subscription:
+        """Register a new subscriber
+
+        Raises:
+            OverflowError: If max_subscribers are already connected
+        """
+        if len(self._subscribers) >= self.max_subscribers:
+            raise OverflowError("Too many subscribers")
+        subscription = Subscription(self, self.queue_size)
+        self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        if subscription in self._subscribers:
+            self._subscribers.discard(subscription)
+            subscription._terminate()
+
+    def publish(self, message: str) -> int:
+        """Queue `message` for every subscriber, evicting those that are full
+
+        Returns:
+            The number of subscribers the message was queued for
+        """
+        self.published += 1
+        delivered = 0
+        for subscription in list(self._subscribers):
+            if subscription._offer(message):
+                delivered += 1
+            else:
+                subscription.evicted = True
+                self.evicted += 1
+                self.unsubscribe(subscription)
+        return delivered
+
+    def close(self) -> None:
+        """Close every subscription, e.g. on shutdown"""
+        for subscription in list(self._subscribers):
+            self.unsubscribe(subscription)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "subscribers": self.subscribers,
+            "published": self.published,
+            "evicted": self.evicted,
+        }
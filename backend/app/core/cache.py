@@ -0,0 +1,107 @@
+"""Small in-process caches"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Set
+
+
+class TTLCache:
+    """Size-bounded LRU cache whose entries also expire after a TTL.
+
+    Lookups move an entry to the most recently used end; inserting past
+    `maxsize` evicts from the least recently used end. A `maxsize` of 0
+    disables the cache. Safe to share between threads.
+
+    Entries may be stored under a group (e.g. the user they belong to) so
+    that invalidate_group drops all of them without scanning the cache.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+        self._groups: Dict[Hashable, Set[Hashable]] = {}
+        self._group_of: Dict[Hashable, Hashable] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                if entry is not None:
+                    self._remove(key)
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(
+        self,
+        key: Hashable,
+        value: Any,
+        ttl: Optional[float] = None,
+        group: Optional[Hashable] = None,
+    ) -> None:
+        """Store `value`, expiring after `ttl` seconds (capped at the cache TTL)"""
+        if self.maxsize <= 0:
+            return
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._remove(key)
+            self._data[key] = (time.monotonic() + ttl, value)
+            if group is not None:
+                self._groups.setdefault(group, set()).add(key)
+                self._group_of[key] = group
+            while len(self._data) > self.maxsize:
+                self._remove(next(iter(self._data)))
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            self._remove(key)
+
+    def invalidate_group(self, group: Hashable) -> int:
+        """Drop every entry stored under `group`, returning the count"""
+        with self._lock:
+            keys = list(self._groups.get(group, ()))
+            for key in keys:
+                self._remove(key)
+            return len(keys)
+
+    def invalidate_if(self, predicate: Callable[[Any], bool]) -> int:
+        """Drop every entry whose value matches `predicate`, returning the count"""
+        with self._lock:
+            keys = [key for key, (_, value) in self._data.items() if predicate(value)]
+            for key in keys:
+                self._remove(key)
+            return len(keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._groups.clear()
+            self._group_of.clear()
+
+    def _remove(self, key: Hashable) -> None:
+        """Drop `key` and its group membership; the lock must be held"""
+        if self._data.pop(key, None) is None:
+            return
+        group = self._group_of.pop(key, None)
+        if group is not None:
+            keys = self._groups[group]
+            keys.discard(key)
+            if not keys:
+                del self._groups[group]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+            }
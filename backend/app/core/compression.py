@@ -0,0 +1,223 @@
+"""On-the-fly compression of API responses
+
+Comment trees are large and repetitive (every node repeats its user), so
+they shrink by an order of magnitude under gzip or brotli. The middleware
+compresses a response when:
+
+- the client accepts one of the configured encodings,
+- its media type matches a content-type rule (the rule may set its own
+  level, e.g. "application/x-ndjson=1"),
+- it is not already encoded, partial, or marked Cache-Control: no-transform,
+- and the body reaches `min_size` bytes.
+
+Streaming responses are compressed chunk by chunk without buffering the
+whole body; only the first `min_size` bytes are held back to decide
+whether compressing is worth it. Every chunk is flushed, so a client sees
+each NDJSON line as soon as the app yields it rather than at the end of
+the stream; the flush costs a few bytes per chunk.
+"""
+import zlib
+from typing import Dict, Optional, Sequence
+
+from starlette.datastructures import Headers, MutableHeaders
+
+from app.utils.http import accepted_encodings
+
+try:
+    import brotli
+except ImportError:  # Optional; without it only gzip is offered
+    brotli = None
+
+# Statuses whose bodies are never compressed
+SKIP_STATUSES = {204, 206, 304}
+
+
+def parse_content_type_rules(rules: str) -> Dict[str, Optional[int]]:
+    """Parse "application/json, application/x-ndjson=1, text/*" into
+    {media type: level}, where None means the default level"""
+    parsed = {}
+    for rule in rules.split(","):
+        media_type, _, level = rule.strip().partition("=")
+        if media_type:
+            parsed[media_type.strip().lower()] = int(level) if level.strip() else None
+    return parsed
+
+
+class _Gzip:
+    def __init__(self, level: int):
+        # wbits 31: gzip header and trailer rather than a raw zlib stream
+        self._compressor = zlib.compressobj(min(level, 9), zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+class _Brotli:
+    def __init__(self, level: int):
+        # Qualities 0 and 1 compress every process() call as a block of
+        # its own, which makes line-by-line streams barely smaller at all
+        self._compressor = brotli.Compressor(quality=max(2, min(level, 11)))
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush()
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+COMPRESSORS = {"gzip": _Gzip}
+if brotli is not None:
+    COMPRESSORS["br"] = _Brotli
+
+
+class CompressionMiddleware:
+    """ASGI middleware compressing eligible responses
+
+    Args:
+        min_size: Bodies smaller than this many bytes are sent as is
+        level: Compression level used by rules without their own (1-9 for
+            gzip; brotli uses it as its quality, from 2 up to 11)
+        content_types: Media type rules, see parse_content_type_rules;
+            "type/*" matches a whole family
+        encodings: Supported encodings in order of preference
+    """
+
+    def __init__(
+        self,
+        app,
+        min_size: int = 1024,
+        level: int = 6,
+        content_types: str = "application/json",
+        encodings: Sequence[str] = ("gzip",),
+    ):
+        self.app = app
+        self.min_size = min_size
+        self.level = level
+        self.rules = parse_content_type_rules(content_types)
+        self.encodings = [encoding for encoding in encodings if encoding in COMPRESSORS]
+
+    def _level_for(self, content_type: str) -> Optional[int]:
+        """Level for a Content-Type value, or None if it is not compressed"""
+        media_type = content_type.partition(";")[0].strip().lower()
+        for key in (media_type, media_type.partition("/")[0] + "/*"):
+            if key in self.rules:
+                level = self.rules[key]
+                return self.level if level is None else level
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.encodings:
+            await self.app(scope, receive, send)
+            return
+        accepted = accepted_encodings(Headers(scope=scope).get("accept-encoding", ""))
+        encoding = next((e for e in self.encodings if e in accepted), None)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        responder = _CompressingResponder(self, encoding, send)
+        await self.app(scope, receive, responder.send)
+
+
+class _CompressingResponder:
+    """Per-response state: holds back the start message and the first
+    `min_size` bytes until it is known whether to compress"""
+
+    def __init__(self, middleware: CompressionMiddleware, encoding: str, send):
+        self.middleware = middleware
+        self.encoding = encoding
+        self.downstream = send
+        self.start_message = None
+        self.level = None
+        self.buffer = b""
+        self.compressor = None
+
+    async def send(self, message) -> None:
+        message_type = message["type"]
+        if message_type == "http.response.start":
+            headers = Headers(raw=message["headers"])
+            self.level = self._eligible_level(message["status"], headers)
+            if self.level is None:
+                await self.downstream(message)
+            else:
+                self.start_message = message
+            return
+
+        if message_type != "http.response.body" or self.level is None:
+            await self._release()
+            await self.downstream(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.compressor is not None:
+            compressed = self._compress(body, more_body)
+            if compressed or not more_body:
+                await self.downstream(
+                    {"type": "http.response.body", "body": compressed, "more_body": more_body}
+                )
+            return
+
+        self.buffer += body
+        if len(self.buffer) < self.middleware.min_size:
+            if more_body:
+                return
+            # Too small to be worth it
+            body, self.buffer = self.buffer, b""
+            await self._release()
+            await self.downstream({"type": "http.response.body", "body": body, "more_body": False})
+            return
+
+        self.compressor = COMPRESSORS[self.encoding](self.level)
+        compressed = self._compress(self.buffer, more_body)
+        self.buffer = b""
+        await self._send_start(len(compressed) if not more_body else None)
+        await self.downstream({"type": "http.response.body", "body": compressed, "more_body": more_body})
+
+    def _compress(self, body: bytes, more_body: bool) -> bytes:
+        compressed = self.compressor.compress(body)
+        if not more_body:
+            return compressed + self.compressor.finish()
+        # Flushing with nothing new would still emit an empty block
+        if body:
+            compressed += self.compressor.flush()
+        return compressed
+
+    def _eligible_level(self, status: int, headers: Headers) -> Optional[int]:
+        if status < 200 or status in SKIP_STATUSES or "content-encoding" in headers:
+            return None
+        if "no-transform" in headers.get("cache-control", "").lower():
+            return None
+        return self.middleware._level_for(headers.get("content-type", ""))
+
+    async def _send_start(self, content_length: Optional[int]) -> None:
+        message, self.start_message = self.start_message, None
+        headers = MutableHeaders(raw=message["headers"])
+        headers["Content-Encoding"] = self.encoding
+        headers.add_vary_header("Accept-Encoding")
+        if content_length is None:
+            del headers["Content-Length"]
+        else:
+            headers["Content-Length"] = str(content_length)
+        await self.downstream(message)
+
+    async def _release(self) -> None:
+        """Send the held start message and buffered bytes uncompressed"""
+        if self.start_message is None:
+            return
+        message, self.start_message = self.start_message, None
+        MutableHeaders(raw=message["headers"]).add_vary_header("Accept-Encoding")
+        await self.downstream(message)
+        if self.buffer:
+            body, self.buffer = self.buffer, b""
+            await self.downstream({"type": "http.response.body", "body": body, "more_body": True})
+        self.level = None
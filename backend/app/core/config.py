@@ -12,22 +12,144 @@ class Settings(BaseSettings):
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_DAYS: int = 30
 
+    # Server (python -m app.main, see app/server.py). WORKERS 0 starts one
+    # per CPU core; each has its own live feed, metrics and caches. Workers
+    # restart after MAX_REQUESTS (0: never) plus up to MAX_REQUESTS_JITTER
+    # requests, and get GRACEFUL_TIMEOUT_SECONDS to finish on shutdown.
+    SERVER_HOST: str = "0.0.0.0"
+    SERVER_PORT: int = 8000
+    SERVER_WORKERS: int = 1
+    SERVER_BACKLOG: int = 2048
+    SERVER_KEEPALIVE_SECONDS: int = 5
+    SERVER_MAX_REQUESTS: int = 0
+    SERVER_MAX_REQUESTS_JITTER: int = 0
+    SERVER_GRACEFUL_TIMEOUT_SECONDS: int = 30
+
     LOG_LEVEL: str = "INFO"
+    # "text" or "json" (one object per line)
+    LOG_FORMAT: str = "text"
+    # File, function and line of every log call; costs a stack walk per record
+    LOG_CALLER_INFO: bool = True
+    # Records are written by a background thread through a queue of this
+    # size; when it is full new records are dropped and counted. 0 writes
+    # synchronously instead.
+    LOG_QUEUE_SIZE: int = 10000
+    # Fraction of successful (< 400) access log lines to keep
+    LOG_ACCESS_SAMPLE_RATE: float = 1.0
     DEBUG: bool = False
     ALLOWED_ORIGINS: str = "http://localhost:8000"
     TEST_DATABASE_URL: str = "sqlite:///./test.db"
 
+    # Comma-separated usernames allowed on the /admin endpoints
+    ADMIN_USERNAMES: str = ""
+
+    # Rows per transaction for the bulk comment import
+    COMMENT_IMPORT_BATCH_SIZE: int = 1000
+
+    # Static frontend and Swagger assets. Text files get .gz/.br variants
+    # written next to them at startup (or by scripts/precompress_static.py);
+    # bodies up to MAX_FILE_SIZE are kept in an LRU of CACHE_ENTRIES files.
+    STATIC_PRECOMPRESS: bool = True
+    STATIC_CACHE_ENTRIES: int = 256
+    STATIC_CACHE_MAX_FILE_SIZE: int = 65536
+
+    # Compression of API responses (see app/core/compression.py). Rules are
+    # comma-separated media types, "type/*" for a family, optionally with
+    # their own level ("application/x-ndjson=2"). Level 4 was the best
+    # size/CPU balance for comment trees in benchmarks/bench_compression.py.
+    COMPRESSION_ENABLED: bool = True
+    COMPRESSION_MIN_SIZE: int = 1024
+    COMPRESSION_LEVEL: int = 4
+    COMPRESSION_ENCODINGS: str = "br,gzip"
+    COMPRESSION_CONTENT_TYPES: str = (
+        "application/json,application/x-ndjson,text/html,text/css,text/plain,"
+        "text/javascript,application/javascript,image/svg+xml"
+    )
+
+    # Serve request and database metrics on /metrics (Prometheus format)
+    METRICS_ENABLED: bool = True
+
+    # SQL profiler, active in the dev environment. Logs statements repeated
+    # REPEAT_THRESHOLD times in one request (likely N+1) and slow statements.
+    QUERY_PROFILER_ENABLED: bool = True
+    QUERY_PROFILER_REPEAT_THRESHOLD: int = 5
+    QUERY_PROFILER_SLOW_MS: float = 100
+
+    # Engine and connection pool. DB_POOL_WARMUP connections (at most
+    # DB_POOL_SIZE) are opened during startup.
+    DB_ECHO: bool = False
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: int = 30
+    DB_POOL_PRE_PING: bool = False
+    DB_POOL_RECYCLE: int = -1
+    DB_POOL_WARMUP: int = 2
+
+    # SQLite pragmas applied to every new connection. WAL lets readers run
+    # alongside the single writer; busy_timeout makes writers wait for the
+    # lock instead of failing with "database is locked".
+    SQLITE_JOURNAL_MODE: str = "WAL"
+    SQLITE_SYNCHRONOUS: str = "NORMAL"
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+    SQLITE_CACHE_SIZE: int = -64000  # Negative values are KiB, i.e. 64 MB
+    SQLITE_MMAP_SIZE: int = 268435456
+
+    # Number of root comments per page on GET /comments
+    COMMENT_PAGE_SIZE: int = 20
+    COMMENT_PAGE_SIZE_MAX: int = 100
+
+    # Full-text comment search (GET /comments/search) ranks at most the
+    # newest MAX_CANDIDATES matches of a query, which bounds the cost of
+    # very common words on large tables. 0 ranks every match.
+    COMMENT_SEARCH_MAX_CANDIDATES: int = 10000
+
+    # Live comment feed. Each subscriber may fall QUEUE_SIZE comments behind
+    # before it is disconnected; idle streams get a keep-alive comment.
+    COMMENT_FEED_QUEUE_SIZE: int = 64
+    COMMENT_FEED_MAX_SUBSCRIBERS: int = 10000
+    COMMENT_FEED_KEEPALIVE_SECONDS: int = 15
+
+    # bcrypt cost factor (2^ROUNDS iterations). Pick it for this hardware
+    # with scripts/calibrate_bcrypt.py; stored hashes with another cost are
+    # rehashed on the next successful login.
+    BCRYPT_ROUNDS: int = 12
+
+    # Password hashing pool - bcrypt runs here instead of on the event loop.
+    # "thread" is enough since bcrypt releases the GIL; "process" isolates it
+    # completely. Requests beyond MAX_PENDING (running + queued) get a 503.
+    PASSWORD_HASH_EXECUTOR: str = "thread"
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_MAX_PENDING: int = 32
+
+    # Token bucket rate limits, "<count>/<second|minute|hour|day>" (empty:
+    # none). Login and register are limited per client IP, comment writes
+    # per user. Buckets for at most MAX_KEYS clients are kept per limit.
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_LOGIN: str = "10/minute"
+    RATE_LIMIT_REGISTER: str = "5/minute"
+    RATE_LIMIT_COMMENT_CREATE: str = "30/minute"
+    RATE_LIMIT_MAX_KEYS: int = 100000
+
+    # Verified tokens and the user they belong to are cached per worker, so
+    # authenticated requests skip jwt.decode and the user lookup. Set the
+    # size to 0 to disable.
+    AUTH_CACHE_SIZE: int = 10000
+    AUTH_CACHE_TTL_SECONDS: int = 60
+
     class Config:
         env_file = os.path.join(str(Path(__file__).parent.parent.parent), ".env")
         case_sensitive = True  # Enforce exact case matching
         env_file_encoding = "utf-8"
 
 
-if not os.path.exists(Settings.Config.env_file):
-    import warnings
+def warn_if_env_file_missing() -> None:
+    """Warn when running without a .env file; called at startup, not on import"""
+    if not os.path.exists(Settings.Config.env_file):
+        import warnings
+
+        warnings.warn(
+            f".env file not found at {Settings.Config.env_file}. Using default settings."
+        )
 
-    warnings.warn(
-        f".env file not found at {Settings.Config.env_file}. Using default settings."
-    )
 
 settings = Settings()
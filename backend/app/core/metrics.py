@@ -0,0 +1,234 @@
+"""Request and database metrics, exposed in the Prometheus text format
+
+MetricsMiddleware times every HTTP request and records it under the route
+template (e.g. /api/v1/comments/{comment_id}), never the raw path, so the
+number of series stays bounded. SQL statements are counted per request by
+engine events that add to a context-local RequestStats; outside a request
+the events only do a context variable lookup.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    """Bucketed observations with their sum and count"""
+
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # The last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class RequestStats:
+    """SQL work done while serving one request"""
+
+    __slots__ = ("statements", "seconds")
+
+    def __init__(self):
+        self.statements = 0
+        self.seconds = 0.0
+
+
+request_stats: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+def _format_labels(labels: Labels, extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in labels]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class MetricsRegistry:
+    """Counters, gauges and histograms keyed by metric name and labels"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._help: Dict[str, Tuple[str, str]] = {}
+        self._counters: Dict[str, Dict[Labels, float]] = {}
+        self._gauges: Dict[str, Dict[Labels, float]] = {}
+        self._histograms: Dict[str, Dict[Labels, Histogram]] = {}
+        self._buckets: Dict[str, Tuple[float, ...]] = {}
+        self._callbacks: Dict[str, Callable[[], float]] = {}
+
+    def counter(self, name: str, help_text: str, callback: Optional[Callable[[], float]] = None) -> None:
+        """Declare a counter; with `callback` its value is read at scrape time"""
+        self._help[name] = ("counter", help_text)
+        self._counters.setdefault(name, {})
+        if callback is not None:
+            self._callbacks[name] = callback
+
+    def gauge(self, name: str, help_text: str, callback: Optional[Callable[[], float]] = None) -> None:
+        """Declare a gauge; with `callback` its value is read at scrape time"""
+        self._help[name] = ("gauge", help_text)
+        self._gauges.setdefault(name, {})
+        if callback is not None:
+            self._callbacks[name] = callback
+
+    def histogram(self, name: str, help_text: str, buckets: Tuple[float, ...]) -> None:
+        self._help[name] = ("histogram", help_text)
+        self._histograms.setdefault(name, {})
+        self._buckets[name] = buckets
+
+    def inc(self, name: str, labels: Labels = (), amount: float = 1) -> None:
+        with self._lock:
+            series = self._counters[name]
+            series[labels] = series.get(labels, 0) + amount
+
+    def add(self, name: str, amount: float, labels: Labels = ()) -> None:
+        """Move a gauge up or down by `amount`"""
+        with self._lock:
+            series = self._gauges[name]
+            series[labels] = series.get(labels, 0) + amount
+
+    def set(self, name: str, value: float, labels: Labels = ()) -> None:
+        """Set a gauge to `value`"""
+        with self._lock:
+            self._gauges[name][labels] = value
+
+    def observe(self, name: str, value: float, labels: Labels = ()) -> None:
+        with self._lock:
+            series = self._histograms[name]
+            histogram = series.get(labels)
+            if histogram is None:
+                histogram = series[labels] = Histogram(self._buckets[name])
+            histogram.observe(value)
+
+    def render(self) -> str:
+        """Return every metric in the Prometheus text exposition format"""
+        lines: List[str] = []
+        with self._lock:
+            for name, (kind, help_text) in self._help.items():
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                if kind in ("counter", "gauge"):
+                    series = dict((self._counters if kind == "counter" else self._gauges)[name])
+                    if name in self._callbacks:
+                        series[()] = self._callbacks[name]()
+                    for labels, value in series.items():
+                        lines.append(f"{name}{_format_labels(labels)} {_format_number(value)}")
+                else:
+                    for labels, histogram in self._histograms[name].items():
+                        cumulative = 0
+                        bounds = histogram.buckets + (float("inf"),)
+                        for bound, count in zip(bounds, histogram.counts):
+                            cumulative += count
+                            le = f'le="{_format_number(bound)}"'
+                            lines.append(f"{name}_bucket{_format_labels(labels, le)} {cumulative}")
+                        lines.append(f"{name}_sum{_format_labels(labels)} {_format_number(histogram.sum)}")
+                        lines.append(f"{name}_count{_format_labels(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+metrics.counter("http_requests_total", "HTTP requests by route and status code")
+metrics.gauge("http_requests_in_flight", "HTTP requests currently being served")
+metrics.histogram(
+    "http_request_duration_seconds", "Time to serve a request, to the last body byte", LATENCY_BUCKETS
+)
+metrics.histogram("http_response_size_bytes", "Response body size", SIZE_BUCKETS)
+metrics.histogram("db_statements_per_request", "SQL statements executed per request", STATEMENT_BUCKETS)
+metrics.histogram("db_duration_seconds_per_request", "Time spent in SQL per request", LATENCY_BUCKETS)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if request_stats.get() is not None:
+        conn.info.setdefault("metrics_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = request_stats.get()
+    if stats is not None:
+        starts = conn.info.get("metrics_start")
+        if starts:
+            stats.seconds += time.perf_counter() - starts.pop()
+        stats.statements += 1
+
+
+def instrument_engine(engine: Engine) -> None:
+    """Count statements and SQL time of `engine` into the current request"""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def _route_name(scope, root_path: str) -> str:
+    # The router stores the matched route in the scope and mounts extend
+    # root_path; anything else shares one label so that scanners probing
+    # random paths cannot blow up the number of series
+    route = scope.get("route")
+    if route is not None:
+        return route.path
+    mount_path = scope.get("root_path", "")[len(root_path):]
+    return f"{mount_path}/*" if mount_path else "unmatched"
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency, status, size and SQL per route"""
+
+    def __init__(self, app, registry: MetricsRegistry = metrics):
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        registry = self.registry
+        start = time.perf_counter()
+        status_code = 500
+        size = 0
+
+        async def send_wrapper(message):
+            nonlocal status_code, size
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        root_path = scope.get("root_path", "")
+        stats = RequestStats()
+        token = request_stats.set(stats)
+        registry.add("http_requests_in_flight", 1)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            request_stats.reset(token)
+            registry.add("http_requests_in_flight", -1)
+            route_label = (("method", scope["method"]), ("route", _route_name(scope, root_path)))
+            registry.inc("http_requests_total", route_label + (("status", str(status_code)),))
+            registry.observe("http_request_duration_seconds", time.perf_counter() - start, route_label)
+            registry.observe("http_response_size_bytes", size, route_label)
+            registry.observe("db_statements_per_request", stats.statements, route_label)
+            registry.observe("db_duration_seconds_per_request", stats.seconds, route_label)
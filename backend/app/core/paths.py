@@ -0,0 +1,11 @@
+"""Locations of the assets served by the app
+
+Kept free of other app imports, so build steps such as
+scripts/precompress_static.py can use them without loading the app.
+"""
+import os
+import pathlib
+
+backend_root = pathlib.Path(__file__).parent.parent.parent.resolve()
+STATIC_DIR = os.path.join(backend_root, "static")
+SWAGGER_DIR = os.path.join(backend_root, "swagger")
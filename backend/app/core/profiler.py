@@ -0,0 +1,179 @@
+"""SQL query profiler for development and tests
+
+Statements are grouped per request (or per `profile_queries` block) and
+normalized into fingerprints: literals become "?" and IN lists collapse,
+so the same query with different values counts as one. A fingerprint that
+runs many times within one request is the usual sign of an N+1 pattern,
+e.g. a relationship lazy loaded once per row. Slow statements are reported
+with the shape of their bound parameters, never the values.
+"""
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Iterator, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger("app.sql")
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\bIN\s*\((?:\s*\?\s*,)*\s*\?\s*\)", re.IGNORECASE)
+_SPACE = re.compile(r"\s+")
+
+
+def fingerprint(statement: str) -> str:
+    """Normalize a SQL statement so that queries differing only in values match"""
+    statement = _STRING.sub("?", statement)
+    statement = _NUMBER.sub("?", statement)
+    statement = _SPACE.sub(" ", statement).strip()
+    return _IN_LIST.sub("IN (...)", statement)
+
+
+def parameter_shape(parameters, executemany: bool = False) -> str:
+    """Describe bound parameters by type only, e.g. "(int, str)" or "500 x (int, str)" """
+    if executemany:
+        rows = list(parameters or [])
+        return f"{len(rows)} x {parameter_shape(rows[0]) if rows else '()'}"
+    if isinstance(parameters, dict):
+        values = parameters.values()
+    else:
+        values = parameters or ()
+    return "(" + ", ".join(type(value).__name__ for value in values) + ")"
+
+
+@dataclass
+class QueryRecord:
+    fingerprint: str
+    statement: str
+    duration: float
+    parameters: str
+
+
+class QueryProfile:
+    """The statements executed within one request or profiling block"""
+
+    def __init__(self, label: str = ""):
+        self.label = label
+        self.queries: List[QueryRecord] = []
+
+    def __len__(self) -> int:
+        return len(self.queries)
+
+    @property
+    def total_time(self) -> float:
+        return sum(query.duration for query in self.queries)
+
+    def repeated(self, threshold: int) -> List[Tuple[str, int]]:
+        """Fingerprints executed at least `threshold` times, most frequent first"""
+        counts = Counter(query.fingerprint for query in self.queries)
+        return [(fp, count) for fp, count in counts.most_common() if count >= threshold]
+
+    def slow(self, threshold_ms: float) -> List[QueryRecord]:
+        """Statements that took at least `threshold_ms`, slowest first"""
+        slow = [q for q in self.queries if q.duration * 1000 >= threshold_ms]
+        return sorted(slow, key=lambda query: query.duration, reverse=True)
+
+    def report(self) -> str:
+        lines = [f"{len(self.queries)} statements in {self.total_time * 1000:.1f} ms"]
+        for fp, count in self.repeated(1):
+            lines.append(f"  {count:>4}x {fp}")
+        return "\n".join(lines)
+
+    def assert_budget(self, max_statements: int, max_repeats: Optional[int] = None) -> None:
+        """Fail if more than `max_statements` ran, or any fingerprint ran more than `max_repeats` times"""
+        assert len(self.queries) <= max_statements, (
+            f"Expected at most {max_statements} statements, got {self.report()}"
+        )
+        if max_repeats is not None:
+            repeated = self.repeated(max_repeats + 1)
+            assert not repeated, f"Repeated statements (possible N+1): {self.report()}"
+
+
+current_profile: ContextVar[Optional[QueryProfile]] = ContextVar("current_profile", default=None)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if current_profile.get() is not None:
+        conn.info.setdefault("profiler_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = current_profile.get()
+    if profile is None:
+        return
+    starts = conn.info.get("profiler_start")
+    duration = time.perf_counter() - starts.pop() if starts else 0.0
+    profile.queries.append(
+        QueryRecord(
+            fingerprint(statement),
+            statement,
+            duration,
+            parameter_shape(parameters, executemany),
+        )
+    )
+
+
+def install_query_profiler(engine: Engine) -> None:
+    """Record statements of `engine` into the active profile, if any"""
+    if not event.contains(engine, "after_cursor_execute", _after_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+@contextmanager
+def profile_queries(*engines: Engine, label: str = "") -> Iterator[QueryProfile]:
+    """Collect every statement executed in this block on `engines`
+
+    Example:
+        with profile_queries(engine) as profile:
+            get_comments_tree(session)
+        profile.assert_budget(1)
+    """
+    for engine in engines:
+        install_query_profiler(engine)
+    profile = QueryProfile(label)
+    token = current_profile.set(profile)
+    try:
+        yield profile
+    finally:
+        current_profile.reset(token)
+
+
+def log_profile(profile: QueryProfile, repeat_threshold: int, slow_ms: float) -> None:
+    """Log N+1 suspects and slow statements of a finished profile"""
+    for fp, count in profile.repeated(repeat_threshold):
+        logger.warning("Possible N+1 in %s: %dx %s", profile.label, count, fp)
+    for query in profile.slow(slow_ms):
+        logger.warning(
+            "Slow query in %s: %.1f ms %s params %s",
+            profile.label, query.duration * 1000, query.fingerprint, query.parameters,
+        )
+    if profile.queries:
+        logger.debug("SQL for %s: %s", profile.label, profile.report())
+
+
+class QueryProfilerMiddleware:
+    """ASGI middleware that profiles the SQL of every HTTP request"""
+
+    def __init__(self, app, repeat_threshold: int, slow_ms: float):
+        self.app = app
+        self.repeat_threshold = repeat_threshold
+        self.slow_ms = slow_ms
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        profile = QueryProfile(f"{scope['method']} {scope['path']}")
+        token = current_profile.set(profile)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_profile.reset(token)
+            log_profile(profile, self.repeat_threshold, self.slow_ms)
@@ -0,0 +1,139 @@
+"""In-process token bucket rate limiting for expensive routes
+
+Each limit is a string such as "10/minute": a bucket holds up to 10
+tokens and refills at 10 per minute, so clients get short bursts but not
+a sustained rate above the limit. Buckets are kept per key (client IP or
+user id) in an LRU of bounded size; a key that is evicted simply starts
+again with a full bucket, which is what an idle key would have anyway.
+
+Limits are per worker process, like the other in-process state.
+"""
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Optional, Tuple
+
+from fastapi import Depends, HTTPException, Request, status
+
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.core.security import get_current_user
+from app.database.models.user import UserSnapshot
+
+PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+metrics.counter("rate_limit_rejected_total", "Requests rejected with 429 by rate limit")
+
+
+def parse_rate(rate: str) -> Optional[Tuple[int, float]]:
+    """Parse "10/minute" into (10, 60.0); an empty string means no limit
+
+    Raises:
+        ValueError: If `rate` is not "<count>/<second|minute|hour|day>"
+    """
+    if not rate.strip():
+        return None
+    count, _, period = rate.strip().partition("/")
+    if period not in PERIODS or not count.isdigit() or int(count) <= 0:
+        raise ValueError(f"Invalid rate limit {rate!r}, expected e.g. '10/minute'")
+    return int(count), float(PERIODS[period])
+
+
+class TokenBucketLimiter:
+    """Token buckets per key, at most `max_keys` of them (LRU)
+
+    Safe to share between threads.
+    """
+
+    def __init__(self, capacity: int, period: float, max_keys: int = 100000):
+        self.capacity = capacity
+        self.refill_rate = capacity / period  # Tokens per second
+        self.max_keys = max_keys
+        self.rejected = 0
+        self._buckets: "OrderedDict[Hashable, Tuple[float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def acquire(self, key: Hashable, cost: float = 1) -> float:
+        """Take `cost` tokens from `key`'s bucket
+
+        Returns:
+            0 if the request may proceed, otherwise the seconds until the
+            bucket holds enough tokens again
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._buckets.pop(key, None)
+            if entry is None:
+                tokens = float(self.capacity)
+            else:
+                tokens, updated = entry
+                tokens = min(self.capacity, tokens + (now - updated) * self.refill_rate)
+            if tokens >= cost:
+                tokens -= cost
+                wait = 0.0
+            else:
+                wait = (cost - tokens) / self.refill_rate
+                self.rejected += 1
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+            return wait
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._buckets.clear()
+
+
+# Every limiter created by the dependencies below, by limit name
+limiters: Dict[str, TokenBucketLimiter] = {}
+
+
+def _limiter(name: str, rate: str) -> Optional[TokenBucketLimiter]:
+    parsed = parse_rate(rate) if settings.RATE_LIMIT_ENABLED else None
+    if parsed is None:
+        return None
+    limiter = limiters[name] = TokenBucketLimiter(*parsed, max_keys=settings.RATE_LIMIT_MAX_KEYS)
+    return limiter
+
+
+def _check(name: str, limiter: TokenBucketLimiter, key: Hashable) -> None:
+    retry_after = limiter.acquire(key)
+    if retry_after:
+        metrics.inc("rate_limit_rejected_total", (("limit", name),))
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many requests, please try again later",
+            headers={"Retry-After": str(math.ceil(retry_after))},
+        )
+
+
+def client_ip(request: Request) -> str:
+    # Behind a proxy this is the forwarded address, as long as uvicorn
+    # trusts the proxy (--forwarded-allow-ips)
+    return request.client.host if request.client else "unknown"
+
+
+def limit_by_ip(name: str, rate: str) -> Callable:
+    """Dependency limiting a route per client IP to `rate` (see parse_rate)"""
+    limiter = _limiter(name, rate)
+
+    async def dependency(request: Request) -> None:
+        if limiter is not None:
+            _check(name, limiter, client_ip(request))
+
+    return dependency
+
+
+def limit_by_user(name: str, rate: str) -> Callable:
+    """Dependency limiting an authenticated route per user to `rate`"""
+    limiter = _limiter(name, rate)
+
+    async def dependency(current_user: UserSnapshot = Depends(get_current_user)) -> None:
+        if limiter is not None:
+            _check(name, limiter, current_user.id)
+
+    return dependency
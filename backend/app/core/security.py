@@ -1,19 +1,42 @@
+import asyncio
+import hashlib
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Callable, Optional, Tuple, TypeVar
 
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from passlib.context import CryptContext
-from sqlmodel import Session
+from sqlalchemy import event
+from sqlmodel import Session, or_, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
+from app.core.cache import TTLCache
 from app.core.config import settings
-from app.database.models.user import User
+from app.database.models.user import User, UserSnapshot
 from app.database.session import get_dbsession
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+def make_password_context(rounds: int) -> CryptContext:
+    """bcrypt context hashing with `rounds`; hashes made with any other cost,
+    higher or lower, report needs_update and are rehashed on login"""
+    return CryptContext(
+        schemes=["bcrypt"],
+        deprecated="auto",
+        bcrypt__default_rounds=rounds,
+        bcrypt__min_rounds=rounds,
+        bcrypt__max_rounds=rounds,
+    )
+
+
+pwd_context = make_password_context(settings.BCRYPT_ROUNDS)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/v1/auth/login")
 
+T = TypeVar("T")
+
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
@@ -23,6 +46,99 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
+def verify_and_update_password(
+    plain_password: str, hashed_password: str
+) -> Tuple[bool, Optional[str]]:
+    """Verify a password and rehash it if its cost differs from BCRYPT_ROUNDS
+
+    Returns:
+        (valid, new hash to store or None)
+    """
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+
+class PasswordHasher:
+    """Runs bcrypt on a bounded worker pool instead of the event loop.
+
+    At most `max_pending` calls may be running or queued at once; further
+    calls are rejected straight away with a 503 rather than piling up
+    behind a login storm. A call counts until its job leaves the pool, not
+    until its caller stops waiting: a client that disconnects mid-login
+    does not free the slot of a hash that is still running.
+    """
+
+    def __init__(self, executor: str, workers: int, max_pending: int):
+        if executor not in ("thread", "process"):
+            raise ValueError(f"Unknown password hash executor: {executor}")
+        self.executor_kind = executor
+        self.workers = workers
+        self.max_pending = max_pending
+        self.pending = 0
+        # Jobs finish on worker threads, so the count needs a lock
+        self._lock = threading.Lock()
+        self._executor: Optional[Executor] = None
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.executor_kind == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix="bcrypt"
+                )
+        return self._executor
+
+    async def run(self, func: Callable[..., T], *args) -> T:
+        with self._lock:
+            if self.pending >= self.max_pending:
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Server busy, please retry",
+                    headers={"Retry-After": "1"},
+                )
+            self.pending += 1
+        try:
+            future = self._get_executor().submit(func, *args)
+        except BaseException:
+            self._job_done(None)
+            raise
+        future.add_done_callback(self._job_done)
+        # Cancelling the caller cancels the job only if it has not started
+        return await asyncio.wrap_future(future)
+
+    def _job_done(self, future) -> None:
+        with self._lock:
+            self.pending -= 1
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+password_hasher = PasswordHasher(
+    settings.PASSWORD_HASH_EXECUTOR,
+    settings.PASSWORD_HASH_WORKERS,
+    settings.PASSWORD_HASH_MAX_PENDING,
+)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await password_hasher.run(verify_password, plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    return await password_hasher.run(get_password_hash, password)
+
+
+async def verify_and_update_password_async(
+    plain_password: str, hashed_password: str
+) -> Tuple[bool, Optional[str]]:
+    return await password_hasher.run(
+        verify_and_update_password, plain_password, hashed_password
+    )
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -59,15 +175,62 @@ def authenticate_user(db: Session, username: str, password: str) -> User | None:
         return None
 
     # Verify password
-    if not verify_password(password, user.hashed_password):
+    valid, new_hash = verify_and_update_password(password, user.hashed_password)
+    if not valid:
+        return None
+
+    # Stored with a different cost than BCRYPT_ROUNDS: upgrade it now that
+    # the plain password is at hand
+    if new_hash is not None:
+        user.hashed_password = new_hash
+        db.add(user)
+        db.commit()
+
+    return user
+
+
+async def authenticate_user_async(
+    db: AsyncSession, username: str, password: str
+) -> User | None:
+    """Async variant of authenticate_user"""
+    result = await db.exec(
+        select(User).where(or_(User.username == username, User.email == username))
+    )
+    user = result.first()
+
+    if not user:
         return None
 
+    valid, new_hash = await verify_and_update_password_async(
+        password, user.hashed_password
+    )
+    if not valid:
+        return None
+
+    if new_hash is not None:
+        user.hashed_password = new_hash
+        db.add(user)
+        await db.commit()
+
     return user
 
 
+# token digest -> (claims, UserSnapshot), grouped by user id. Per process:
+# other workers only see a change once their own entry expires, so keep
+# the TTL short.
+principal_cache = TTLCache(settings.AUTH_CACHE_SIZE, settings.AUTH_CACHE_TTL_SECONDS)
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_principal(mapper, connection, target: User) -> None:
+    """Drop cached principals of a user that was changed or deleted"""
+    principal_cache.invalidate_group(target.id)
+
+
 async def get_current_user(
-    token: str = Depends(oauth2_scheme), db: Session = Depends(get_dbsession)
-) -> User:
+    token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_dbsession)
+) -> UserSnapshot:
     if not token:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated"
@@ -76,6 +239,12 @@ async def get_current_user(
     # Remove "Bearer " prefix if present
     if token.startswith("Bearer "):
         token = token[7:]
+
+    cache_key = hashlib.sha256(token.encode()).digest()
+    cached = principal_cache.get(cache_key)
+    if cached is not None:
+        return cached[1]
+
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -91,7 +260,26 @@ async def get_current_user(
     except JWTError:
         raise credentials_exception
 
-    user = db.query(User).filter(User.username == username).first()
-    if user is None:
+    result = await db.exec(select(User).where(User.username == username))
+    user = result.first()
+    if user is None or not user.is_active:
         raise credentials_exception
-    return user
+
+    snapshot = UserSnapshot(
+        id=user.id, username=user.username, email=user.email, is_active=user.is_active
+    )
+    # Never cache past the token's own expiry
+    ttl = payload["exp"] - time.time() if "exp" in payload else None
+    principal_cache.set(cache_key, (payload, snapshot), ttl=ttl, group=user.id)
+    return snapshot
+
+
+async def get_current_admin(
+    current_user: UserSnapshot = Depends(get_current_user),
+) -> UserSnapshot:
+    admins = {name.strip() for name in settings.ADMIN_USERNAMES.split(",") if name.strip()}
+    if current_user.username not in admins:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN, detail="Admin privileges required"
+        )
+    return current_user
@@ -2,6 +2,7 @@ from datetime import datetime
 from typing import TYPE_CHECKING, List, Optional
 
 from pydantic import field_validator
+from sqlalchemy import DDL, Index, event
 from sqlmodel import Field, Relationship, SQLModel
 
 from .user import UserResponse
@@ -18,25 +19,49 @@ class CommentBase(SQLModel):
 
 
 class Comment(CommentBase, table=True):
-    """Comment model supporting infinite nesting and eager loading.
+    """Comment model supporting infinite nesting.
 
     Features:
     - Parent-child relationships for unlimited nesting
-    - Eager loading of entire comment tree (selectin)
+    - Materialized path and depth for indexed subtree and ancestor reads
+    - Reply, descendant and last activity aggregates on every comment
+    - Full-text index over the content on SQLite (see COMMENT_FTS_DDL)
+    - Whole subtrees are loaded in one query by comment_service, which
+      fills in `children` and `user` itself (see load_comment_subtrees)
     - Automatic timestamping
     - Validation for content length
     """
 
+    __table_args__ = (
+        # Keyset pagination over roots and child lookups by parent
+        Index("ix_comment_parent_id_created_at_id", "parent_id", "created_at", "id"),
+        # Subtree range scans, optionally bounded by depth
+        Index("ix_comment_path_depth", "path", "depth"),
+        # Comments by author, newest first
+        Index("ix_comment_user_id_created_at_id", "user_id", "created_at", "id"),
+    )
+
     id: int = Field(default=None, primary_key=True)
     user_id: int = Field(foreign_key="user.id")
     parent_id: int = Field(foreign_key="comment.id", default=0)
+    # Materialized path: zero-padded ids from the root down to this comment,
+    # each followed by "/", e.g. "0000000001/0000000007/". Maintained by
+    # comment_service.create_comment.
+    path: str = Field(default="")
+    depth: int = Field(default=0)
+    # Aggregates over the subtree, kept up to date by create_comment so that
+    # a collapsed thread renders from its root row alone. last_activity_at
+    # is the newest created_at in the subtree, the comment itself included.
+    reply_count: int = Field(default=0)
+    descendant_count: int = Field(default=0)
+    last_activity_at: datetime = Field(default_factory=datetime.utcnow)
 
     # Relationships
-    user: "User" = Relationship(sa_relationship_kwargs={"lazy": "joined"})
+    user: "User" = Relationship(sa_relationship_kwargs={"lazy": "select"})
     children: List["Comment"] = Relationship(
         back_populates="parent",
         sa_relationship_kwargs={
-            "lazy": "selectin",  # Eager loads all nested comments in one query
+            "lazy": "select",  # Populated by the subtree loader, not per level
             "order_by": "Comment.created_at.desc()",  # Newest first
         },
     )
@@ -63,6 +88,38 @@ class Comment(CommentBase, table=True):
         return content
 
 
+# Full-text index over comment.content for comment_search_service. It is an
+# external content FTS5 table: it stores only the index and reads the text
+# back from `comment`, and triggers keep it in step with every write,
+# including bulk imports. Rebuild it with scripts/rebuild_comment_search.py.
+# SQLite drops the triggers when a migration recreates `comment` (batch
+# mode), so such migrations must create them again.
+COMMENT_FTS_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS comment_fts USING fts5(
+        content, content='comment', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS comment_fts_insert AFTER INSERT ON comment BEGIN
+        INSERT INTO comment_fts(rowid, content) VALUES (new.id, new.content);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS comment_fts_delete AFTER DELETE ON comment BEGIN
+        INSERT INTO comment_fts(comment_fts, rowid, content) VALUES ('delete', old.id, old.content);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS comment_fts_update AFTER UPDATE OF content ON comment BEGIN
+        INSERT INTO comment_fts(comment_fts, rowid, content) VALUES ('delete', old.id, old.content);
+        INSERT INTO comment_fts(rowid, content) VALUES (new.id, new.content);
+    END""",
+]
+
+for _statement in COMMENT_FTS_DDL:
+    event.listen(Comment.__table__, "after_create", DDL(_statement).execute_if(dialect="sqlite"))
+event.listen(
+    Comment.__table__,
+    "before_drop",
+    DDL("DROP TABLE IF EXISTS comment_fts").execute_if(dialect="sqlite"),
+)
+
+
 class CommentCreate(CommentBase):
     """Input model for creating new comments via API
 
@@ -87,4 +144,45 @@ class CommentResponse(CommentBase):
     user_id: int
     user: UserResponse
     parent_id: int
+    depth: int = 0
+    reply_count: int = 0
+    descendant_count: int = 0
+    last_activity_at: datetime
     children: List["CommentResponse"] = []
+
+
+class CommentFlatResponse(CommentBase):
+    """Output model for a single comment without its replies"""
+
+    id: int
+    content: str
+    created_at: datetime
+    user_id: int
+    user: UserResponse
+    parent_id: int
+    depth: int = 0
+    reply_count: int = 0
+    descendant_count: int = 0
+    last_activity_at: datetime
+
+
+class CommentParentSummary(SQLModel):
+    """The comment a reply answers, as shown next to the reply"""
+
+    id: int
+    content: str
+    username: Optional[str] = None
+
+
+class CommentHistoryResponse(CommentFlatResponse):
+    """Output model for a comment in a user's history, with its parent"""
+
+    parent: Optional[CommentParentSummary] = None
+
+
+class CommentImportResult(SQLModel):
+    """Outcome of a bulk NDJSON comment import"""
+
+    imported: int = 0
+    skipped: int = 0
+    invalid: int = 0
@@ -61,3 +61,9 @@ class UserCreate(UserBase):
 class UserResponse(UserBase):
     username: str
     email: str
+
+
+class UserSnapshot(UserBase):
+    """Lightweight copy of an authenticated user, detached from any session"""
+
+    id: int
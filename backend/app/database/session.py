@@ -1,14 +1,97 @@
-from sqlmodel import Session, create_engine
+import os
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import (AsyncEngine, async_sessionmaker,
+                                    create_async_engine)
+from sqlmodel import create_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from app.core.config import settings
+from app.core.metrics import instrument_engine
+
+# Async drivers used for each sync DATABASE_URL scheme
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+}
+
+
+def get_async_database_url(url: str) -> str:
+    """Return `url` with its scheme switched to the matching async driver"""
+    scheme, sep, rest = url.partition("://")
+    return ASYNC_DRIVERS.get(scheme, scheme) + sep + rest
+
+
+def engine_options(url: str) -> dict:
+    """Engine keyword arguments for `url` taken from settings"""
+    url = make_url(url)
+    options = {
+        "echo": settings.DB_ECHO,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+    }
+    # In-memory SQLite uses a single shared connection, not a sized pool
+    if url.get_backend_name() != "sqlite" or url.database not in (None, "", ":memory:"):
+        options.update(
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_timeout=settings.DB_POOL_TIMEOUT,
+        )
+    if url.get_backend_name() == "sqlite" and url.get_driver_name() == "pysqlite":
+        options["connect_args"] = {"check_same_thread": False}
+    return options
+
+
+def set_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    """Apply the SQLITE_* settings to a freshly opened connection"""
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA journal_mode={settings.SQLITE_JOURNAL_MODE}")
+    cursor.execute(f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}")
+    cursor.execute(f"PRAGMA cache_size={int(settings.SQLITE_CACHE_SIZE)}")
+    cursor.execute(f"PRAGMA mmap_size={int(settings.SQLITE_MMAP_SIZE)}")
+    cursor.close()
+
+
+def create_db_engine(url: str) -> Engine:
+    db_engine = create_engine(url, **engine_options(url))
+    if db_engine.dialect.name == "sqlite":
+        event.listen(db_engine, "connect", set_sqlite_pragmas)
+    instrument_engine(db_engine)
+    return db_engine
+
+
+def create_async_db_engine(url: str) -> AsyncEngine:
+    db_engine = create_async_engine(url, **engine_options(url))
+    if db_engine.dialect.name == "sqlite":
+        event.listen(db_engine.sync_engine, "connect", set_sqlite_pragmas)
+    instrument_engine(db_engine.sync_engine)
+    return db_engine
+
+
+# Sync engine - used by migrations and command line scripts
+engine = create_db_engine(settings.DATABASE_URL)
+
+# Async engine - used by the API so queries do not block the event loop
+async_engine = create_async_db_engine(get_async_database_url(settings.DATABASE_URL))
+
+
+def _dispose_inherited_pools() -> None:
+    # Workers forked from a process that already connected (e.g. gunicorn
+    # --preload) must not share its sockets; close=False leaves those
+    # connections to the parent and gives the child empty pools
+    engine.dispose(close=False)
+    async_engine.sync_engine.dispose(close=False)
+
+
+os.register_at_fork(after_in_child=_dispose_inherited_pools)
 
-engine = create_engine(
-    settings.DATABASE_URL,
-    connect_args={"check_same_thread": False},
-    echo=True if settings.ENVIRONMENT == "dev" else False,
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, class_=AsyncSession, expire_on_commit=False
 )
 
 
-def get_dbsession():
-    with Session(engine) as session:
+async def get_dbsession():
+    async with AsyncSessionLocal() as session:
         yield session
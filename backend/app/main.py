@@ -1,109 +1,289 @@
 # Main FastAPI application entry point and configuration
-import os
-import pathlib
-import sys
-from contextlib import asynccontextmanager
-from pathlib import Path
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Dict
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.openapi.docs import (get_swagger_ui_html,
                                   get_swagger_ui_oauth2_redirect_html)
-from fastapi.responses import RedirectResponse
-from fastapi.staticfiles import StaticFiles
-
+from fastapi.responses import PlainTextResponse, RedirectResponse, Response
+from sqlalchemy import text
 
+from app import IMPORT_STARTED
 from app.api.v1.routers import api_router
-from app.core.config import settings
-from app.utils.log import LOGGING_CONFIG, set_app_logger
+from app.core.compression import CompressionMiddleware
+from app.core.config import settings, warn_if_env_file_missing
+from app.core.metrics import MetricsMiddleware, metrics
+from app.core.paths import STATIC_DIR, SWAGGER_DIR, backend_root
+from app.core.security import password_hasher, principal_cache
+from app.database.session import async_engine, engine
+from app.server import on_shutdown_signal
+from app.services.comment_service import comment_feed
+from app.utils.encoders import dumps
+from app.utils.log import QueueingHandler, configure_logging
+from app.utils.static import PrecompressedStaticFiles, precompress_directory
+
+logger = logging.getLogger("app")
+
+OPENAPI_URL = "/api/v1/openapi.json"
+
+# Seconds spent in each startup phase, in the order they ran
+startup_timings: Dict[str, float] = {}
+
+
+@contextmanager
+def startup_phase(name: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        startup_timings[name] = time.perf_counter() - start
+
+
+async def warm_up_db_pool(connections: int) -> None:
+    """Open `connections` pooled connections up front so that the first
+    requests do not pay for connecting and applying the SQLite pragmas"""
+
+    async def ping() -> None:
+        async with async_engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+    await asyncio.gather(*(ping() for _ in range(connections)))
+
 
-logger = set_app_logger("app")
+def openapi_body(app: FastAPI) -> bytes:
+    """The OpenAPI schema, built and encoded once per application"""
+    body = getattr(app.state, "openapi_body", None)
+    if body is None:
+        body = app.state.openapi_body = dumps(app.openapi())
+    return body
 
-backend_root = pathlib.Path(__file__).parent.parent.resolve()
-logger.info(f"Root path: {backend_root}")
+
+def precompress_static_assets() -> None:
+    for directory in (STATIC_DIR, SWAGGER_DIR):
+        try:
+            written, _ = precompress_directory(directory)
+        except OSError as e:
+            # e.g. a read-only image; files are then served uncompressed
+            logger.warning(f"Could not precompress {directory}: {e}")
+            continue
+        if written:
+            logger.info(f"Precompressed {written} static file variants in {directory}")
+
+
+def begin_drain() -> None:
+    """End the live comment feeds so that their connections close
+
+    Runs as soon as the server is told to stop, since it waits for open
+    connections before the lifespan shutdown runs.
+    """
+    comment_feed.close()
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Async context manager for application lifecycle events"""
     logger.info("Starting up application")
+    if settings.DB_POOL_WARMUP > 0:
+        with startup_phase("db_pool_warmup"):
+            await warm_up_db_pool(min(settings.DB_POOL_WARMUP, settings.DB_POOL_SIZE))
+    with startup_phase("openapi"):
+        openapi_body(app)
+    if settings.STATIC_PRECOMPRESS:
+        with startup_phase("static_precompress"):
+            await asyncio.to_thread(precompress_static_assets)
+    if settings.METRICS_ENABLED:
+        for phase, seconds in startup_timings.items():
+            metrics.set("app_startup_phase_seconds", seconds, (("phase", phase),))
+    logger.info(
+        "Startup took %.0f ms (%s)",
+        sum(startup_timings.values()) * 1000,
+        ", ".join(f"{phase} {seconds * 1000:.0f} ms" for phase, seconds in startup_timings.items()),
+    )
+    restore_signal_handlers = on_shutdown_signal(begin_drain)
     yield  # This is where the application runs
     logger.info("Shutting down application")
+    restore_signal_handlers()
+    begin_drain()
+    password_hasher.shutdown()
+    await async_engine.dispose()
+    engine.dispose()
 
 
 def create_app() -> FastAPI:
-    """Factory function to create and configure the FastAPI application"""
-    fastapp = FastAPI(
-        title=settings.PROJECT_NAME,
-        openapi_url="/api/v1/openapi.json",
-        docs_url=None,
-        redoc_url=None,
-        lifespan=lifespan,
-    )
+    """Factory function to create and configure the FastAPI application
 
-    if settings.ENVIRONMENT == "dev":
-        from scripts.migrate_db import run_migrations
+    Nothing here touches the database; migrations are run by the launcher
+    (see __main__ below) or `make db`, and the connection pool is warmed up
+    in the lifespan.
+    """
+    with startup_phase("create_app"):
+        configure_logging()
+        warn_if_env_file_missing()
+        logger.info(f"Root path: {backend_root}")
 
-        run_migrations()
+        fastapp = FastAPI(
+            title=settings.PROJECT_NAME,
+            openapi_url=None,  # Served from the cache below
+            docs_url=None,
+            redoc_url=None,
+            lifespan=lifespan,
+        )
+        fastapp.openapi_url = OPENAPI_URL
+        fastapp.include_router(api_router, prefix="/api/v1")
 
-    fastapp.include_router(api_router, prefix="/api/v1")
-    return fastapp
+        @fastapp.get(OPENAPI_URL, include_in_schema=False)
+        async def openapi_json(request: Request):
+            return Response(openapi_body(request.app), media_type="application/json")
 
+        # Setup CORS - Configure cross-origin resource sharing
+        # In production, only allow specified origins
+        # In development, allow all origins for easier testing
+        fastapp.add_middleware(
+            CORSMiddleware,
+            allow_origins=[settings.ALLOWED_ORIGINS]
+            if settings.ENVIRONMENT == "production"
+            else ["*"],
+            allow_credentials=True,
+            allow_methods=["*"],
+            allow_headers=["*"],
+            expose_headers=["X-Next-Cursor", "Retry-After"],
+        )
 
-fastapp = create_app()
+        if settings.ENVIRONMENT == "dev" and settings.QUERY_PROFILER_ENABLED:
+            from app.core.profiler import (QueryProfilerMiddleware,
+                                           install_query_profiler)
 
-# Setup CORS - Configure cross-origin resource sharing
-# In production, only allow specified origins
-# In development, allow all origins for easier testing
-fastapp.add_middleware(
-    CORSMiddleware,
-    allow_origins=[settings.ALLOWED_ORIGINS]
-    if settings.ENVIRONMENT == "production"
-    else ["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+            install_query_profiler(engine)
+            install_query_profiler(async_engine.sync_engine)
+            fastapp.add_middleware(
+                QueryProfilerMiddleware,
+                repeat_threshold=settings.QUERY_PROFILER_REPEAT_THRESHOLD,
+                slow_ms=settings.QUERY_PROFILER_SLOW_MS,
+            )
 
+        if settings.COMPRESSION_ENABLED:
+            fastapp.add_middleware(
+                CompressionMiddleware,
+                min_size=settings.COMPRESSION_MIN_SIZE,
+                level=settings.COMPRESSION_LEVEL,
+                content_types=settings.COMPRESSION_CONTENT_TYPES,
+                encodings=[e.strip() for e in settings.COMPRESSION_ENCODINGS.split(",") if e.strip()],
+            )
 
-STATIC_DIR = os.path.join(backend_root, "static")
+        if settings.METRICS_ENABLED:
+            # Added last so it is the outermost middleware and times everything
+            fastapp.add_middleware(MetricsMiddleware)
+            _register_metrics()
 
+            @fastapp.get("/metrics", include_in_schema=False)
+            async def prometheus_metrics():
+                return PlainTextResponse(
+                    metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+                )
 
-@fastapp.get("/docs", include_in_schema=False)
-async def custom_swagger_ui_html():
-    return get_swagger_ui_html(
-        openapi_url=fastapp.openapi_url,
-        title=fastapp.title + " - Swagger UI",
-        oauth2_redirect_url=fastapp.swagger_ui_oauth2_redirect_url,
-        swagger_js_url="/swagger/swagger-ui-bundle.js",
-        swagger_css_url="/swagger/swagger-ui.css",
-    )
+        @fastapp.get("/docs", include_in_schema=False)
+        async def custom_swagger_ui_html():
+            return get_swagger_ui_html(
+                openapi_url=fastapp.openapi_url,
+                title=fastapp.title + " - Swagger UI",
+                oauth2_redirect_url=fastapp.swagger_ui_oauth2_redirect_url,
+                swagger_js_url="/swagger/swagger-ui-bundle.js",
+                swagger_css_url="/swagger/swagger-ui.css",
+            )
+
+        for path, directory in (("/static", STATIC_DIR), ("/swagger", SWAGGER_DIR)):
+            fastapp.mount(
+                path,
+                PrecompressedStaticFiles(
+                    directory=directory,
+                    html=True,
+                    cache_entries=settings.STATIC_CACHE_ENTRIES,
+                    cache_max_file_size=settings.STATIC_CACHE_MAX_FILE_SIZE,
+                ),
+                name=path.strip("/"),
+            )
+
+        @fastapp.get(fastapp.swagger_ui_oauth2_redirect_url, include_in_schema=False)
+        async def swagger_ui_redirect():
+            return get_swagger_ui_oauth2_redirect_html()
 
+        @fastapp.get("/")
+        async def root():
+            return RedirectResponse(url="/static/index.html")
 
-fastapp.mount("/static", StaticFiles(directory=STATIC_DIR, html=True), name="static")
+    return fastapp
 
-SWAGGER_DIR = os.path.join(backend_root, "swagger")
-fastapp.mount("/swagger", StaticFiles(directory=SWAGGER_DIR, html=True), name="swagger")
 
+def _register_metrics() -> None:
+    metrics.gauge("app_startup_phase_seconds", "Time spent in each startup phase")
+    metrics.gauge(
+        "comment_feed_subscribers",
+        "Connected live comment feed clients",
+        lambda: comment_feed.subscribers,
+    )
+    metrics.counter(
+        "comment_feed_evicted_total",
+        "Live comment feed clients evicted for falling behind",
+        lambda: comment_feed.evicted,
+    )
+    metrics.counter(
+        "log_records_dropped_total",
+        "Log records dropped because the log queue was full",
+        lambda: QueueingHandler.dropped,
+    )
+    metrics.gauge(
+        "password_hash_pending",
+        "Password hash jobs running or queued",
+        lambda: password_hasher.pending,
+    )
+    metrics.counter(
+        "auth_cache_hits_total",
+        "Bearer tokens resolved from the principal cache",
+        lambda: principal_cache.hits,
+    )
+    metrics.counter(
+        "auth_cache_misses_total",
+        "Bearer tokens that had to be decoded and loaded",
+        lambda: principal_cache.misses,
+    )
+    metrics.gauge(
+        "auth_cache_size",
+        "Principals held in the cache",
+        lambda: principal_cache.stats()["size"],
+    )
 
-@fastapp.get(fastapp.swagger_ui_oauth2_redirect_url, include_in_schema=False)
-async def swagger_ui_redirect():
-    return get_swagger_ui_oauth2_redirect_html()
 
+startup_timings.setdefault("imports", time.perf_counter() - IMPORT_STARTED)
 
-@fastapp.get("/")
-async def root():
-    return RedirectResponse(url="/static/index.html")
 
+def __getattr__(name: str):
+    # `fastapp` is built on first access (e.g. by uvicorn's "app.main:fastapp"),
+    # so importing this module has no side effects
+    if name == "fastapp":
+        app = globals()["fastapp"] = create_app()
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-# Start the FastAPI application using uvicorn
-# Auto-reloads in development mode based on settings
+
+def __dir__():
+    return sorted(list(globals()) + ["fastapp"])
+
+
+# Start the FastAPI application, see app/server.py for the production
+# setup. Auto-reloads in development mode based on settings
 if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run(
-        "app.main:fastapp",
-        host="0.0.0.0",
-        port=8000,
-        log_config=LOGGING_CONFIG,
-        reload=settings.ENVIRONMENT == "dev",
-    )
+    from app.server import serve
+
+    configure_logging()
+    warn_if_env_file_missing()
+    if settings.ENVIRONMENT == "dev":
+        # Once here in the launcher, not in every worker or on import
+        from scripts.migrate_db import run_migrations
+
+        run_migrations()
+
+    serve(reload=settings.ENVIRONMENT == "dev")
@@ -0,0 +1,91 @@
+"""Production launcher: uvicorn with settings-driven workers and graceful drain
+
+    python -m app.main
+
+Workers are separate processes started with "spawn", so each one imports
+the application, and with it creates its own database engines, from
+scratch; nothing is inherited from the launcher. Workers share nothing
+else either: the live comment feed, metrics and caches are per worker.
+
+On SIGTERM/SIGINT a worker stops accepting connections, waits up to
+SERVER_GRACEFUL_TIMEOUT_SECONDS for in-flight requests and then runs the
+lifespan shutdown, which disposes the engines. Long-lived streams would
+hold that wait up until the timeout, so the application ends them as soon
+as the signal arrives (see on_shutdown_signal).
+"""
+import asyncio
+import os
+import signal
+import threading
+from typing import Callable
+
+from app.core.config import settings
+
+APP = "app.main:fastapp"
+SHUTDOWN_SIGNALS = (signal.SIGINT, signal.SIGTERM)
+
+
+def worker_count(configured: int) -> int:
+    """SERVER_WORKERS, where 0 means one worker per CPU core"""
+    if configured > 0:
+        return configured
+    return os.cpu_count() or 1
+
+
+def server_options() -> dict:
+    """uvicorn.run keyword arguments taken from settings"""
+    return {
+        "host": settings.SERVER_HOST,
+        "port": settings.SERVER_PORT,
+        "workers": worker_count(settings.SERVER_WORKERS),
+        "backlog": settings.SERVER_BACKLOG,
+        "timeout_keep_alive": settings.SERVER_KEEPALIVE_SECONDS,
+        "timeout_graceful_shutdown": settings.SERVER_GRACEFUL_TIMEOUT_SECONDS,
+        "limit_max_requests": settings.SERVER_MAX_REQUESTS or None,
+        "limit_max_requests_jitter": settings.SERVER_MAX_REQUESTS_JITTER,
+        "log_config": None,  # Configured by configure_logging in each process
+    }
+
+
+def serve(reload: bool = False) -> None:
+    """Run the application until it is told to stop"""
+    import uvicorn
+
+    options = server_options()
+    if reload:
+        # The reloader supervises a single worker of its own
+        options["workers"] = None
+    uvicorn.run(APP, reload=reload, **options)
+
+
+def on_shutdown_signal(callback: Callable[[], None]) -> Callable[[], None]:
+    """Run `callback` on the event loop when the server receives a shutdown
+    signal, in addition to the server's own handling
+
+    Only chains onto handlers the server installed in the main thread, so
+    it does nothing under a test client or without a server.
+
+    Returns:
+        A function that restores the previous handlers
+    """
+    if threading.current_thread() is not threading.main_thread():
+        return lambda: None
+    loop = asyncio.get_running_loop()
+    previous = {}
+
+    def handler(sig, frame) -> None:
+        loop.call_soon_threadsafe(callback)
+        previous[sig](sig, frame)
+
+    for sig in SHUTDOWN_SIGNALS:
+        current = signal.getsignal(sig)
+        if callable(current) and current is not signal.default_int_handler:
+            previous[sig] = current
+            signal.signal(sig, handler)
+
+    def restore() -> None:
+        for sig, original in previous.items():
+            if signal.getsignal(sig) is handler:
+                signal.signal(sig, original)
+
+    return restore
@@ -0,0 +1,171 @@
+"""Service layer for full-text comment search
+
+Search runs on the SQLite FTS5 table comment_fts (see COMMENT_FTS_DDL in
+the comment model), ranked by bm25 with the best matches first. Pages are
+keyset paginated on (rank, id) so deep pages cost the same as the first.
+Ranks shift a little as comments are added, so a result may move across
+a page boundary between requests; that is fine for search.
+
+Ranking has to score every match, so for words found in a large share of
+all comments only the newest COMMENT_SEARCH_MAX_CANDIDATES matches are
+ranked. They are cut off by rowid, which FTS5 finds without scoring.
+
+User input is never passed to MATCH as is: every word becomes a quoted
+phrase, so FTS5 operators and stray quotes cannot cause syntax errors. A
+word ending in "*" is a prefix search, served by the prefix indexes.
+"""
+import base64
+import re
+from typing import List, Optional, Tuple
+
+from sqlalchemy import Connection, Float, Integer, column, func, or_, select, table
+from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.config import settings
+from app.database.models.comment import COMMENT_FTS_DDL, Comment
+from app.database.models.user import User
+from app.services.comment_service import FLAT_COMMENT_COLUMNS, flat_comment
+
+# More words than this are ignored; each one is another index lookup
+MAX_QUERY_TERMS = 16
+
+comment_fts = table(
+    "comment_fts",
+    column("comment_fts"),
+    column("rowid", Integer),
+    column("rank", Float),
+)
+
+_TERM = re.compile(r"\w+\*?")
+
+
+def match_query(text: str) -> str:
+    """Turn free text into an FTS5 MATCH expression requiring every word
+
+    Raises:
+        ValueError: If the text contains no words
+    """
+    terms = []
+    for term in _TERM.findall(text)[:MAX_QUERY_TERMS]:
+        if term.endswith("*"):
+            terms.append(f'"{term[:-1]}"*')
+        else:
+            terms.append(f'"{term}"')
+    if not terms:
+        raise ValueError("Search query must contain at least one word")
+    return " ".join(terms)
+
+
+def encode_search_cursor(rank: float, comment_id: int) -> str:
+    """Encode the (rank, id) position of a search result as an opaque cursor"""
+    raw = f"{rank!r}|{comment_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_search_cursor(cursor: str) -> Tuple[float, int]:
+    """Decode a cursor produced by encode_search_cursor
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        rank, comment_id = base64.urlsafe_b64decode(padded.encode()).decode().split("|")
+        return float(rank), int(comment_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def search_comments(
+    db: Session, query: str, limit: int, cursor: Optional[str] = None
+) -> Tuple[List[dict], Optional[str]]:
+    """Find comments containing every word of `query`, best matches first
+
+    Args:
+        db: Database session
+        query: Free text typed by the user
+        limit: Maximum number of results
+        cursor: Opaque cursor from a previous page
+
+    Returns:
+        Flat comment dicts (CommentFlatResponse shape) and the cursor for
+        the next page, or None if this is the last page
+
+    Raises:
+        ValueError: If the query has no words or the cursor is malformed
+        NotImplementedError: If the database is not SQLite
+    """
+    if db.get_bind().dialect.name != "sqlite":
+        raise NotImplementedError("Full-text search needs SQLite FTS5")
+    # Rank inside the FTS index first, so only one page of matches is
+    # joined to comment and user however many comments match
+    matches = comment_fts.c.comment_fts.match(match_query(query))
+    hits = (
+        select(comment_fts.c.rowid, comment_fts.c.rank)
+        .where(matches)
+        # Newest first among equally ranked results
+        .order_by(comment_fts.c.rank, comment_fts.c.rowid.desc())
+        .limit(limit + 1)
+    )
+    max_candidates = settings.COMMENT_SEARCH_MAX_CANDIDATES
+    if max_candidates:
+        oldest_candidate = (
+            select(comment_fts.c.rowid)
+            .where(matches)
+            .order_by(comment_fts.c.rowid.desc())
+            .offset(max_candidates - 1)
+            .limit(1)
+            .scalar_subquery()
+        )
+        hits = hits.where(comment_fts.c.rowid >= func.coalesce(oldest_candidate, 0))
+    if cursor:
+        rank, comment_id = decode_search_cursor(cursor)
+        hits = hits.where(
+            or_(
+                comment_fts.c.rank > rank,
+                (comment_fts.c.rank == rank) & (comment_fts.c.rowid < comment_id),
+            )
+        )
+    hits = hits.subquery()
+    statement = (
+        select(hits.c.rank, *FLAT_COMMENT_COLUMNS)
+        .select_from(hits)
+        .join(Comment, Comment.id == hits.c.rowid)
+        .outerjoin(User, User.id == Comment.user_id)
+        .order_by(hits.c.rank, hits.c.rowid.desc())
+    )
+    rows = db.execute(statement).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_search_cursor(rows[-1].rank, rows[-1].id)
+    return [flat_comment(row) for row in rows], next_cursor
+
+
+def rebuild_comment_search(conn: Connection) -> int:
+    """Rebuild the full-text index from the comment table
+
+    Needed once for comments written before the index existed, or if it
+    got out of step. The table and its triggers are created first if they
+    are missing, e.g. after a migration recreated `comment`. The index is
+    merged into a single b-tree afterwards, which keeps queries fast on
+    large tables.
+
+    Returns:
+        Number of comments indexed
+    """
+    for statement in COMMENT_FTS_DDL:
+        conn.exec_driver_sql(statement)
+    conn.exec_driver_sql("INSERT INTO comment_fts(comment_fts) VALUES ('rebuild')")
+    conn.exec_driver_sql("INSERT INTO comment_fts(comment_fts) VALUES ('optimize')")
+    conn.commit()
+    return conn.execute(select(func.count()).select_from(Comment)).scalar()
+
+
+async def search_comments_async(
+    db: AsyncSession, query: str, limit: int, cursor: Optional[str] = None
+) -> Tuple[List[dict], Optional[str]]:
+    """Async variant of search_comments"""
+    return await db.run_sync(search_comments, query, limit, cursor)
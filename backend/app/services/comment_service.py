@@ -1,14 +1,44 @@
 """Service layer for comment operations - handles business logic for comments"""
-from typing import List
+import base64
+from collections import defaultdict
+from datetime import datetime
+from typing import AsyncIterator, Callable, Dict, List, Optional, Tuple
 
+from sqlalchemy import Connection, and_, case, func, select, tuple_, update
+from sqlalchemy.orm import aliased, contains_eager
+from sqlalchemy.orm.attributes import set_committed_value
 from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 
+from app.core.broker import Broker
+from app.core.config import settings
 from app.database.models.comment import Comment, CommentCreate
+from app.database.models.user import User
+from app.utils.encoders import comment_flat_dicts, dumps
+
+# Live feed of newly created comments, one CommentFlatResponse JSON per message
+comment_feed = Broker(
+    settings.COMMENT_FEED_QUEUE_SIZE, settings.COMMENT_FEED_MAX_SUBSCRIBERS
+)
+
+
+def comment_path(parent_path: str, comment_id: int) -> str:
+    """Return the materialized path of a comment given its parent's path"""
+    return f"{parent_path}{comment_id:010d}/"
+
+
+def path_ids(path: str) -> List[int]:
+    """Return the comment ids encoded in a materialized path, root first"""
+    return [int(segment) for segment in path.split("/") if segment]
 
 
 def create_comment(db: Session, comment_create: CommentCreate, user_id: int) -> Comment:
     """Create a new comment in the database
 
+    The comment's materialized path and depth are derived from its parent,
+    and the aggregates of every ancestor are bumped, in the same
+    transaction as the insert.
+
     Args:
         db: Database session
         comment_create: Comment data from API request
@@ -16,63 +46,495 @@ def create_comment(db: Session, comment_create: CommentCreate, user_id: int) ->
 
     Returns:
         The created Comment object with database-generated fields
+
+    Raises:
+        ValueError: If parent_id refers to a comment that does not exist
     """
+    parent = None
+    if comment_create.parent_id:
+        parent = db.get(Comment, comment_create.parent_id)
+        if parent is None:
+            raise ValueError("Parent comment not found")
+
     db_comment = Comment(
         content=comment_create.content,
         user_id=user_id,
-        parent_id=comment_create.parent_id if comment_create.parent_id else 0,
+        parent_id=parent.id if parent else 0,
+        depth=parent.depth + 1 if parent else 0,
     )
+    db_comment.last_activity_at = db_comment.created_at
     db.add(db_comment)
+    db.flush()  # Assigns the id the path is built from
+    db_comment.path = comment_path(parent.path if parent else "", db_comment.id)
+    if parent is not None:
+        _bump_ancestors(db, parent, db_comment.created_at)
     db.commit()
     db.refresh(db_comment)
     return db_comment
 
 
-def get_comments_tree(db: Session) -> List[Comment]:
-    """Build and return a hierarchical tree structure of all comments
+def _bump_ancestors(db: Session, parent: Comment, created_at: datetime) -> None:
+    # One UPDATE over the whole ancestor chain, found by primary key from
+    # the parent's path. The counters are incremented in SQL rather than
+    # read and written back, so concurrent replies never lose a count.
+    db.execute(
+        update(Comment)
+        .where(Comment.id.in_(path_ids(parent.path)))
+        .values(
+            reply_count=Comment.reply_count + case((Comment.id == parent.id, 1), else_=0),
+            descendant_count=Comment.descendant_count + 1,
+            last_activity_at=case(
+                (Comment.last_activity_at < created_at, created_at),
+                else_=Comment.last_activity_at,
+            ),
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+def recount_comment_aggregates(
+    conn: Connection,
+    min_id: int = 0,
+    batch_size: int = 1000,
+    progress: Optional[Callable[[int], None]] = None,
+) -> int:
+    """Recompute reply_count, descendant_count and last_activity_at from
+    the comments themselves
 
-    Algorithm:
-    1. Fetch all comments from DB (newest first)
-    2. Create a lookup dictionary by comment ID
-    3. Identify root comments (no parent)
-    4. Attach child comments to their parents recursively
+    Used to backfill the aggregates of rows written without create_comment
+    (bulk imports, seeding) and to repair them. Each batch of `batch_size`
+    comments is one UPDATE of correlated counts over the parent_id and path
+    indexes, committed on its own so writers are never blocked for long.
+
+    Args:
+        conn: Connection to update through
+        min_id: Only recount comments with at least this id
+        batch_size: Comments updated per transaction
+        progress: Called with the running total after every batch
+
+    Returns:
+        Number of comments recounted
+    """
+    table = Comment.__table__
+    below = table.alias("below")
+    upper_bound = func.substr(table.c.path, 1, func.length(table.c.path) - 1) + "0"
+    recount = update(table).values(
+        reply_count=select(func.count())
+        .where(below.c.parent_id == table.c.id)
+        .scalar_subquery(),
+        descendant_count=select(func.count())
+        .where(below.c.path > table.c.path, below.c.path < upper_bound)
+        .scalar_subquery(),
+        last_activity_at=select(func.max(below.c.created_at))
+        .where(below.c.path >= table.c.path, below.c.path < upper_bound)
+        .scalar_subquery(),
+    )
+    done, last_id = 0, min_id - 1
+    while True:
+        ids = conn.execute(
+            select(table.c.id).where(table.c.id > last_id).order_by(table.c.id).limit(batch_size)
+        ).scalars().all()
+        if not ids:
+            return done
+        conn.execute(recount.where(table.c.id.between(ids[0], ids[-1])))
+        conn.commit()
+        done += len(ids)
+        last_id = ids[-1]
+        if progress:
+            progress(done)
+
+
+def encode_cursor(created_at: datetime, comment_id: int) -> str:
+    """Encode the (created_at, id) position of a root comment as an opaque cursor"""
+    raw = f"{created_at.isoformat()}|{comment_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Decode a cursor produced by encode_cursor
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, comment_id = (
+            base64.urlsafe_b64decode(padded.encode()).decode().split("|")
+        )
+        return datetime.fromisoformat(created_at), int(comment_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def load_comment_subtrees(db: Session, seed, max_depth: Optional[int] = None) -> List[Comment]:
+    """Load the subtrees rooted at `seed` in a single round trip
+
+    A recursive CTE walks comment.parent_id downwards from the seed ids and
+    the result is joined with the authors, so every comment and its user
+    come back from one SELECT. `children` is then filled in from the rows
+    already in memory instead of being lazy loaded level by level.
 
     Args:
         db: Database session
+        seed: Ids of the subtree roots, as a list or a SELECT of ids
+        max_depth: Only include comments at most this deep (roots are 0)
 
     Returns:
-        List of root comments, each with their children attached
+        The subtree roots, newest first, with children and user attached
     """
-    # Get all comments with pre-loaded children (sorted by created_at.desc via model definition)
-    comments = db.query(Comment).order_by(Comment.created_at.desc()).all()
-    
-    # Dictionary for O(1) comment lookups
-    comment_dict = {comment.id: comment for comment in comments}
-    root_comments = []
-    
-    # Build tree structure
+    tree = select(Comment.id).where(Comment.id.in_(seed)).cte("tree", recursive=True)
+    replies = select(Comment.id).where(Comment.parent_id == tree.c.id)
+    if max_depth is not None:
+        replies = replies.where(Comment.depth <= max_depth)
+    tree = tree.union_all(replies)
+    comments = (
+        db.query(Comment)
+        .join(tree, Comment.id == tree.c.id)
+        .outerjoin(Comment.user)
+        .options(contains_eager(Comment.user))
+        .order_by(Comment.created_at.desc(), Comment.id.desc())
+        .all()
+    )
+
+    return _link_children(comments)
+
+
+def _link_children(comments: List[Comment]) -> List[Comment]:
+    """Attach each comment to its parent's children list
+
+    Args:
+        comments: Comments ordered newest first
+
+    Returns:
+        The comments whose parent is not among `comments`, newest first
+    """
+    # Rows are newest first, so every children list comes out newest first too
+    children: Dict[int, List[Comment]] = defaultdict(list)
+    for comment in comments:
+        children[comment.parent_id].append(comment)
+    loaded = {comment.id for comment in comments}
+    roots = []
     for comment in comments:
-        # Root comment
-        if comment.parent_id == 0:
-            root_comments.append(comment)
-        else:
-            parent = comment_dict.get(comment.parent_id)
-            if parent and hasattr(parent, 'children'):
-                # Prevent duplicates
-                if comment not in parent.children:
-                    parent.children.append(comment)
-    
-    return root_comments
-
-
-def get_comment(db: Session, comment_id: int) -> Comment:
-    """Get a single comment by ID
+        set_committed_value(comment, "children", children.get(comment.id, []))
+        if comment.parent_id not in loaded:
+            roots.append(comment)
+    return roots
+
+
+def get_comments_tree(
+    db: Session,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    max_depth: Optional[int] = None,
+) -> List[Comment]:
+    """Return root comments (newest first), each with their children attached
+
+    Roots are ordered by (created_at, id) descending so that a cursor taken
+    from the last root of a page resumes exactly after it. Only the roots on
+    the requested page and their descendants are read, in one query.
+
+    Args:
+        db: Database session
+        limit: Maximum number of root comments to return (None for all)
+        cursor: Opaque cursor from a previous page, see encode_cursor
+        max_depth: Only include replies at most this many levels below the
+            roots; 0 returns the roots alone, whose reply counts are enough
+            to render collapsed threads
+
+    Returns:
+        List of root comments, each with their children attached
+    """
+    root_ids = _root_page_statement(select(Comment.id), limit, cursor)
+    return load_comment_subtrees(db, root_ids.scalar_subquery(), max_depth)
+
+
+def _root_page_statement(statement, limit: Optional[int], cursor: Optional[str]):
+    """Restrict `statement` to one page of root comments, newest first"""
+    return _newest_first_page(statement.where(Comment.parent_id == 0), limit, cursor)
+
+
+def _newest_first_page(statement, limit: Optional[int], cursor: Optional[str]):
+    """Restrict `statement` to one page of comments by (created_at, id), newest first"""
+    if cursor:
+        created_at, comment_id = decode_cursor(cursor)
+        # A row value comparison, unlike the equivalent OR, is a range on
+        # the (..., created_at, id) indexes, so deep pages skip straight to
+        # the cursor instead of filtering every newer row
+        statement = statement.where(
+            tuple_(Comment.created_at, Comment.id) < tuple_(created_at, comment_id)
+        )
+    statement = statement.order_by(Comment.created_at.desc(), Comment.id.desc())
+    if limit is not None:
+        statement = statement.limit(limit)
+    return statement
+
+
+def get_comments_page(
+    db: Session, limit: int, cursor: Optional[str] = None, max_depth: Optional[int] = None
+) -> Tuple[List[Comment], Optional[str]]:
+    """Return one page of the comment tree plus the cursor for the next page
+
+    The next cursor is None once a page comes back short, i.e. there is
+    nothing left to read.
+    """
+    roots = get_comments_tree(db, limit=limit, cursor=cursor, max_depth=max_depth)
+    next_cursor = None
+    if len(roots) == limit:
+        next_cursor = encode_cursor(roots[-1].created_at, roots[-1].id)
+    return roots, next_cursor
+
+
+def get_root_paths_page(
+    db: Session, limit: int, cursor: Optional[str] = None
+) -> Tuple[List[str], Optional[str]]:
+    """Return the paths of one page of root comments plus the next cursor
+
+    Only the roots are read here; their subtrees are streamed separately by
+    stream_comment_subtrees.
+    """
+    rows = db.execute(
+        _root_page_statement(select(Comment.path, Comment.created_at, Comment.id), limit, cursor)
+    ).all()
+    next_cursor = None
+    if len(rows) == limit:
+        next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id)
+    return [row.path for row in rows], next_cursor
+
+
+# Columns read by flat_comment; select them with an outer join on User
+FLAT_COMMENT_COLUMNS = (
+    Comment.id,
+    Comment.content,
+    Comment.created_at,
+    Comment.user_id,
+    Comment.parent_id,
+    Comment.depth,
+    Comment.reply_count,
+    Comment.descendant_count,
+    Comment.last_activity_at,
+    User.username,
+    User.email,
+    User.is_active,
+)
+
+
+def _subtree_rows_statement(root_path: str, max_depth: Optional[int] = None):
+    # Path order puts every comment right after its parent, and walks the
+    # (path, depth) index without a sort step
+    statement = (
+        select(*FLAT_COMMENT_COLUMNS)
+        .outerjoin(User, User.id == Comment.user_id)
+        .where(Comment.path >= root_path, Comment.path < root_path[:-1] + "0")
+        .order_by(Comment.path)
+    )
+    if max_depth is not None:
+        statement = statement.where(Comment.depth <= max_depth)
+    return statement
+
+
+def flat_comment(row) -> dict:
+    """Turn a row of FLAT_COMMENT_COLUMNS into a CommentFlatResponse dict"""
+    user = None
+    if row.username is not None:
+        user = {"username": row.username, "email": row.email, "is_active": row.is_active}
+    return {
+        "content": row.content,
+        "id": row.id,
+        "created_at": row.created_at.isoformat(),
+        "user_id": row.user_id,
+        "user": user,
+        "parent_id": row.parent_id,
+        "depth": row.depth,
+        "reply_count": row.reply_count,
+        "descendant_count": row.descendant_count,
+        "last_activity_at": row.last_activity_at.isoformat(),
+    }
+
+
+def get_user_comments_page(
+    db: Session, user_id: int, limit: int, cursor: Optional[str] = None
+) -> Tuple[List[dict], Optional[str]]:
+    """Return one page of a user's comments, newest first, plus the next cursor
+
+    Each comment is a flat dict with a `parent` summary (id, content and
+    author of the comment it replies to, None for roots). The page is one
+    range read on the (user_id, created_at, id) index, so its cost depends
+    on `limit` only, not on how many comments the user has written.
+    """
+    parent = aliased(Comment)
+    parent_user = aliased(User)
+    statement = (
+        select(
+            *FLAT_COMMENT_COLUMNS,
+            parent.content.label("parent_content"),
+            parent_user.username.label("parent_username"),
+        )
+        .outerjoin(User, User.id == Comment.user_id)
+        .outerjoin(parent, parent.id == Comment.parent_id)
+        .outerjoin(parent_user, parent_user.id == parent.user_id)
+        .where(Comment.user_id == user_id)
+    )
+    rows = db.execute(_newest_first_page(statement, limit, cursor)).all()
+    comments = []
+    for row in rows:
+        comment = flat_comment(row)
+        comment["parent"] = None
+        if row.parent_content is not None:
+            comment["parent"] = {
+                "id": row.parent_id,
+                "content": row.parent_content,
+                "username": row.parent_username,
+            }
+        comments.append(comment)
+    next_cursor = None
+    if len(rows) == limit:
+        next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id)
+    return comments, next_cursor
+
+
+async def stream_comment_subtrees(
+    db: AsyncSession,
+    root_paths: List[str],
+    batch_size: int = 500,
+    max_depth: Optional[int] = None,
+) -> AsyncIterator[dict]:
+    """Yield the comments under each root as flat dicts, parents first
+
+    Rows are fetched from a server-side cursor `batch_size` at a time, so
+    memory use does not grow with the size of a thread. Each dict has the
+    shape of CommentFlatResponse; clients rebuild the tree from parent_id.
+    """
+    for root_path in root_paths:
+        result = await db.stream(
+            _subtree_rows_statement(root_path, max_depth).execution_options(yield_per=batch_size)
+        )
+        async for row in result:
+            yield flat_comment(row)
+
+
+def get_comment(
+    db: Session, comment_id: int, max_depth: Optional[int] = None
+) -> Optional[Comment]:
+    """Get a single comment by ID, together with its subtree
+
+    The subtree is one range read on the (path, depth) index: every
+    descendant's path starts with the comment's own path, so the rows lie
+    between that path and the same path with its trailing "/" bumped to "0".
 
     Args:
         db: Database session
         comment_id: ID of comment to retrieve
+        max_depth: Only include replies at most this many levels below it
 
     Returns:
-        The Comment object or None if not found
+        The Comment object with its replies attached, or None if not found
     """
-    return db.query(Comment).filter(Comment.id == comment_id).first()
+    anchor = aliased(Comment)
+    upper_bound = func.substr(anchor.path, 1, func.length(anchor.path) - 1) + "0"
+    conditions = [
+        anchor.id == comment_id,
+        Comment.path >= anchor.path,
+        Comment.path < upper_bound,
+    ]
+    if max_depth is not None:
+        conditions.append(Comment.depth <= anchor.depth + max_depth)
+    comments = (
+        db.query(Comment)
+        .join(anchor, and_(*conditions))
+        .outerjoin(Comment.user)
+        .options(contains_eager(Comment.user))
+        .order_by(Comment.created_at.desc(), Comment.id.desc())
+        .all()
+    )
+    roots = _link_children(comments)
+    return roots[0] if roots else None
+
+
+def get_ancestors(db: Session, comment_id: int) -> Optional[List[Comment]]:
+    """Get the chain of comments above a comment, root first
+
+    Args:
+        db: Database session
+        comment_id: ID of the comment whose ancestors to return
+
+    Returns:
+        The ancestors (empty for a root comment), or None if not found
+    """
+    comment = db.get(Comment, comment_id)
+    if comment is None:
+        return None
+    ancestor_ids = path_ids(comment.path)[:-1]
+    if not ancestor_ids:
+        return []
+    return (
+        db.query(Comment)
+        .filter(Comment.id.in_(ancestor_ids))
+        .outerjoin(Comment.user)
+        .options(contains_eager(Comment.user))
+        .order_by(Comment.depth)
+        .all()
+    )
+
+
+# Async variants used by the API. The sync functions above run unchanged
+# inside AsyncSession.run_sync, where every query awaits the async driver
+# instead of blocking the event loop.
+
+
+def _create_and_encode_comment(
+    db: Session, comment_create: CommentCreate, user_id: int
+) -> Tuple[Comment, Optional[str]]:
+    comment = create_comment(db, comment_create, user_id)
+    # Encoded once here, shared by every subscriber; skipped when nobody listens
+    message = None
+    if comment_feed.subscribers:
+        message = dumps(comment_flat_dicts([comment])[0]).decode()
+    return comment, message
+
+
+async def create_comment_async(
+    db: AsyncSession, comment_create: CommentCreate, user_id: int
+) -> Comment:
+    """Async variant of create_comment
+
+    The committed comment is also published to the live comment feed.
+    """
+    comment, message = await db.run_sync(_create_and_encode_comment, comment_create, user_id)
+    if message is not None:
+        comment_feed.publish(message)
+    return comment
+
+
+async def get_comments_page_async(
+    db: AsyncSession, limit: int, cursor: Optional[str] = None, max_depth: Optional[int] = None
+) -> Tuple[List[Comment], Optional[str]]:
+    """Async variant of get_comments_page"""
+    return await db.run_sync(get_comments_page, limit, cursor, max_depth)
+
+
+async def get_root_paths_page_async(
+    db: AsyncSession, limit: int, cursor: Optional[str] = None
+) -> Tuple[List[str], Optional[str]]:
+    """Async variant of get_root_paths_page"""
+    return await db.run_sync(get_root_paths_page, limit, cursor)
+
+
+async def get_user_comments_page_async(
+    db: AsyncSession, user_id: int, limit: int, cursor: Optional[str] = None
+) -> Tuple[List[dict], Optional[str]]:
+    """Async variant of get_user_comments_page"""
+    return await db.run_sync(get_user_comments_page, user_id, limit, cursor)
+
+
+async def get_comment_async(
+    db: AsyncSession, comment_id: int, max_depth: Optional[int] = None
+) -> Optional[Comment]:
+    """Async variant of get_comment"""
+    return await db.run_sync(get_comment, comment_id, max_depth)
+
+
+async def get_ancestors_async(
+    db: AsyncSession, comment_id: int
+) -> Optional[List[Comment]]:
+    """Async variant of get_ancestors"""
+    return await db.run_sync(get_ancestors, comment_id)
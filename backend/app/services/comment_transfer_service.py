@@ -0,0 +1,270 @@
+"""Service layer for bulk comment export and import as NDJSON
+
+Each line is one comment:
+    {"id": 12, "parent_id": 3, "username": "alice", "content": "...", "created_at": "..."}
+
+Export walks the table in id order, so parents always come before their
+replies. Import relies on that order: it inserts in batches, one
+transaction per batch, and remaps the exported ids onto the ids the rows
+get in the target database. The id map lives in a temporary table on the
+import connection, keeping memory flat however many rows are loaded.
+"""
+import json
+from datetime import datetime
+from typing import AsyncIterator, Callable, Dict, Iterable, Iterator, List, Optional
+
+from sqlalchemy import (Column, Connection, Integer, MetaData, String, Table,
+                        bindparam, func, insert, select, update)
+from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.database.models.comment import Comment, CommentImportResult
+from app.database.models.user import User
+from app.services.comment_service import (comment_path,
+                                          recount_comment_aggregates)
+
+EXPORT_BATCH_SIZE = 1000
+IMPORT_BATCH_SIZE = 1000
+
+comment_table = Comment.__table__
+user_table = User.__table__
+
+# old (exported) id -> new id, path and depth of the imported comment
+id_map_table = Table(
+    "comment_import_id_map",
+    MetaData(),
+    Column("old_id", Integer, primary_key=True),
+    Column("new_id", Integer, nullable=False),
+    Column("path", String, nullable=False),
+    Column("depth", Integer, nullable=False),
+    prefixes=["TEMPORARY"],
+)
+
+
+def _export_statement(after_id: int, batch_size: int):
+    return (
+        select(
+            Comment.id,
+            Comment.parent_id,
+            User.username,
+            Comment.content,
+            Comment.created_at,
+        )
+        .outerjoin(User, User.id == Comment.user_id)
+        .where(Comment.id > after_id)
+        .order_by(Comment.id)
+        .limit(batch_size)
+    )
+
+
+def _export_line(row) -> str:
+    return (
+        json.dumps(
+            {
+                "id": row.id,
+                "parent_id": row.parent_id,
+                "username": row.username,
+                "content": row.content,
+                "created_at": row.created_at.isoformat(),
+            },
+            ensure_ascii=False,
+        )
+        + "\n"
+    )
+
+
+def export_comments(db: Session, batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[str]:
+    """Yield every comment as an NDJSON line, oldest id first
+
+    Rows are read in keyset batches, so no read transaction stays open for
+    the whole export.
+    """
+    after_id = 0
+    while True:
+        rows = db.execute(_export_statement(after_id, batch_size)).all()
+        db.commit()
+        for row in rows:
+            yield _export_line(row)
+        if len(rows) < batch_size:
+            return
+        after_id = rows[-1].id
+
+
+async def export_comments_async(
+    db: AsyncSession, batch_size: int = EXPORT_BATCH_SIZE
+) -> AsyncIterator[str]:
+    """Async variant of export_comments"""
+    after_id = 0
+    while True:
+        rows = (await db.execute(_export_statement(after_id, batch_size))).all()
+        await db.commit()
+        for row in rows:
+            yield _export_line(row)
+        if len(rows) < batch_size:
+            return
+        after_id = rows[-1].id
+
+
+def _parse_lines(lines: Iterable, result: CommentImportResult) -> Iterator[dict]:
+    for line in lines:
+        if isinstance(line, bytes):
+            line = line.decode("utf-8")
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+            yield {
+                "id": int(record["id"]),
+                "parent_id": int(record.get("parent_id") or 0),
+                "username": record["username"],
+                "content": record["content"],
+                "created_at": datetime.fromisoformat(record["created_at"]),
+            }
+        except (ValueError, KeyError, TypeError):
+            result.invalid += 1
+
+
+def _import_batch(
+    conn: Connection,
+    records: List[dict],
+    user_ids: Dict[str, Optional[int]],
+    result: CommentImportResult,
+) -> None:
+    # Resolve authors by username; the export is portable across databases
+    unknown = {r["username"] for r in records if r["username"] not in user_ids}
+    if unknown:
+        for user_id, username in conn.execute(
+            select(user_table.c.id, user_table.c.username).where(
+                user_table.c.username.in_(unknown)
+            )
+        ):
+            user_ids[username] = user_id
+        for username in unknown:
+            user_ids.setdefault(username, None)
+
+    # Parents imported by earlier batches, and ids of this batch that an
+    # earlier batch already imported
+    wanted = {r["parent_id"] for r in records if r["parent_id"]}
+    wanted.update(r["id"] for r in records)
+    parents = {
+        row.old_id: (row.new_id, row.path, row.depth)
+        for row in conn.execute(select(id_map_table).where(id_map_table.c.old_id.in_(wanted)))
+    }
+
+    # Parents come first in the export, so a reply is only kept once its
+    # parent was kept earlier in this batch or by a previous one
+    accepted = set()
+    rows, kept = [], []
+    for record in records:
+        if record["id"] in accepted or record["id"] in parents:
+            # An exported id can only be imported once
+            result.invalid += 1
+            continue
+        user_id = user_ids[record["username"]]
+        parent_id = record["parent_id"]
+        if user_id is None or (
+            parent_id and parent_id not in parents and parent_id not in accepted
+        ):
+            result.skipped += 1
+            continue
+        accepted.add(record["id"])
+        kept.append(record)
+        rows.append(
+            {
+                "content": record["content"],
+                "created_at": record["created_at"],
+                "last_activity_at": record["created_at"],
+                "user_id": user_id,
+                "parent_id": 0,
+                "path": "",
+                "depth": 0,
+                "reply_count": 0,
+                "descendant_count": 0,
+            }
+        )
+    if not rows:
+        return
+
+    new_ids = conn.execute(
+        insert(comment_table).returning(comment_table.c.id, sort_by_parameter_order=True),
+        rows,
+    ).scalars().all()
+
+    updates, mapped = [], []
+    for record, new_id in zip(kept, new_ids):
+        parent_id, parent_path, parent_depth = (
+            parents[record["parent_id"]] if record["parent_id"] else (0, "", -1)
+        )
+        path = comment_path(parent_path, new_id)
+        parents[record["id"]] = (new_id, path, parent_depth + 1)
+        updates.append(
+            {"b_id": new_id, "b_parent_id": parent_id, "b_path": path, "b_depth": parent_depth + 1}
+        )
+        mapped.append(
+            {"old_id": record["id"], "new_id": new_id, "path": path, "depth": parent_depth + 1}
+        )
+    conn.execute(
+        update(comment_table)
+        .where(comment_table.c.id == bindparam("b_id"))
+        .values(
+            parent_id=bindparam("b_parent_id"),
+            path=bindparam("b_path"),
+            depth=bindparam("b_depth"),
+        ),
+        updates,
+    )
+    conn.execute(insert(id_map_table), mapped)
+    result.imported += len(mapped)
+
+
+def import_comments(
+    conn: Connection,
+    lines: Iterable,
+    batch_size: int = IMPORT_BATCH_SIZE,
+    progress: Optional[Callable[[CommentImportResult], None]] = None,
+) -> CommentImportResult:
+    """Import NDJSON comment lines produced by export_comments
+
+    Args:
+        conn: Connection to import into; it must not be shared while importing
+        lines: NDJSON lines as str or bytes, parents before replies
+        batch_size: Rows inserted and committed per transaction
+        progress: Called with the running totals after every batch
+
+    Returns:
+        Counts of imported, skipped (unknown author or parent) and invalid
+        (malformed, or repeating an id imported already) lines
+
+    Reply counts and last activity of the imported comments are recounted
+    once all batches are in.
+    """
+    result = CommentImportResult()
+    user_ids: Dict[str, Optional[int]] = {}
+    id_map_table.create(conn, checkfirst=True)
+    conn.commit()
+    try:
+        batch: List[dict] = []
+        for record in _parse_lines(lines, result):
+            batch.append(record)
+            if len(batch) >= batch_size:
+                _import_batch(conn, batch, user_ids, result)
+                conn.commit()
+                batch = []
+                if progress:
+                    progress(result)
+        if batch:
+            _import_batch(conn, batch, user_ids, result)
+            conn.commit()
+            if progress:
+                progress(result)
+        # Imported comments only ever reply to other imported comments, so
+        # the aggregates of everything from the first new id on cover them
+        first_id = conn.execute(select(func.min(id_map_table.c.new_id))).scalar()
+        if first_id is not None:
+            recount_comment_aggregates(conn, min_id=first_id)
+    finally:
+        conn.rollback()
+        id_map_table.drop(conn, checkfirst=True)
+        conn.commit()
+    return result
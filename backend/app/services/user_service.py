@@ -1,7 +1,8 @@
 from fastapi import HTTPException, status
-from sqlmodel import Session
+from sqlmodel import Session, or_, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from app.core.security import get_password_hash
+from app.core.security import get_password_hash, get_password_hash_async
 from app.database.models.user import User, UserCreate
 
 
@@ -42,3 +43,38 @@ def get_user_by_username(db: Session, username: str):
 
 def get_user_by_email(db: Session, email: str):
     return db.query(User).filter(User.email == email).first()
+
+
+async def create_user_async(db: AsyncSession, user_create: UserCreate):
+    """Async variant of create_user"""
+    result = await db.exec(
+        select(User).where(
+            or_(User.username == user_create.username, User.email == user_create.email)
+        )
+    )
+    if result.first():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Username or email already registered",
+        )
+
+    db_user = User(
+        username=user_create.username,
+        email=user_create.email,
+        hashed_password=await get_password_hash_async(user_create.password),
+    )
+
+    db.add(db_user)
+    await db.commit()
+    await db.refresh(db_user)
+    return db_user
+
+
+async def get_user_by_username_async(db: AsyncSession, username: str):
+    result = await db.exec(select(User).where(User.username == username))
+    return result.first()
+
+
+async def get_user_by_email_async(db: AsyncSession, email: str):
+    result = await db.exec(select(User).where(User.email == email))
+    return result.first()
@@ -0,0 +1,144 @@
+"""Fast JSON encoding for comment trees
+
+The comment endpoints return ORM objects that were just loaded from the
+database. Running them through the recursive CommentResponse model would
+validate every node again and then walk the result once more in
+jsonable_encoder. The functions here copy the trusted attributes straight
+into plain dicts with precompiled getters and hand them to orjson, which
+also serializes datetimes natively. Output matches CommentResponse and
+CommentFlatResponse field for field.
+"""
+from operator import attrgetter
+from typing import Any, Dict, Iterable, List, Optional
+
+import orjson
+from fastapi.responses import Response
+
+from app.database.models.comment import Comment
+
+_comment_fields = attrgetter(
+    "content", "id", "created_at", "user_id", "parent_id", "depth",
+    "reply_count", "descendant_count", "last_activity_at",
+)
+_user_fields = attrgetter("id", "username", "email", "is_active")
+
+
+def _user_dict(user, users: Dict[int, dict]) -> Optional[dict]:
+    if user is None:
+        return None
+    user_id, username, email, is_active = _user_fields(user)
+    # Authors repeat a lot within a page; one dict per author is enough
+    encoded = users.get(user_id)
+    if encoded is None:
+        encoded = users[user_id] = {"username": username, "email": email, "is_active": is_active}
+    return encoded
+
+
+def _comment_dict(comment: Comment, users: Dict[int, dict]) -> dict:
+    (
+        content, comment_id, created_at, user_id, parent_id, depth,
+        reply_count, descendant_count, last_activity_at,
+    ) = _comment_fields(comment)
+    return {
+        "content": content,
+        "id": comment_id,
+        "created_at": created_at,
+        "user_id": user_id,
+        "user": _user_dict(comment.user, users),
+        "parent_id": parent_id,
+        "depth": depth,
+        "reply_count": reply_count,
+        "descendant_count": descendant_count,
+        "last_activity_at": last_activity_at,
+    }
+
+
+def comment_tree_dicts(roots: Iterable[Comment]) -> List[dict]:
+    """Convert loaded comment trees to CommentResponse-shaped dicts
+
+    The trees are walked with an explicit stack, and dumps encodes them
+    without recursion as well, so threads of any depth can be returned.
+    `children` must already be loaded, as done by the comment_service
+    loaders.
+    """
+    users: Dict[int, dict] = {}
+    result = []
+    stack = []
+    for root in roots:
+        node = _comment_dict(root, users)
+        node["children"] = []
+        result.append(node)
+        stack.append((root, node))
+    while stack:
+        comment, node = stack.pop()
+        children = node["children"]
+        for child in comment.children:
+            child_node = _comment_dict(child, users)
+            child_node["children"] = []
+            children.append(child_node)
+            stack.append((child, child_node))
+    return result
+
+
+def comment_flat_dicts(comments: Iterable[Comment]) -> List[dict]:
+    """Convert comments to CommentFlatResponse-shaped dicts, without replies"""
+    users: Dict[int, dict] = {}
+    return [_comment_dict(comment, users) for comment in comments]
+
+
+def _dumps_nested(content: Any) -> bytes:
+    """Serialize like orjson.dumps, without a limit on nesting depth
+
+    Containers are walked with an explicit stack and only the scalars are
+    handed to orjson, so threads of any depth encode without recursion.
+    Pending output is pushed as bytes, which never occur in the content.
+    """
+    out = []
+    stack = [content]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, bytes):
+            out.append(item)
+        elif isinstance(item, dict):
+            stack.append(b"}")
+            entries = list(item.items())
+            for index in range(len(entries) - 1, -1, -1):
+                key, value = entries[index]
+                stack.append(value)
+                stack.append((b"," if index else b"") + orjson.dumps(str(key)) + b":")
+            stack.append(b"{")
+        elif isinstance(item, (list, tuple)):
+            stack.append(b"]")
+            for index in range(len(item) - 1, -1, -1):
+                stack.append(item[index])
+                if index:
+                    stack.append(b",")
+            stack.append(b"[")
+        else:
+            out.append(orjson.dumps(item))
+    return b"".join(out)
+
+
+def dumps(content: Any) -> bytes:
+    """Serialize to compact JSON bytes; datetimes are written in ISO 8601"""
+    try:
+        return orjson.dumps(content)
+    except orjson.JSONEncodeError as e:
+        # orjson refuses more than 255 levels of nesting, i.e. threads over
+        # ~127 replies deep; those few take the slower stack-based encoder
+        if "recursion limit" not in str(e).lower():
+            raise
+        return _dumps_nested(content)
+
+
+class FastJSONResponse(Response):
+    """JSON response rendered by orjson from already-encoded dicts
+
+    Returning a Response instance from an endpoint bypasses response_model
+    validation; keep response_model on the route for the OpenAPI schema.
+    """
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
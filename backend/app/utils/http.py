@@ -0,0 +1,27 @@
+"""HTTP header helpers shared by the static files and API middleware"""
+
+# Content codings the app can produce, which "*" stands for
+CONTENT_CODINGS = ("br", "gzip")
+
+
+def accepted_encodings(accept_encoding: str) -> set:
+    """Content codings the client accepts (q > 0) from an Accept-Encoding value
+
+    "*" stands for every supported coding except those refused with q=0.
+    """
+    accepted, refused = set(), set()
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        coding = coding.strip().lower()
+        if coding:
+            (accepted if quality > 0 else refused).add(coding)
+    if "*" in accepted:
+        accepted.update(name for name in CONTENT_CODINGS if name not in refused)
+    return accepted
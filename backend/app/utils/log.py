@@ -1,50 +1,239 @@
+import atexit
+import copy
+import json
 import logging
 import logging.config
-import os
+import logging.handlers
+import queue
+import random
+import time
+from typing import Optional
 
-LOGGING_CONFIG = {
-    "version": 1,
-    "disable_existing_loggers": False,
-    "formatters": {
-        "default": {
+from app.core.config import settings
+
+TEXT_FORMAT = "%(asctime)s %(levelprefix)s <%(threadName)s> %(filename)s %(funcName)s() (%(lineno)d): %(message)s"
+# Without caller info the logging module can skip walking the stack per record
+TEXT_FORMAT_NO_CALLER = "%(asctime)s %(levelprefix)s <%(threadName)s> %(name)s: %(message)s"
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line; uvicorn access records get their own fields"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created))
+            + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "message": record.getMessage(),
+        }
+        if record.name == "uvicorn.access" and isinstance(record.args, tuple) and len(record.args) == 5:
+            client, method, path, http_version, status_code = record.args
+            entry.update(client=client, method=method, path=path, status=status_code)
+        if settings.LOG_CALLER_INFO:
+            entry.update(file=record.filename, function=record.funcName, line=record.lineno)
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class AccessLogSampler(logging.Filter):
+    """Keep a `rate` fraction of successful access log lines and every error"""
+
+    def __init__(self, rate: float = 1.0):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.rate >= 1:
+            return True
+        args = record.args
+        if isinstance(args, tuple) and len(args) == 5 and isinstance(args[4], int) and args[4] >= 400:
+            return True
+        return random.random() < self.rate
+
+
+# Arguments of these types cannot change before the writer formats them
+_IMMUTABLE_ARGS = (str, int, float, bool, type(None))
+_exception_formatter = logging.Formatter()
+
+
+class QueueingHandler(logging.handlers.QueueHandler):
+    """Passes records for `target` to the background writer thread
+
+    A copy of the record is queued with anything that could change or keep
+    objects alive rendered first: the message when an argument is not a
+    plain value, and the traceback. Arguments that are plain values are
+    kept, since formatters such as uvicorn's access formatter read them;
+    everything else about formatting, and any I/O, happens on the writer
+    thread. When the queue is full the record is dropped and counted rather
+    than blocking the caller.
+    """
+
+    dropped = 0
+
+    def __init__(self, log_queue: queue.Queue, target: logging.Handler):
+        super().__init__(log_queue)
+        self.target = target
+        self.setLevel(target.level)
+
+    def prepare(self, record: logging.LogRecord):
+        record = copy.copy(record)
+        args = record.args
+        if args and not (
+            isinstance(args, tuple) and all(isinstance(arg, _IMMUTABLE_ARGS) for arg in args)
+        ):
+            record.msg = record.getMessage()
+            record.args = None
+        if record.exc_info:
+            if not record.exc_text:
+                formatter = self.target.formatter or _exception_formatter
+                record.exc_text = formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return self.target, record
+
+    def enqueue(self, item) -> None:
+        try:
+            self.queue.put_nowait(item)
+        except queue.Full:
+            QueueingHandler.dropped += 1
+
+
+class LogWriter(logging.handlers.QueueListener):
+    """Background thread that writes queued records to their target handler"""
+
+    def handle(self, item) -> None:
+        target, record = item
+        if record.levelno >= target.level:
+            target.handle(record)
+
+    # Seconds stop() waits for room in a full queue
+    stop_timeout = 5.0
+
+    def stop(self) -> None:
+        if self._thread is None:
+            return
+        try:
+            self.queue.put(self._sentinel, timeout=self.stop_timeout)
+        except queue.Full:
+            # The writer is stuck, e.g. on a blocked stdout; drop what is
+            # queued rather than hold up the exit (the thread is a daemon)
+            self._thread = None
+            return
+        self._thread.join()
+        self._thread = None
+
+
+def build_logging_config() -> dict:
+    if settings.LOG_FORMAT == "json":
+        default_formatter = {"()": "app.utils.log.JSONFormatter"}
+        access_formatter = {"()": "app.utils.log.JSONFormatter"}
+    else:
+        default_formatter = {
             "()": "uvicorn.logging.DefaultFormatter",
-            "fmt": "%(asctime)s %(levelprefix)s <%(threadName)s> %(filename)s %(funcName)s() (%(lineno)d): %(message)s",
+            "fmt": TEXT_FORMAT if settings.LOG_CALLER_INFO else TEXT_FORMAT_NO_CALLER,
             "datefmt": "%Y-%m-%d %H:%M:%S",
             "use_colors": None,
-        },
-        "access": {
+        }
+        access_formatter = {
             "()": "uvicorn.logging.AccessFormatter",
             "fmt": '%(asctime)s %(levelprefix)s <%(threadName)s> %(client_addr)s - "%(request_line)s" %(status_code)s',
+        }
+    return {
+        "version": 1,
+        "disable_existing_loggers": False,
+        "formatters": {"default": default_formatter, "access": access_formatter},
+        "filters": {
+            "access_sampling": {
+                "()": "app.utils.log.AccessLogSampler",
+                "rate": settings.LOG_ACCESS_SAMPLE_RATE,
+            },
         },
-    },
-    "handlers": {
-        "default": {
-            "formatter": "default",
-            "class": "logging.StreamHandler",
-            "stream": "ext://sys.stdout",
+        "handlers": {
+            "default": {
+                "formatter": "default",
+                "class": "logging.StreamHandler",
+                "stream": "ext://sys.stdout",
+            },
+            "access": {
+                "formatter": "access",
+                "class": "logging.StreamHandler",
+                "stream": "ext://sys.stdout",
+            },
+            "console": {
+                "level": settings.LOG_LEVEL,
+                "class": "logging.StreamHandler",
+                "formatter": "default",
+                "stream": "ext://sys.stdout",
+            },
         },
-        "access": {
-            "formatter": "access",
-            "class": "logging.StreamHandler",
-            "stream": "ext://sys.stdout",
+        "loggers": {
+            "uvicorn": {"handlers": ["default"], "level": "INFO", "propagate": False},
+            "uvicorn.error": {"level": "INFO"},
+            "uvicorn.access": {
+                "handlers": ["access"],
+                "level": "INFO",
+                "propagate": False,
+                "filters": ["access_sampling"],
+            },
+            "app": {"handlers": ["console"], "level": "INFO", "propagate": False},
         },
-        "console": {
-            "level": os.environ.get("LOG_LEVEL", "INFO"),
-            "class": "logging.StreamHandler",
-            "formatter": "default",
-            "stream": "ext://sys.stdout",
-        },
-    },
-    "loggers": {
-        "uvicorn": {"handlers": ["default"], "level": "INFO", "propagate": False},
-        "uvicorn.error": {"level": "INFO"},
-        "uvicorn.access": {"handlers": ["access"], "level": "INFO", "propagate": False},
-        "app": {"handlers": ["console"], "level": "INFO", "propagate": False},
-    },
-}
+    }
 
 
-def set_app_logger(name):
+LOGGING_CONFIG = build_logging_config()
+
+_writer: Optional[LogWriter] = None
+
+
+def start_log_writer(logger_names=("uvicorn", "uvicorn.access", "app")) -> LogWriter:
+    """Route the handlers of `logger_names` through one background writer"""
+    global _writer
+    log_queue: queue.Queue = queue.Queue(settings.LOG_QUEUE_SIZE)
+    targets = []
+    for name in logger_names:
+        logger = logging.getLogger(name)
+        for handler in list(logger.handlers):
+            logger.removeHandler(handler)
+            logger.addHandler(QueueingHandler(log_queue, handler))
+            targets.append(handler)
+    _writer = LogWriter(log_queue, *targets)
+    _writer.start()
+    # Stopped at interpreter exit rather than in the lifespan, so the
+    # server's own last lines still get written
+    atexit.register(stop_log_writer)
+    return _writer
+
+
+def stop_log_writer() -> None:
+    """Flush queued records and stop the writer thread"""
+    global _writer
+    if _writer is not None:
+        _writer.stop()
+        _writer = None
+
+
+_configured = False
+
+
+def configure_logging() -> None:
+    """Apply LOGGING_CONFIG and start the log writer, once per process"""
+    global _configured
+    if _configured:
+        return
+    _configured = True
     logging.config.dictConfig(LOGGING_CONFIG)
+    if not settings.LOG_CALLER_INFO:
+        # Documented switch that skips the per-record stack walk
+        logging._srcfile = None
+    if settings.LOG_QUEUE_SIZE > 0:
+        start_log_writer()
+
+
+def set_app_logger(name):
+    configure_logging()
     log = logging.getLogger(name)
     return log
@@ -0,0 +1,205 @@
+"""Static file serving with precompressed variants and long-lived caching
+
+Text assets are compressed once, next to the original (app.js ->
+app.js.gz and app.js.br), either at build time with
+scripts/precompress_static.py or at startup. Requests then only pick the
+best variant the client accepts instead of compressing on every hit.
+Content-hashed Next.js assets under _next/static/ never change, so they
+are marked immutable; everything else is revalidated by ETag.
+"""
+import gzip
+import mimetypes
+import os
+import stat
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Optional, Sequence, Tuple
+
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import StaticFiles
+from starlette.types import Scope
+
+from app.core.cache import TTLCache
+from app.utils.http import accepted_encodings
+
+try:
+    import brotli
+except ImportError:  # Optional; without it only gzip variants are made
+    brotli = None
+
+COMPRESSIBLE_EXTENSIONS = {
+    ".html", ".js", ".mjs", ".css", ".json", ".map", ".svg", ".txt", ".xml", ".ico",
+}
+# Preferred first
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+
+def _compress(data: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(data, quality=11)
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+def precompress_directory(directory: str, min_size: int = 1024) -> Tuple[int, int]:
+    """Write .gz (and .br) variants of the text assets under `directory`
+
+    Variants that are already newer than their source are left alone, so
+    this is cheap to run on every start. Variants that would not be
+    smaller than the source are not written.
+
+    Returns:
+        (variants written, variants already up to date)
+    """
+    written = current = 0
+    encodings = [(name, suffix) for name, suffix in ENCODINGS if name != "br" or brotli]
+    for root, _, files in os.walk(directory):
+        for name in files:
+            if os.path.splitext(name)[1].lower() not in COMPRESSIBLE_EXTENSIONS:
+                continue
+            path = os.path.join(root, name)
+            source = os.stat(path)
+            if source.st_size < min_size:
+                continue
+            data = None
+            for encoding, suffix in encodings:
+                try:
+                    if os.stat(path + suffix).st_mtime >= source.st_mtime:
+                        current += 1
+                        continue
+                except FileNotFoundError:
+                    pass
+                if data is None:
+                    with open(path, "rb") as f:
+                        data = f.read()
+                compressed = _compress(data, encoding)
+                if len(compressed) < len(data):
+                    # Several workers may do this at once; readers must
+                    # never see a partly written variant
+                    temporary = f"{path}{suffix}.{os.getpid()}.tmp"
+                    try:
+                        with open(temporary, "wb") as f:
+                            f.write(compressed)
+                        os.replace(temporary, path + suffix)
+                    except BaseException:
+                        try:
+                            os.remove(temporary)
+                        except FileNotFoundError:
+                            pass
+                        raise
+                    written += 1
+    return written, current
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """StaticFiles that serves precompressed variants and caches small files
+
+    Args:
+        immutable_paths: Path prefixes (relative to the mount) whose files
+            are content hashed and can be cached forever by clients
+        cache_entries: Number of file bodies kept in memory (0 disables)
+        cache_max_file_size: Only bodies up to this size are kept in memory
+    """
+
+    def __init__(
+        self,
+        *args,
+        immutable_paths: Sequence[str] = ("_next/static/",),
+        cache_entries: int = 256,
+        cache_max_file_size: int = 64 * 1024,
+        **kwargs,
+    ):
+        super().__init__(*args, **kwargs)
+        self.immutable_paths = tuple(immutable_paths)
+        self.cache_max_file_size = cache_max_file_size
+        # Keys include mtime and size, so an edited file is never served
+        # stale; the TTL only bounds how long unused bodies stay around
+        self.cache = TTLCache(cache_entries, ttl=3600)
+
+    def _variant(self, full_path: str, source: os.stat_result, suffix: str) -> Optional[os.stat_result]:
+        try:
+            variant = os.stat(full_path + suffix)
+        except OSError:
+            return None
+        if stat.S_ISREG(variant.st_mode) and variant.st_mtime >= source.st_mtime:
+            return variant
+        return None
+
+    def _read(self, path: str, stat_result: os.stat_result) -> Optional[bytes]:
+        if stat_result.st_size > self.cache_max_file_size or self.cache.maxsize <= 0:
+            return None
+        key = (path, stat_result.st_mtime_ns, stat_result.st_size)
+        body = self.cache.get(key)
+        if body is None:
+            # Small files only, and once per file: cheaper than a thread hop
+            with open(path, "rb") as f:
+                body = f.read()
+            self.cache.set(key, body)
+        return body
+
+    def file_response(
+        self,
+        full_path,
+        stat_result: os.stat_result,
+        scope: Scope,
+        status_code: int = 200,
+    ) -> Response:
+        request_headers = Headers(scope=scope)
+        accepted = accepted_encodings(request_headers.get("accept-encoding", ""))
+
+        served_path, served_stat, encoding = full_path, stat_result, None
+        for name, suffix in ENCODINGS:
+            if name in accepted:
+                variant = self._variant(full_path, stat_result, suffix)
+                if variant is not None:
+                    served_path, served_stat, encoding = full_path + suffix, variant, name
+                    break
+
+        # One ETag per representation, derived from the source file
+        tag = f"{stat_result.st_mtime_ns:x}-{stat_result.st_size:x}"
+        if encoding:
+            tag += f"-{encoding}"
+        relative = os.path.relpath(full_path, self.directory) if self.directory else ""
+        relative = relative.replace(os.sep, "/")
+        headers = {
+            "etag": f'"{tag}"',
+            "last-modified": formatdate(stat_result.st_mtime, usegmt=True),
+            "cache-control": IMMUTABLE_CACHE_CONTROL
+            if relative.startswith(self.immutable_paths)
+            else REVALIDATE_CACHE_CONTROL,
+            "vary": "Accept-Encoding",
+        }
+        if encoding:
+            headers["content-encoding"] = encoding
+
+        if self._not_modified(request_headers, headers):
+            return Response(status_code=304, headers=headers)
+
+        media_type = mimetypes.guess_type(full_path)[0] or "text/plain"
+        body = self._read(served_path, served_stat)
+        if body is not None:
+            return Response(body, status_code=status_code, headers=headers, media_type=media_type)
+        return FileResponse(
+            served_path,
+            status_code=status_code,
+            headers=headers,
+            media_type=media_type,
+            stat_result=served_stat,
+        )
+
+    @staticmethod
+    def _not_modified(request_headers: Headers, response_headers: dict) -> bool:
+        if_none_match = request_headers.get("if-none-match")
+        if if_none_match is not None:
+            tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+            return response_headers["etag"] in tags or "*" in tags
+        if_modified_since = request_headers.get("if-modified-since")
+        if if_modified_since:
+            try:
+                return parsedate_to_datetime(response_headers["last-modified"]) <= parsedate_to_datetime(
+                    if_modified_since
+                )
+            except (TypeError, ValueError):
+                return False
+        return False
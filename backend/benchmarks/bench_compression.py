@@ -0,0 +1,91 @@
+"""Compression benchmark: CPU time vs bytes on the wire for comment payloads
+
+Builds the GET /comments JSON body (and the NDJSON stream of the same
+comments) from a seeded throwaway SQLite database and compresses it with
+each encoder and level CompressionMiddleware can use. For every setting it
+reports the compression time, the compressed size and the time to move the
+response over a link of the given bandwidth, compression included, so the
+point where a higher level stops paying for itself is visible.
+
+The NDJSON rows are fed to the compressor one line at a time, as the
+middleware sees a streaming response.
+
+Usage:
+    python -m benchmarks.bench_compression --roots 200 --mbit 20
+"""
+import argparse
+import os
+import tempfile
+import time
+from typing import Callable, List
+
+from sqlmodel import Session, create_engine, select
+
+from app.core.compression import COMPRESSORS
+from app.database.models.comment import Comment
+from app.services.comment_service import get_comments_tree
+from app.utils.encoders import comment_flat_dicts, comment_tree_dicts, dumps
+from benchmarks.seed import seed_database
+
+SETTINGS = [("gzip", 1), ("gzip", 4), ("gzip", 6), ("gzip", 9), ("br", 2), ("br", 4), ("br", 6), ("br", 9)]
+
+
+def compress(encoding: str, level: int, chunks: List[bytes]) -> bytes:
+    compressor = COMPRESSORS[encoding](level)
+    out = [compressor.compress(chunk) for chunk in chunks]
+    out.append(compressor.finish())
+    return b"".join(out)
+
+
+def best_of(func: Callable[[], bytes], repeat: int):
+    best, result = float("inf"), b""
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def report(name: str, chunks: List[bytes], mbit: float, repeat: int) -> None:
+    raw = sum(len(chunk) for chunk in chunks)
+    bytes_per_second = mbit * 1_000_000 / 8
+    print(f"\n{name}: {raw / 1024:.0f} KiB in {len(chunks)} chunk(s)")
+    print(f"{'encoding':<10} {'compress ms':>12} {'size KiB':>9} {'ratio':>6} {'MB/s':>7} {f'total ms @{mbit:g}Mbit':>18}")
+    print(f"{'identity':<10} {0:>12.1f} {raw / 1024:>9.0f} {1:>6.1f} {'-':>7} {raw / bytes_per_second * 1000:>18.1f}")
+    for encoding, level in SETTINGS:
+        if encoding not in COMPRESSORS:
+            continue
+        seconds, body = best_of(lambda: compress(encoding, level, chunks), repeat)
+        total = seconds + len(body) / bytes_per_second
+        print(
+            f"{f'{encoding}-{level}':<10} {seconds * 1000:>12.1f} {len(body) / 1024:>9.0f} "
+            f"{raw / len(body):>6.1f} {raw / seconds / 1e6:>7.0f} {total * 1000:>18.1f}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--roots", type=int, default=200, help="Root comments in the tree")
+    parser.add_argument("--depth", type=int, default=3)
+    parser.add_argument("--fanout", type=int, default=4)
+    parser.add_argument("--mbit", type=float, default=20, help="Link bandwidth for the total column")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per setting, best is kept")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        url = "sqlite:///" + os.path.join(tmp, "bench.db")
+        count = seed_database(url, users=50, roots=args.roots, depth=args.depth, fanout=args.fanout)
+        engine = create_engine(url)
+        with Session(engine) as db:
+            trees = get_comments_tree(db)
+            tree_body = dumps(comment_tree_dicts(trees))
+            lines = [dumps(comment) + b"\n" for comment in comment_flat_dicts(db.exec(select(Comment).order_by(Comment.path)))]
+        engine.dispose()
+
+    print(f"{count} comments")
+    report("GET /comments (json)", [tree_body], args.mbit, args.repeat)
+    report("GET /comments?format=ndjson (streamed)", lines, args.mbit, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
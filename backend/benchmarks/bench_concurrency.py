@@ -0,0 +1,99 @@
+"""Concurrency benchmark: sync Session vs AsyncSession on one event loop
+
+Seeds a throwaway SQLite database, then serves the same page of the comment
+tree to many concurrent "requests" two ways:
+
+- sync:  the old pattern, a sync Session called from async code, which
+         blocks the event loop for the duration of every query
+- async: AsyncSession over aiosqlite, where queries await the driver
+
+Each request also awaits `--io-ms` of non-database I/O (reading the body,
+writing the response), which is what a blocked loop cannot overlap. A probe
+task measures how late the loop wakes up, i.e. how long it was blocked.
+
+Usage:
+    python -m benchmarks.bench_concurrency --requests 2000 --concurrency 50
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import Session, create_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.services.comment_service import (get_comments_page,
+                                          get_comments_page_async)
+from benchmarks.seed import seed_database
+
+
+async def probe_loop_lag(stop: asyncio.Event, interval: float = 0.005) -> float:
+    """Return the worst delay between when the loop should and did wake up"""
+    worst = 0.0
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        start = loop.time()
+        await asyncio.sleep(interval)
+        worst = max(worst, loop.time() - start - interval)
+    return worst
+
+
+async def run(mode: str, url: str, args) -> dict:
+    sync_engine = create_engine(url, connect_args={"check_same_thread": False})
+    async_engine = create_async_engine(url.replace("sqlite://", "sqlite+aiosqlite://"))
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def request() -> None:
+        async with semaphore:
+            await asyncio.sleep(args.io_ms / 1000)
+            if mode == "sync":
+                with Session(sync_engine) as db:
+                    get_comments_page(db, args.limit)
+            else:
+                async with AsyncSession(async_engine) as db:
+                    await get_comments_page_async(db, args.limit)
+
+    stop = asyncio.Event()
+    probe = asyncio.create_task(probe_loop_lag(stop))
+    start = time.perf_counter()
+    await asyncio.gather(*(request() for _ in range(args.requests)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    lag = await probe
+
+    sync_engine.dispose()
+    await async_engine.dispose()
+    return {
+        "mode": mode,
+        "throughput": args.requests / elapsed,
+        "elapsed": elapsed,
+        "max_loop_lag_ms": lag * 1000,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--roots", type=int, default=200)
+    parser.add_argument("--replies", type=int, default=5)
+    parser.add_argument("--limit", type=int, default=20, help="Roots per page")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--io-ms", type=float, default=2.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        url = "sqlite:///" + os.path.join(tmp, "bench.db")
+        seed_database(url, users=10, roots=args.roots, depth=1, fanout=args.replies)
+        print(f"{'mode':<6} {'req/s':>10} {'elapsed s':>10} {'max loop lag ms':>16}")
+        for mode in ("sync", "async"):
+            result = asyncio.run(run(mode, url, args))
+            print(
+                f"{result['mode']:<6} {result['throughput']:>10.1f} "
+                f"{result['elapsed']:>10.2f} {result['max_loop_lag_ms']:>16.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Encoding benchmark: response_model validation vs the fast comment encoder
+
+Loads comment trees of a few shapes from a throwaway SQLite database and
+turns them into response bytes two ways:
+
+- response_model: what FastAPI does for `response_model=List[CommentResponse]`,
+                  i.e. serialize_response (validate every node) followed by
+                  JSONResponse rendering
+- fast:           app.utils.encoders, plain dicts from the ORM attributes
+                  rendered by orjson
+
+Only encoding is timed; the trees are loaded once up front.
+
+Usage:
+    python -m benchmarks.bench_encoding --repeat 20
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+from typing import List
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+from sqlmodel import Session, create_engine
+
+from app.database.models.comment import CommentResponse
+from app.services.comment_service import get_comments_tree
+from app.utils.encoders import FastJSONResponse, comment_tree_dicts
+from benchmarks.seed import seed_database
+
+# name: (roots, depth, fanout)
+SHAPES = {
+    "wide": (20, 1, 200),
+    "deep": (20, 100, 1),
+    "bushy": (20, 4, 4),
+}
+
+response_field = create_model_field(
+    "Response_comments", List[CommentResponse], mode="serialization"
+)
+
+
+def encode_response_model(roots) -> bytes:
+    content = asyncio.run(
+        serialize_response(field=response_field, response_content=roots)
+    )
+    return JSONResponse(content).body
+
+
+def encode_fast(roots) -> bytes:
+    return FastJSONResponse(comment_tree_dicts(roots)).body
+
+
+def best_of(func, roots, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(roots)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=10, help="Runs per encoder, best is kept")
+    args = parser.parse_args()
+
+    print(f"{'shape':<7} {'comments':>9} {'response_model ms':>18} {'fast ms':>9} {'speedup':>8}")
+    for name, (roots, depth, fanout) in SHAPES.items():
+        with tempfile.TemporaryDirectory() as tmp:
+            url = "sqlite:///" + os.path.join(tmp, "bench.db")
+            count = seed_database(url, users=10, roots=roots, depth=depth, fanout=fanout)
+            engine = create_engine(url)
+            with Session(engine) as db:
+                trees = get_comments_tree(db)
+                assert json.loads(encode_fast(trees)) == json.loads(encode_response_model(trees))
+                slow = best_of(encode_response_model, trees, args.repeat)
+                fast = best_of(encode_fast, trees, args.repeat)
+            engine.dispose()
+        print(f"{name:<7} {count:>9} {slow * 1000:>18.1f} {fast * 1000:>9.1f} {slow / fast:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+"""In-process HTTP load and latency benchmark
+
+Seeds a throwaway database, then drives `app.main:fastapp` through an ASGI
+client (no sockets, no server) with a fixed number of requests per
+scenario at a given concurrency. Reports p50/p95/p99 latency, throughput
+and peak RSS, and can save the results as a baseline or compare against
+one, exiting non-zero when a scenario regresses beyond the tolerance.
+
+Usage:
+    python -m benchmarks.harness --roots 1000 --save baseline.json
+    python -m benchmarks.harness --roots 1000 --compare baseline.json
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import resource
+import statistics
+import sys
+import tempfile
+import time
+from typing import Awaitable, Callable, Dict, List
+
+from benchmarks.seed import BENCH_PASSWORD, add_arguments, bench_username, seed_database
+
+SCENARIOS = ["register", "login", "list_comments", "get_comment", "create_comment"]
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    scale = 1 if sys.platform == "darwin" else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 2**20
+
+
+async def run_scenario(
+    request: Callable[[int], Awaitable[int]], requests: int, concurrency: int
+) -> Dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    errors = 0
+
+    async def timed(i: int) -> None:
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            status_code = await request(i)
+            latencies.append(time.perf_counter() - start)
+            if status_code >= 400:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(timed(i) for i in range(requests)))
+    elapsed = time.perf_counter() - start
+    return {
+        "requests": requests,
+        "errors": errors,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "mean_ms": statistics.fmean(latencies) * 1000,
+        "throughput_rps": requests / elapsed,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+async def run_benchmark(args, comment_count: int) -> Dict:
+    # Imported late: settings are read from the environment at import time
+    import httpx
+
+    from app.database.session import async_engine
+    from app.main import fastapp
+
+    transport = httpx.ASGITransport(app=fastapp)
+    results: Dict[str, Dict] = {}
+    run_id = int(time.time())
+    comment_ids = itertools.cycle(range(1, comment_count + 1, max(1, comment_count // 997)))
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        response = await client.post(
+            "/api/v1/auth/login", data={"username": bench_username(1), "password": BENCH_PASSWORD}
+        )
+        response.raise_for_status()
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+        async def register(i: int) -> int:
+            response = await client.post(
+                "/api/v1/auth/register",
+                json={
+                    "username": f"r{run_id % 10**8}n{i}",
+                    "email": f"r{run_id}n{i}@example.com",
+                    "password": BENCH_PASSWORD,
+                },
+            )
+            return response.status_code
+
+        async def login(i: int) -> int:
+            response = await client.post(
+                "/api/v1/auth/login",
+                data={"username": bench_username(i % args.users + 1), "password": BENCH_PASSWORD},
+            )
+            return response.status_code
+
+        async def list_comments(i: int) -> int:
+            response = await client.get("/api/v1/comments/", params={"limit": args.page_size})
+            return response.status_code
+
+        async def get_comment(i: int) -> int:
+            response = await client.get(f"/api/v1/comments/{next(comment_ids)}")
+            return response.status_code
+
+        async def create_comment(i: int) -> int:
+            response = await client.post(
+                "/api/v1/comments/",
+                json={"content": f"Benchmark reply {i}", "parent_id": next(comment_ids)},
+                headers=headers,
+            )
+            return response.status_code
+
+        scenarios = {
+            "register": (register, args.auth_requests),
+            "login": (login, args.auth_requests),
+            "list_comments": (list_comments, args.requests),
+            "get_comment": (get_comment, args.requests),
+            "create_comment": (create_comment, args.requests),
+        }
+        for name in args.scenarios:
+            request, count = scenarios[name]
+            results[name] = await run_scenario(request, count, args.concurrency)
+    # ASGITransport does not run lifespan, so release the pool ourselves
+    await async_engine.dispose()
+    return results
+
+
+def compare(results: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """Return a description of every metric worse than baseline by more than tolerance"""
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get("scenarios", {}).get(name)
+        if not previous:
+            continue
+        for metric in ("p50_ms", "p95_ms", "p99_ms"):
+            if current[metric] > previous[metric] * (1 + tolerance):
+                regressions.append(
+                    f"{name}: {metric} {previous[metric]:.2f} -> {current[metric]:.2f}"
+                )
+        if current["throughput_rps"] < previous["throughput_rps"] * (1 - tolerance):
+            regressions.append(
+                f"{name}: throughput_rps {previous['throughput_rps']:.1f} -> "
+                f"{current['throughput_rps']:.1f}"
+            )
+    return regressions
+
+
+def print_results(results: Dict) -> None:
+    print(
+        f"{'scenario':<16} {'reqs':>6} {'errors':>6} {'p50 ms':>9} {'p95 ms':>9} "
+        f"{'p99 ms':>9} {'req/s':>9} {'rss MB':>8}"
+    )
+    for name, r in results.items():
+        print(
+            f"{name:<16} {r['requests']:>6} {r['errors']:>6} {r['p50_ms']:>9.2f} "
+            f"{r['p95_ms']:>9.2f} {r['p99_ms']:>9.2f} {r['throughput_rps']:>9.1f} "
+            f"{r['peak_rss_mb']:>8.1f}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="In-process HTTP benchmark")
+    add_arguments(parser)
+    parser.add_argument("--requests", type=int, default=500, help="Requests per scenario")
+    parser.add_argument(
+        "--auth-requests", type=int, default=50, help="Requests for register/login (bcrypt bound)"
+    )
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--page-size", type=int, default=20)
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument("--save", help="Write results as a JSON baseline to this path")
+    parser.add_argument("--compare", help="Compare against a JSON baseline at this path")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed regression, e.g. 0.2 = 20%%")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        url = "sqlite:///" + os.path.join(tmp, "bench.db")
+        os.environ["DATABASE_URL"] = url
+        os.environ["ENVIRONMENT"] = "production"  # Schema comes from the seeder, not Alembic
+        # Every request comes from one client; the limiters are built when
+        # app is imported, so this has to be set before run_benchmark
+        os.environ["RATE_LIMIT_ENABLED"] = "false"
+        start = time.perf_counter()
+        comment_count = seed_database(url, args.users, args.roots, args.depth, args.fanout, args.seed)
+        print(f"Seeded {args.users} users, {comment_count} comments in {time.perf_counter() - start:.1f}s")
+
+        results = asyncio.run(run_benchmark(args, comment_count))
+
+    print_results(results)
+    report = {
+        "config": {k: v for k, v in vars(args).items() if k not in ("save", "compare")},
+        "scenarios": results,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline saved to {args.save}")
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print("Regressions:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print("No regressions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""Synthetic data generator for benchmarks
+
+Fills a database with users and comment trees of a given shape using bulk
+inserts, so even large volumes seed in seconds. Ids, paths and depths are
+assigned up front, which assumes the comment table starts empty. Reply
+counts and last activity are recounted once all rows are in.
+
+Usage:
+    python -m benchmarks.seed sqlite:///./bench.db --roots 1000 --depth 3 --fanout 4
+"""
+import argparse
+import random
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List
+
+from sqlmodel import SQLModel, create_engine
+
+from app.database.models.comment import Comment
+from app.database.models.user import User
+
+BENCH_PASSWORD = "Benchpass0!"
+BATCH_SIZE = 5000
+
+
+def bench_username(index: int) -> str:
+    return f"bench{index}"
+
+
+def generate_users(count: int) -> List[Dict]:
+    # Imported here so callers can point DATABASE_URL elsewhere before the
+    # settings are first loaded
+    from app.core.security import get_password_hash
+
+    # Hashing once keeps seeding fast; every user shares BENCH_PASSWORD
+    hashed_password = get_password_hash(BENCH_PASSWORD)
+    return [
+        {
+            "id": i + 1,
+            "username": bench_username(i + 1),
+            "email": f"bench{i + 1}@example.com",
+            "is_active": True,
+            "hashed_password": hashed_password,
+        }
+        for i in range(count)
+    ]
+
+
+def generate_comments(
+    users: int, roots: int, depth: int, fanout: int, seed: int = 0
+) -> Iterator[Dict]:
+    """Yield comment rows: `roots` trees, each `fanout` wide and `depth` deep"""
+    rng = random.Random(seed)
+    started = datetime.utcnow() - timedelta(days=30)
+    next_id = 1
+    for _ in range(roots):
+        level = [(0, "")]  # (parent_id, parent_path)
+        for current_depth in range(depth + 1):
+            next_level = []
+            for parent_id, parent_path in level:
+                for _ in range(1 if current_depth == 0 else fanout):
+                    path = f"{parent_path}{next_id:010d}/"
+                    created_at = started + timedelta(seconds=next_id)
+                    yield {
+                        "id": next_id,
+                        "content": f"Synthetic comment {next_id} " + "lorem ipsum " * rng.randint(1, 8),
+                        "created_at": created_at,
+                        "last_activity_at": created_at,
+                        "user_id": rng.randint(1, users),
+                        "parent_id": parent_id,
+                        "path": path,
+                        "depth": current_depth,
+                        "reply_count": 0,
+                        "descendant_count": 0,
+                    }
+                    next_level.append((next_id, path))
+                    next_id += 1
+            level = next_level
+
+
+def seed_database(
+    url: str, users: int, roots: int, depth: int, fanout: int, seed: int = 0
+) -> int:
+    """Create the schema at `url` and fill it, returning the number of comments"""
+    # Imported here for the same reason as in generate_users
+    from app.services.comment_service import recount_comment_aggregates
+
+    engine = create_engine(url)
+    SQLModel.metadata.create_all(engine)
+    count = 0
+    with engine.begin() as conn:
+        conn.execute(User.__table__.insert(), generate_users(users))
+        batch = []
+        for row in generate_comments(users, roots, depth, fanout, seed):
+            batch.append(row)
+            if len(batch) >= BATCH_SIZE:
+                conn.execute(Comment.__table__.insert(), batch)
+                count += len(batch)
+                batch = []
+        if batch:
+            conn.execute(Comment.__table__.insert(), batch)
+            count += len(batch)
+    with engine.connect() as conn:
+        recount_comment_aggregates(conn, batch_size=BATCH_SIZE)
+    engine.dispose()
+    return count
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--roots", type=int, default=500)
+    parser.add_argument("--depth", type=int, default=3, help="Reply levels below each root")
+    parser.add_argument("--fanout", type=int, default=3, help="Replies per comment")
+    parser.add_argument("--seed", type=int, default=0)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Seed a database with synthetic data")
+    parser.add_argument("url", help="Database URL, e.g. sqlite:///./bench.db")
+    add_arguments(parser)
+    args = parser.parse_args()
+    count = seed_database(args.url, args.users, args.roots, args.depth, args.fanout, args.seed)
+    print(f"Seeded {args.users} users and {count} comments into {args.url}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Pick BCRYPT_ROUNDS for this host from a target time per hash
+
+    python -m scripts.calibrate_bcrypt --target-ms 250
+    python -m scripts.calibrate_bcrypt --target-ms 100 --write
+
+Every round doubles the cost, so the time per hash bounds login and
+register throughput: a worker pool of N threads manages about N / seconds
+hashes per second. The highest cost that stays within the target is
+chosen, but never less than --min-rounds. With --write the result is
+saved to the .env file; existing hashes are rehashed on their next login.
+"""
+import argparse
+import os
+import re
+import sys
+import time
+
+from passlib.hash import bcrypt
+
+from app.core.config import Settings, settings
+
+PASSWORD = "Calibrate-0-password"
+
+
+def time_hash(rounds: int, samples: int) -> float:
+    """Best of `samples` bcrypt hashes at `rounds`, in seconds"""
+    handler = bcrypt.using(rounds=rounds)
+    best = float("inf")
+    for _ in range(samples):
+        start = time.perf_counter()
+        handler.hash(PASSWORD)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def write_env(path: str, rounds: int) -> None:
+    line = f"BCRYPT_ROUNDS={rounds}"
+    content = ""
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            content = f.read()
+    if re.search(r"^BCRYPT_ROUNDS=.*$", content, flags=re.M):
+        content = re.sub(r"^BCRYPT_ROUNDS=.*$", line, content, flags=re.M)
+    else:
+        content += ("" if not content or content.endswith("\n") else "\n") + line + "\n"
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(content)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--target-ms", type=float, default=250, help="Time budget per hash")
+    parser.add_argument("--min-rounds", type=int, default=10, help="Never pick less than this")
+    parser.add_argument("--max-rounds", type=int, default=16)
+    parser.add_argument("--samples", type=int, default=3, help="Hashes per cost, best is kept")
+    parser.add_argument("--write", action="store_true", help="Save BCRYPT_ROUNDS to the .env file")
+    args = parser.parse_args()
+
+    target = args.target_ms / 1000
+    workers = min(settings.PASSWORD_HASH_WORKERS, os.cpu_count() or 1)
+    chosen = None
+    print(f"{'rounds':>6} {'ms/hash':>9} {f'hashes/s ({workers} workers)':>24}")
+    for rounds in range(4, args.max_rounds + 1):
+        seconds = time_hash(rounds, args.samples)
+        print(f"{rounds:>6} {seconds * 1000:>9.1f} {workers / seconds:>24.1f}")
+        if seconds > target:
+            break
+        chosen = rounds
+
+    if chosen is None or chosen < args.min_rounds:
+        print(
+            f"Even {args.min_rounds} rounds take longer than {args.target_ms:g} ms here; "
+            f"using the minimum",
+            file=sys.stderr,
+        )
+        chosen = args.min_rounds
+    print(f"\nBCRYPT_ROUNDS={chosen} (currently {settings.BCRYPT_ROUNDS})")
+
+    if args.write:
+        write_env(Settings.Config.env_file, chosen)
+        print(f"Saved to {Settings.Config.env_file}")
+
+
+if __name__ == "__main__":
+    main()
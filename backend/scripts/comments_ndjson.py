@@ -0,0 +1,79 @@
+"""Export or import all comments as NDJSON
+
+    python -m scripts.comments_ndjson export comments.ndjson
+    python -m scripts.comments_ndjson import comments.ndjson --batch-size 5000
+
+Use "-" for stdout/stdin. Comment authors are matched by username, so the
+users must exist in the target database before importing.
+"""
+import argparse
+import sys
+
+from sqlmodel import Session
+
+from app.core.config import settings
+from app.database.session import engine
+from app.services.comment_transfer_service import (export_comments,
+                                                   import_comments)
+
+
+def run_export(path: str) -> None:
+    out = sys.stdout if path == "-" else open(path, "w", encoding="utf-8")
+    count = 0
+    try:
+        with Session(engine) as db:
+            for line in export_comments(db):
+                out.write(line)
+                count += 1
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print(f"Exported {count} comments", file=sys.stderr)
+
+
+def run_import(path: str, batch_size: int) -> None:
+    def progress(result):
+        print(
+            f"\r{result.imported} imported, {result.skipped} skipped, "
+            f"{result.invalid} invalid",
+            end="",
+            file=sys.stderr,
+            flush=True,
+        )
+
+    src = sys.stdin.buffer if path == "-" else open(path, "rb")
+    try:
+        with engine.connect() as conn:
+            result = import_comments(conn, src, batch_size, progress=progress)
+    finally:
+        if src is not sys.stdin.buffer:
+            src.close()
+    print(file=sys.stderr)
+    print(
+        f"Imported {result.imported} comments "
+        f"({result.skipped} skipped, {result.invalid} invalid)",
+        file=sys.stderr,
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    export_parser = commands.add_parser("export", help="Write all comments as NDJSON")
+    export_parser.add_argument("path", help="Output file, or - for stdout")
+    import_parser = commands.add_parser("import", help="Load comments from NDJSON")
+    import_parser.add_argument("path", help="Input file, or - for stdin")
+    import_parser.add_argument(
+        "--batch-size", type=int, default=settings.COMMENT_IMPORT_BATCH_SIZE,
+        help="Rows inserted per transaction",
+    )
+    args = parser.parse_args()
+
+    if args.command == "export":
+        run_export(args.path)
+    else:
+        run_import(args.path, args.batch_size)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,20 @@
+"""Write .gz and .br variants of the static frontend and Swagger assets
+
+    python -m scripts.precompress_static
+
+Run at image build time so that workers do not have to do it on startup.
+"""
+from app.core.paths import STATIC_DIR, SWAGGER_DIR
+from app.utils.static import brotli, precompress_directory
+
+
+def main() -> None:
+    if brotli is None:
+        print("brotli is not installed, writing gzip variants only")
+    for directory in (STATIC_DIR, SWAGGER_DIR):
+        written, current = precompress_directory(directory)
+        print(f"{directory}: {written} written, {current} up to date")
+
+
+if __name__ == "__main__":
+    main()
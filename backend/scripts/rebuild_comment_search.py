@@ -0,0 +1,34 @@
+"""Rebuild the full-text search index over comments
+
+    python -m scripts.rebuild_comment_search
+
+Triggers keep the index up to date on every write; run this for a
+database created before the index existed, or if the index or its
+triggers were lost. The whole rebuild is one transaction, so writers
+wait for it.
+"""
+import argparse
+import sys
+import time
+
+from app.database.session import engine
+from app.services.comment_search_service import rebuild_comment_search
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.parse_args()
+
+    if engine.dialect.name != "sqlite":
+        sys.exit("Full-text search needs SQLite FTS5")
+    start = time.perf_counter()
+    with engine.connect() as conn:
+        count = rebuild_comment_search(conn)
+    print(
+        f"Indexed {count} comments in {time.perf_counter() - start:.1f}s",
+        file=sys.stderr,
+    )
+
+
+if __name__ == "__main__":
+    main()
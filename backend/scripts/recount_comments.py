@@ -0,0 +1,35 @@
+"""Recount reply_count, descendant_count and last_activity_at of comments
+
+    python -m scripts.recount_comments
+    python -m scripts.recount_comments --from-id 250000 --batch-size 5000
+
+create_comment keeps the aggregates up to date; run this after writing
+comments some other way, or to repair them. Each batch is committed on
+its own, so it can run against a live database.
+"""
+import argparse
+import sys
+
+from app.database.session import engine
+from app.services.comment_service import recount_comment_aggregates
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--from-id", type=int, default=0, help="Skip comments with a smaller id")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Comments per transaction")
+    args = parser.parse_args()
+
+    def progress(done: int) -> None:
+        print(f"\r{done} recounted", end="", file=sys.stderr, flush=True)
+
+    with engine.connect() as conn:
+        count = recount_comment_aggregates(
+            conn, min_id=args.from_id, batch_size=args.batch_size, progress=progress
+        )
+    print(file=sys.stderr)
+    print(f"Recounted {count} comments", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+from contextlib import contextmanager
+from typing import Optional
+
+import pytest
+
+from app.core.profiler import profile_queries
+
+
+@pytest.fixture
+def anyio_backend():
+    """Run @pytest.mark.anyio tests on asyncio only"""
+    return "asyncio"
+
+
+@pytest.fixture
+def query_budget():
+    """Assert how many SQL statements a block may run
+
+        with query_budget(engine, max_statements=1) as profile:
+            get_comments_tree(session)
+
+    `max_repeats` additionally caps how often one statement fingerprint may
+    repeat, which catches N+1 patterns.
+    """
+
+    @contextmanager
+    def budget(engine, max_statements: int, max_repeats: Optional[int] = None):
+        with profile_queries(engine) as profile:
+            yield profile
+        profile.assert_budget(max_statements, max_repeats)
+
+    return budget
@@ -0,0 +1,46 @@
+"""Unit tests for core/broker.py"""
+import pytest
+
+from app.core.broker import Broker, SubscriptionClosed
+
+
+@pytest.mark.anyio
+async def test_publish_reaches_every_subscriber():
+    broker = Broker(queue_size=4, max_subscribers=10)
+    first, second = broker.subscribe(), broker.subscribe()
+
+    assert broker.publish("hello") == 2
+    assert await first.next() == "hello"
+    assert await second.next() == "hello"
+    assert await first.next(timeout=0.01) is None
+
+
+@pytest.mark.anyio
+async def test_slow_subscriber_is_evicted():
+    broker = Broker(queue_size=2, max_subscribers=10)
+    slow, fast = broker.subscribe(), broker.subscribe()
+
+    for i in range(3):
+        broker.publish(str(i))
+        assert await fast.next() == str(i)
+
+    assert slow.evicted and not fast.evicted
+    assert broker.stats() == {"subscribers": 1, "published": 3, "evicted": 1}
+    with pytest.raises(SubscriptionClosed):
+        await slow.next()
+
+
+@pytest.mark.anyio
+async def test_close_and_subscriber_limit():
+    broker = Broker(queue_size=2, max_subscribers=1)
+    subscription = broker.subscribe()
+    with pytest.raises(OverflowError):
+        broker.subscribe()
+
+    broker.close()
+    assert broker.subscribers == 0
+    assert not subscription.evicted
+    for _ in range(2):
+        with pytest.raises(SubscriptionClosed):
+            await subscription.next()
+    broker.subscribe()
@@ -0,0 +1,67 @@
+"""Unit tests for core/cache.py"""
+from app.core.cache import TTLCache
+
+
+def test_get_and_set():
+    cache = TTLCache(maxsize=10, ttl=60)
+    assert cache.get("a") is None
+    cache.set("a", 1)
+    assert cache.get("a") == 1
+    assert cache.stats() == {"hits": 1, "misses": 1, "size": 1, "maxsize": 10}
+
+
+def test_entries_expire(mocker):
+    clock = mocker.patch("app.core.cache.time.monotonic", return_value=100.0)
+    cache = TTLCache(maxsize=10, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2, ttl=5)
+
+    clock.return_value = 106.0
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+
+    clock.return_value = 161.0
+    assert cache.get("a") is None
+    assert cache.stats()["size"] == 0
+
+
+def test_least_recently_used_is_evicted():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+
+def test_invalidate_if():
+    cache = TTLCache(maxsize=10, ttl=60)
+    cache.set("a", {"user": 1})
+    cache.set("b", {"user": 2})
+    cache.set("c", {"user": 1})
+
+    assert cache.invalidate_if(lambda value: value["user"] == 1) == 2
+    assert cache.get("a") is None
+    assert cache.get("b") == {"user": 2}
+
+
+def test_invalidate_group():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1, group="alice")
+    cache.set("b", 2, group="bob")
+    cache.set("c", 3, group="alice")  # Evicts "a"
+    cache.set("b", 4, group="alice")  # Moves "b" to alice
+
+    assert cache.invalidate_group("bob") == 0
+    assert cache.invalidate_group("alice") == 2
+    assert cache.stats()["size"] == 0
+    assert cache.invalidate_group("alice") == 0
+
+
+def test_zero_size_disables_cache():
+    cache = TTLCache(maxsize=0, ttl=60)
+    cache.set("a", 1)
+    assert cache.get("a") is None
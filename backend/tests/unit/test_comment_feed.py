@@ -0,0 +1,47 @@
+"""Unit tests for the live comment feed endpoints"""
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+from app.api.v1.endpoints import comment
+from app.services.comment_service import comment_feed
+
+
+@pytest.fixture(name="client")
+def client_fixture():
+    app = FastAPI()
+    app.include_router(comment.router, prefix="/comments")
+    return TestClient(app)
+
+
+@pytest.fixture(name="full_feed")
+def full_feed_fixture(monkeypatch):
+    monkeypatch.setattr(comment_feed, "max_subscribers", comment_feed.subscribers + 1)
+    subscription = comment_feed.subscribe()
+    yield
+    subscription.close()
+
+
+def test_full_feed_is_refused_before_streaming(client, full_feed):
+    response = client.get("/comments/feed")
+
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "5"
+
+    with pytest.raises(WebSocketDisconnect) as closed:
+        with client.websocket_connect("/comments/feed/ws"):
+            pass
+    assert closed.value.code == 1013
+
+
+@pytest.mark.anyio
+async def test_feed_subscribes_before_the_response_is_sent():
+    before = comment_feed.subscribers
+
+    response = await comment.get_comment_feed(request=None)
+    assert comment_feed.subscribers == before + 1
+
+    # Released even though the body was never iterated
+    await response.background()
+    assert comment_feed.subscribers == before
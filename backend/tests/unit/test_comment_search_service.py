@@ -0,0 +1,93 @@
+"""Unit tests for comment_search_service.py"""
+import pytest
+from sqlmodel import Session, create_engine
+from sqlmodel.pool import StaticPool
+
+from app.database.models.comment import Comment, CommentCreate
+from app.database.models.user import User
+from app.services import comment_search_service
+from app.services.comment_search_service import (match_query,
+                                                 rebuild_comment_search,
+                                                 search_comments)
+from app.services.comment_service import create_comment
+
+
+@pytest.fixture(name="session")
+def session_fixture():
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    Comment.metadata.create_all(engine)
+    with Session(engine) as session:
+        session.add(User(username="alice", email="alice@example.com", hashed_password="fake"))
+        session.commit()
+        for content in [
+            "Caching makes the comment tree fast",
+            "Cache invalidation is hard",
+            "Unrelated remark",
+            "Cache cache cache, everything is a cache",
+            "Café crème",
+        ]:
+            create_comment(session, CommentCreate(content=content), user_id=1)
+        yield session
+
+
+def contents(results):
+    return [r["content"] for r in results]
+
+
+def test_match_query_quotes_every_word():
+    assert match_query('cache AND "tree') == '"cache" "AND" "tree"'
+    assert match_query("cach* -x") == '"cach"* "x"'
+    with pytest.raises(ValueError):
+        match_query(' "*" ')
+
+
+def test_search_ranks_and_paginates(session: Session):
+    page1, cursor = search_comments(session, "cache", limit=1)
+    page2, cursor2 = search_comments(session, "cache", limit=5, cursor=cursor)
+
+    assert contents(page1) == ["Cache cache cache, everything is a cache"]
+    assert contents(page2) == ["Cache invalidation is hard"]
+    assert cursor2 is None
+    assert page1[0]["user"]["username"] == "alice"
+
+    assert contents(search_comments(session, "cach*", limit=5)[0]) == [
+        "Cache cache cache, everything is a cache",
+        "Cache invalidation is hard",
+        "Caching makes the comment tree fast",
+    ]
+    assert contents(search_comments(session, "cafe", limit=5)[0]) == ["Café crème"]
+    with pytest.raises(ValueError):
+        search_comments(session, "cache", limit=5, cursor="not-a-cursor")
+
+
+def test_index_follows_updates_and_deletes(session: Session):
+    comment = session.get(Comment, 3)
+    comment.content = "Remark about the cache"
+    session.commit()
+    assert "Remark about the cache" in contents(search_comments(session, "cache", limit=5)[0])
+    assert search_comments(session, "unrelated", limit=5)[0] == []
+
+    session.delete(comment)
+    session.commit()
+    assert "Remark about the cache" not in contents(search_comments(session, "cache", limit=5)[0])
+
+
+def test_rebuild_indexes_existing_rows(session: Session):
+    conn = session.connection()
+    conn.exec_driver_sql("INSERT INTO comment_fts(comment_fts) VALUES ('delete-all')")
+    assert search_comments(session, "cache", limit=5)[0] == []
+
+    assert rebuild_comment_search(conn) == 5
+    assert len(search_comments(session, "cache", limit=5)[0]) == 2
+
+
+def test_only_newest_candidates_are_ranked(session: Session, monkeypatch):
+    monkeypatch.setattr(comment_search_service.settings, "COMMENT_SEARCH_MAX_CANDIDATES", 2)
+
+    # Only ids 4 and 2 are ranked; the oldest match (id 1) is left out
+    assert contents(search_comments(session, "cach*", limit=5)[0]) == [
+        "Cache cache cache, everything is a cache",
+        "Cache invalidation is hard",
+    ]
@@ -1,10 +1,19 @@
 """Unit tests for comment_service.py"""
+import json
+
 import pytest
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import create_async_engine
 from sqlmodel import Session, create_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
 from sqlmodel.pool import StaticPool
 
-from app.database.models.comment import Comment, CommentCreate
-from app.services.comment_service import create_comment, get_comments_tree, get_comment
+from app.database.models.comment import Comment, CommentCreate, CommentFlatResponse, CommentResponse
+from app.services.comment_service import (comment_feed, create_comment, create_comment_async, get_ancestors, get_comment,
+                                          get_comment_async, get_comments_page, get_comments_page_async,
+                                          get_comments_tree, get_root_paths_page_async,
+                                          get_user_comments_page,
+                                          recount_comment_aggregates, stream_comment_subtrees)
 from app.database.models.user import User
 
 @pytest.fixture(name="session")
@@ -23,6 +32,17 @@ def session_fixture():
         session.commit()
         yield session
 
+@pytest.fixture(name="async_session")
+async def async_session_fixture():
+    engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+    async with engine.begin() as conn:
+        await conn.run_sync(Comment.metadata.create_all)
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        session.add(User(username="testuser", email="test@example.com", hashed_password="fake"))
+        await session.commit()
+        yield session
+    await engine.dispose()
+
 def test_create_comment(session: Session):
     """Test creating a root-level comment"""
     comment_data = CommentCreate(content="Test comment")
@@ -80,3 +100,232 @@ def test_get_comment(session: Session):
     assert found.id == comment.id
     assert found.content == "Test"
 
+
+def test_get_comments_page(session: Session):
+    """Test paging through root comments with a cursor"""
+    roots = [
+        create_comment(session, CommentCreate(content=f"Root {i}"), user_id=1)
+        for i in range(5)
+    ]
+    create_comment(session, CommentCreate(content="Reply", parent_id=roots[4].id), user_id=1)
+
+    page1, cursor = get_comments_page(session, limit=2)
+    assert [c.content for c in page1] == ["Root 4", "Root 3"]
+    assert len(page1[0].children) == 1
+    assert cursor is not None
+
+    page2, cursor = get_comments_page(session, limit=2, cursor=cursor)
+    assert [c.content for c in page2] == ["Root 2", "Root 1"]
+
+    page3, cursor = get_comments_page(session, limit=2, cursor=cursor)
+    assert [c.content for c in page3] == ["Root 0"]
+    assert cursor is None
+
+def test_get_comments_page_invalid_cursor(session: Session):
+    """Test that a malformed cursor is rejected"""
+    with pytest.raises(ValueError):
+        get_comments_page(session, limit=2, cursor="not-a-cursor")
+
+def _count_queries(session: Session, func):
+    """Run func and return (result, number of SQL statements it executed)"""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    engine = session.get_bind()
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        result = func()
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+    return result, len(statements)
+
+def test_get_comments_tree_single_query(session: Session):
+    """Test that a deep and wide tree is loaded and serialized with one query"""
+    parent = create_comment(session, CommentCreate(content="Root"), user_id=1)
+    deep_id = parent.id
+    for depth in range(10):
+        for sibling in range(3):
+            child = create_comment(
+                session, CommentCreate(content=f"Reply {depth}.{sibling}", parent_id=parent.id), user_id=1
+            )
+        parent = child
+    session.expire_all()
+
+    tree, queries = _count_queries(
+        session,
+        lambda: [CommentResponse.model_validate(root) for root in get_comments_tree(session)],
+    )
+    assert queries == 1
+    assert len(tree[0].children) == 3
+
+    found, queries = _count_queries(
+        session, lambda: CommentResponse.model_validate(get_comment(session, deep_id))
+    )
+    assert queries == 1
+    assert found.children[0].children[0].content == "Reply 1.2"
+
+def test_get_comment_not_found(session: Session):
+    """Test that a missing comment returns None"""
+    assert get_comment(session, 999) is None
+
+def test_comment_path_and_depth(session: Session):
+    """Test that replies extend their parent's materialized path"""
+    root = create_comment(session, CommentCreate(content="Root"), user_id=1)
+    reply = create_comment(session, CommentCreate(content="Reply", parent_id=root.id), user_id=1)
+
+    assert root.path == f"{root.id:010d}/"
+    assert root.depth == 0
+    assert reply.path == f"{root.id:010d}/{reply.id:010d}/"
+    assert reply.depth == 1
+
+def test_create_reply_missing_parent(session: Session):
+    """Test that replying to a missing comment is rejected"""
+    with pytest.raises(ValueError):
+        create_comment(session, CommentCreate(content="Reply", parent_id=999), user_id=1)
+
+def test_get_comment_max_depth(session: Session):
+    """Test limiting the subtree returned with a comment"""
+    root = create_comment(session, CommentCreate(content="Root"), user_id=1)
+    child = create_comment(session, CommentCreate(content="Child", parent_id=root.id), user_id=1)
+    create_comment(session, CommentCreate(content="Grandchild", parent_id=child.id), user_id=1)
+    create_comment(session, CommentCreate(content="Other root"), user_id=1)
+    session.expire_all()
+
+    found = get_comment(session, root.id, max_depth=1)
+    assert [c.content for c in found.children] == ["Child"]
+    assert found.children[0].children == []
+
+    found = get_comment(session, child.id)
+    assert [c.content for c in found.children] == ["Grandchild"]
+
+def test_get_ancestors(session: Session):
+    """Test retrieving the chain above a comment, root first"""
+    root = create_comment(session, CommentCreate(content="Root"), user_id=1)
+    child = create_comment(session, CommentCreate(content="Child", parent_id=root.id), user_id=1)
+    leaf = create_comment(session, CommentCreate(content="Leaf", parent_id=child.id), user_id=1)
+
+    assert [c.content for c in get_ancestors(session, leaf.id)] == ["Root", "Child"]
+    assert get_ancestors(session, root.id) == []
+    assert get_ancestors(session, 999) is None
+
+def test_create_reply_updates_ancestor_aggregates(session: Session):
+    """Test that a new reply bumps the counts and last activity of every ancestor"""
+    root = create_comment(session, CommentCreate(content="Root"), user_id=1)
+    child = create_comment(session, CommentCreate(content="Child", parent_id=root.id), user_id=1)
+    create_comment(session, CommentCreate(content="Sibling", parent_id=root.id), user_id=1)
+    leaf = create_comment(session, CommentCreate(content="Leaf", parent_id=child.id), user_id=1)
+    other = create_comment(session, CommentCreate(content="Other root"), user_id=1)
+
+    assert (root.reply_count, root.descendant_count) == (2, 3)
+    assert (child.reply_count, child.descendant_count) == (1, 1)
+    assert (leaf.reply_count, leaf.descendant_count) == (0, 0)
+    assert root.last_activity_at == child.last_activity_at == leaf.created_at
+    assert (other.reply_count, other.last_activity_at) == (0, other.created_at)
+
+def test_recount_matches_incremental_aggregates(session: Session):
+    """Test that recounting from scratch gives what create_comment maintained"""
+    root = create_comment(session, CommentCreate(content="Root"), user_id=1)
+    child = create_comment(session, CommentCreate(content="Child", parent_id=root.id), user_id=1)
+    create_comment(session, CommentCreate(content="Leaf", parent_id=child.id), user_id=1)
+    create_comment(session, CommentCreate(content="Other root"), user_id=1)
+
+    def aggregates():
+        session.expire_all()
+        return [
+            (c.id, c.reply_count, c.descendant_count, c.last_activity_at)
+            for c in session.query(Comment).order_by(Comment.id)
+        ]
+
+    expected = aggregates()
+    session.query(Comment).update(
+        {"reply_count": 0, "descendant_count": 0, "last_activity_at": root.created_at}
+    )
+    session.commit()
+
+    progress = []
+    assert recount_comment_aggregates(session.connection(), batch_size=3, progress=progress.append) == 4
+    assert progress == [3, 4]
+    assert aggregates() == expected
+
+def test_max_depth_limits_loaded_replies(session: Session):
+    """Test that max_depth=0 returns the roots alone, with their counts"""
+    root = create_comment(session, CommentCreate(content="Root"), user_id=1)
+    child = create_comment(session, CommentCreate(content="Child", parent_id=root.id), user_id=1)
+    create_comment(session, CommentCreate(content="Leaf", parent_id=child.id), user_id=1)
+
+    roots, _ = get_comments_page(session, limit=10, max_depth=0)
+    assert roots[0].children == []
+    assert CommentResponse.model_validate(roots[0]).descendant_count == 2
+
+    roots, _ = get_comments_page(session, limit=10, max_depth=1)
+    assert [c.content for c in roots[0].children] == ["Child"]
+    assert roots[0].children[0].children == []
+
+def test_get_user_comments_page(session: Session):
+    """Test paging through one user's comments, newest first, with parent context"""
+    session.add(User(username="otheruser", email="other@example.com", hashed_password="fake"))
+    session.commit()
+    root = create_comment(session, CommentCreate(content="Question"), user_id=2)
+    create_comment(session, CommentCreate(content="First"), user_id=1)
+    create_comment(session, CommentCreate(content="Answer", parent_id=root.id), user_id=1)
+    create_comment(session, CommentCreate(content="Thanks", parent_id=root.id), user_id=2)
+
+    page1, cursor = get_user_comments_page(session, 1, limit=1)
+    page2, cursor = get_user_comments_page(session, 1, limit=1, cursor=cursor)
+    page3, cursor = get_user_comments_page(session, 1, limit=1, cursor=cursor)
+
+    assert [c["content"] for c in page1 + page2] == ["Answer", "First"]
+    assert page3 == [] and cursor is None
+    assert page1[0]["parent"] == {"id": root.id, "content": "Question", "username": "otheruser"}
+    assert page1[0]["user"]["username"] == "testuser"
+    assert page2[0]["parent"] is None
+
+@pytest.mark.anyio
+async def test_async_variants(async_session: AsyncSession):
+    """Test creating and reading comments through an AsyncSession"""
+    root = await create_comment_async(async_session, CommentCreate(content="Root"), user_id=1)
+    await create_comment_async(async_session, CommentCreate(content="Reply", parent_id=root.id), user_id=1)
+
+    roots, cursor = await get_comments_page_async(async_session, limit=10)
+    assert [c.content for c in roots] == ["Root"]
+    assert [c.content for c in roots[0].children] == ["Reply"]
+    assert roots[0].user.username == "testuser"
+    assert cursor is None
+
+    found = await get_comment_async(async_session, root.id)
+    assert found.children[0].content == "Reply"
+
+@pytest.mark.anyio
+async def test_stream_comment_subtrees(async_session: AsyncSession):
+    """Test streaming a page as flat rows, each root followed by its replies"""
+    first = await create_comment_async(async_session, CommentCreate(content="First"), user_id=1)
+    reply = await create_comment_async(async_session, CommentCreate(content="Reply", parent_id=first.id), user_id=1)
+    await create_comment_async(async_session, CommentCreate(content="Nested", parent_id=reply.id), user_id=1)
+    await create_comment_async(async_session, CommentCreate(content="Second"), user_id=1)
+
+    root_paths, cursor = await get_root_paths_page_async(async_session, limit=2)
+    rows = [row async for row in stream_comment_subtrees(async_session, root_paths, batch_size=1)]
+
+    assert cursor is not None
+    assert [(r["content"], r["depth"]) for r in rows] == [
+        ("Second", 0), ("First", 0), ("Reply", 1), ("Nested", 2)
+    ]
+    assert rows[2]["parent_id"] == first.id
+    # Same shape the regular endpoint would produce for a flat comment
+    nested = await get_comment_async(async_session, rows[3]["id"])
+    assert rows[3] == json.loads(CommentFlatResponse.model_validate(nested).model_dump_json())
+
+@pytest.mark.anyio
+async def test_create_comment_async_publishes_to_feed(async_session: AsyncSession):
+    """Test that new comments are pushed to live feed subscribers"""
+    subscription = comment_feed.subscribe()
+    try:
+        comment = await create_comment_async(async_session, CommentCreate(content="Live"), user_id=1)
+        message = json.loads(await subscription.next(timeout=1))
+    finally:
+        subscription.close()
+
+    assert message["id"] == comment.id
+    assert message["user"]["username"] == "testuser"
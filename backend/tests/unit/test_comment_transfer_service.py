@@ -0,0 +1,110 @@
+"""Unit tests for comment_transfer_service.py"""
+import json
+
+import pytest
+from sqlmodel import Session, create_engine, select
+from sqlmodel.pool import StaticPool
+
+from app.database.models.comment import Comment, CommentCreate
+from app.database.models.user import User
+from app.services.comment_service import create_comment, get_comment
+from app.services.comment_transfer_service import (export_comments,
+                                                   import_comments)
+
+
+def _engine():
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    Comment.metadata.create_all(engine)
+    with Session(engine) as session:
+        session.add(User(username="alice", email="alice@example.com", hashed_password="fake"))
+        session.add(User(username="bob", email="bob@example.com", hashed_password="fake"))
+        session.commit()
+    return engine
+
+
+@pytest.fixture(name="source")
+def source_fixture():
+    engine = _engine()
+    with Session(engine) as session:
+        root = create_comment(session, CommentCreate(content="Root"), user_id=1)
+        reply = create_comment(session, CommentCreate(content="Reply", parent_id=root.id), user_id=2)
+        create_comment(session, CommentCreate(content="Nested", parent_id=reply.id), user_id=1)
+        create_comment(session, CommentCreate(content="Other root"), user_id=2)
+    return engine
+
+
+@pytest.fixture(name="target")
+def target_fixture():
+    engine = _engine()
+    with Session(engine) as session:
+        # Occupy the low ids so imported comments get different ones
+        for i in range(3):
+            create_comment(session, CommentCreate(content=f"Existing {i}"), user_id=1)
+    return engine
+
+
+def test_export_comments(source):
+    with Session(source) as session:
+        lines = list(export_comments(session, batch_size=3))
+
+    records = [json.loads(line) for line in lines]
+    assert [r["id"] for r in records] == [1, 2, 3, 4]
+    assert records[1]["parent_id"] == 1
+    assert records[1]["username"] == "bob"
+    assert all(line.endswith("\n") for line in lines)
+
+
+def test_import_remaps_parent_ids(source, target):
+    with Session(source) as session:
+        lines = list(export_comments(session))
+
+    progress = []
+    with target.connect() as conn:
+        result = import_comments(
+            conn, lines, batch_size=2, progress=lambda r: progress.append(r.imported)
+        )
+
+    assert (result.imported, result.skipped, result.invalid) == (4, 0, 0)
+    assert progress == [2, 4]
+    with Session(target) as session:
+        root = session.exec(select(Comment).where(Comment.content == "Root")).one()
+        tree = get_comment(session, root.id)
+        reply = tree.children[0]
+        assert root.id == 4
+        assert (reply.content, reply.user_id, reply.depth) == ("Reply", 2, 1)
+        assert reply.children[0].content == "Nested"
+        assert reply.children[0].path == f"{root.id:010d}/{reply.id:010d}/{reply.children[0].id:010d}/"
+        assert (root.reply_count, root.descendant_count) == (1, 2)
+        assert root.last_activity_at == reply.children[0].created_at
+        assert (reply.reply_count, reply.descendant_count) == (1, 1)
+        # Existing comments are left alone
+        assert get_comment(session, 1).descendant_count == 0
+
+
+def test_import_skips_unknown_users_and_orphans(target):
+    lines = [
+        json.dumps({"id": 1, "parent_id": 0, "username": "nobody", "content": "x", "created_at": "2024-01-01T00:00:00"}),
+        json.dumps({"id": 2, "parent_id": 1, "username": "alice", "content": "y", "created_at": "2024-01-01T00:00:00"}),
+        json.dumps({"id": 3, "parent_id": 0, "username": "alice", "content": "z", "created_at": "2024-01-01T00:00:00"}),
+        "not json",
+        "",
+    ]
+    with target.connect() as conn:
+        result = import_comments(conn, lines)
+
+    assert (result.imported, result.skipped, result.invalid) == (1, 2, 1)
+
+
+def test_import_counts_repeated_ids_as_invalid(target):
+    def line(comment_id, parent_id=0):
+        return json.dumps({"id": comment_id, "parent_id": parent_id, "username": "alice",
+                           "content": "x", "created_at": "2024-01-01T00:00:00"})
+
+    lines = [line(1), line(2, 1), line(1), line(2), line(3, 2)]
+    with target.connect() as conn:
+        # The repeats land in the same batch as the original and in a later one
+        result = import_comments(conn, lines, batch_size=3)
+
+    assert (result.imported, result.skipped, result.invalid) == (3, 0, 2)
@@ -0,0 +1,150 @@
+"""Unit tests for core/compression.py"""
+import gzip
+import zlib
+
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import Response, StreamingResponse
+from fastapi.testclient import TestClient
+
+from app.core.compression import (COMPRESSORS, CompressionMiddleware,
+                                  brotli, parse_content_type_rules)
+
+BIG_JSON = b'[' + b','.join(b'{"user":{"username":"alice"},"content":"hi"}' for _ in range(200)) + b']'
+
+
+def make_client(**options) -> TestClient:
+    app = FastAPI()
+
+    @app.get("/big")
+    async def big():
+        return Response(BIG_JSON, media_type="application/json")
+
+    @app.get("/small")
+    async def small():
+        return Response(b'{"ok":true}', media_type="application/json")
+
+    @app.get("/image")
+    async def image():
+        return Response(b"\x89PNG" * 1000, media_type="image/png")
+
+    @app.get("/encoded")
+    async def encoded():
+        return Response(gzip.compress(BIG_JSON), media_type="application/json", headers={"Content-Encoding": "gzip"})
+
+    @app.get("/stream")
+    async def stream(lines: int = 500):
+        async def body():
+            for i in range(lines):
+                yield b'{"id":%d,"user":{"username":"alice"}}\n' % i
+
+        return StreamingResponse(body(), media_type="application/x-ndjson")
+
+    options.setdefault("content_types", "application/json,application/x-ndjson")
+    options.setdefault("encodings", ("gzip",))
+    app.add_middleware(CompressionMiddleware, **options)
+    return TestClient(app)
+
+
+def test_parse_content_type_rules():
+    assert parse_content_type_rules("application/json, Text/*=2,") == {
+        "application/json": None,
+        "text/*": 2,
+    }
+
+
+def test_compresses_large_json():
+    response = make_client().get("/big", headers={"Accept-Encoding": "gzip"})
+
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert int(response.headers["content-length"]) < len(BIG_JSON) / 5
+    assert response.content == BIG_JSON
+
+
+@pytest.mark.parametrize("path, accept", [
+    ("/big", "identity"),
+    ("/small", "gzip"),
+    ("/image", "gzip"),
+])
+def test_skips_ineligible_responses(path, accept):
+    response = make_client().get(path, headers={"Accept-Encoding": accept})
+
+    assert "content-encoding" not in response.headers
+    assert int(response.headers["content-length"]) == len(response.content)
+
+
+def test_leaves_encoded_responses_alone():
+    client = make_client()
+    response = client.get("/encoded", headers={"Accept-Encoding": "gzip"})
+
+    # The client decodes once; compressing again would leave gzip bytes
+    assert response.content == BIG_JSON
+
+
+def test_streaming_response_is_compressed_incrementally():
+    response = make_client().get("/stream", headers={"Accept-Encoding": "gzip"})
+
+    assert response.headers["content-encoding"] == "gzip"
+    assert "content-length" not in response.headers
+    assert response.text.splitlines()[-1] == '{"id":499,"user":{"username":"alice"}}'
+
+
+def test_short_stream_is_sent_as_is():
+    response = make_client().get("/stream?lines=3", headers={"Accept-Encoding": "gzip"})
+
+    assert "content-encoding" not in response.headers
+    assert len(response.text.splitlines()) == 3
+
+
+def test_rule_level_overrides_default():
+    client = make_client(level=9, content_types="application/json=1")
+    fast = client.get("/big", headers={"Accept-Encoding": "gzip"})
+    best = make_client(level=9).get("/big", headers={"Accept-Encoding": "gzip"})
+
+    assert int(fast.headers["content-length"]) > int(best.headers["content-length"])
+
+
+@pytest.mark.skipif("br" not in COMPRESSORS, reason="brotli is not installed")
+def test_prefers_first_configured_encoding():
+    client = make_client(encodings=("br", "gzip"))
+
+    assert client.get("/big", headers={"Accept-Encoding": "gzip, br"}).headers["content-encoding"] == "br"
+    assert client.get("/big", headers={"Accept-Encoding": "gzip"}).headers["content-encoding"] == "gzip"
+    streamed = client.get("/stream", headers={"Accept-Encoding": "br"})
+    assert streamed.headers["content-encoding"] == "br"
+    assert len(streamed.text.splitlines()) == 500
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("encoding", sorted(COMPRESSORS))
+async def test_every_streamed_chunk_is_flushed(encoding):
+    lines = [b'{"id":%d,"user":{"username":"alice"}}\n' % i for i in range(100)]
+
+    async def app(scope, receive, send):
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [(b"content-type", b"application/x-ndjson")],
+        })
+        for line in lines:
+            await send({"type": "http.response.body", "body": line, "more_body": True})
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "headers": [(b"accept-encoding", encoding.encode())]}
+    await CompressionMiddleware(app, min_size=100, encodings=(encoding,),
+                                content_types="application/x-ndjson")(scope, None, send)
+
+    decompressor = zlib.decompressobj(31) if encoding == "gzip" else brotli.Decompressor()
+    decompress = decompressor.decompress if encoding == "gzip" else decompressor.process
+    received = b""
+    for message in sent[1:-1]:
+        assert message["more_body"]
+        received += decompress(message["body"])
+    # Everything yielded so far arrived before the end of the stream
+    assert received == b"".join(lines)
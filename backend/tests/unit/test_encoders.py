@@ -0,0 +1,85 @@
+"""Unit tests for utils/encoders.py"""
+import json
+from datetime import datetime
+
+from app.database.models.comment import (Comment, CommentFlatResponse,
+                                         CommentResponse)
+from app.database.models.user import User
+from app.utils.encoders import (comment_flat_dicts, comment_tree_dicts,
+                                dumps)
+
+
+def _comment(comment_id, parent=None, user=None, created_at=None):
+    comment = Comment(
+        id=comment_id,
+        content=f"Comment {comment_id}",
+        user_id=user.id if user else 1,
+        parent_id=parent.id if parent else 0,
+        depth=parent.depth + 1 if parent else 0,
+        created_at=created_at or datetime(2024, 5, 1, 12, 30, 15, 123456),
+    )
+    comment.user = user
+    comment.children = []
+    if parent is not None:
+        parent.children.append(comment)
+    return comment
+
+
+def test_tree_matches_response_model():
+    """The fast path must produce exactly what response_model would"""
+    alice = User(id=1, username="alice", email="alice@example.com", hashed_password="x")
+    bob = User(id=2, username="bob", email="bob@example.com", hashed_password="x")
+    root = _comment(1, user=alice, created_at=datetime(2024, 5, 1, 12, 0))
+    reply = _comment(2, root, bob)
+    _comment(3, reply, alice)
+    _comment(4, root, alice)
+
+    expected = [json.loads(CommentResponse.model_validate(root).model_dump_json())]
+    assert json.loads(dumps(comment_tree_dicts([root]))) == expected
+
+    flat = [json.loads(CommentFlatResponse.model_validate(c).model_dump_json()) for c in (root, reply)]
+    assert json.loads(dumps(comment_flat_dicts([root, reply]))) == flat
+
+
+def test_deep_tree_does_not_recurse():
+    user = User(id=1, username="alice", email="alice@example.com", hashed_password="x")
+    root = comment = _comment(1, user=user)
+    for comment_id in range(2, 5002):
+        comment = _comment(comment_id, comment, user)
+
+    node = comment_tree_dicts([root])[0]
+    depth = 0
+    while node["children"]:
+        node = node["children"][0]
+        depth += 1
+    assert depth == 5000
+    assert dumps(node).startswith(b'{"content":"Comment 5001"')
+
+
+def test_dumps_falls_back_past_orjson_nesting_limit():
+    user = User(id=1, username="alice", email="alice@example.com", hashed_password="x")
+    root = comment = _comment(1, user=user)
+    for comment_id in range(2, 302):
+        comment = _comment(comment_id, comment, user)
+
+    tree = comment_tree_dicts([root])
+    deepest = tree[0]
+    while deepest["children"]:
+        deepest = deepest["children"][0]
+    deepest["extra"] = [1, 2.5, None, True, "é", {"a": []}, ()]
+
+    expected = json.dumps(
+        tree, default=datetime.isoformat, ensure_ascii=False, separators=(",", ":")
+    )
+    assert dumps(tree).decode() == expected
+
+
+def test_dumps_encodes_threads_of_any_depth():
+    user = User(id=1, username="alice", email="alice@example.com", hashed_password="x")
+    root = comment = _comment(1, user=user)
+    for comment_id in range(2, 5002):
+        comment = _comment(comment_id, comment, user)
+
+    encoded = dumps(comment_tree_dicts([root]))
+    assert encoded.count(b'"children":[') == 5001
+    assert encoded.endswith(b"[]" + b"}]" * 5001)
@@ -0,0 +1,10 @@
+"""Unit tests for utils/http.py"""
+from app.utils.http import accepted_encodings
+
+
+def test_accepted_encodings():
+    assert accepted_encodings("gzip, deflate, br;q=0.5") == {"gzip", "deflate", "br"}
+    assert accepted_encodings("br;q=0, gzip") == {"gzip"}
+    assert accepted_encodings("") == set()
+    assert {"br", "gzip"} <= accepted_encodings("*")
+    assert accepted_encodings("gzip;q=0, *") == {"*", "br"}
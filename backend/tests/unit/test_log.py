@@ -0,0 +1,95 @@
+"""Unit tests for utils/log.py"""
+import io
+import json
+import logging
+import queue
+import sys
+import threading
+
+from app.utils.log import (AccessLogSampler, JSONFormatter, LogWriter,
+                           QueueingHandler)
+
+
+def _access_record(status_code: int) -> logging.LogRecord:
+    return logging.LogRecord(
+        "uvicorn.access", logging.INFO, __file__, 1, '%s - "%s %s HTTP/%s" %d',
+        ("127.0.0.1:5000", "GET", "/api/v1/comments/", "1.1", status_code), None,
+    )
+
+
+def test_json_formatter_access_fields():
+    entry = json.loads(JSONFormatter().format(_access_record(200)))
+
+    assert entry["message"] == '127.0.0.1:5000 - "GET /api/v1/comments/ HTTP/1.1" 200'
+    assert (entry["method"], entry["path"], entry["status"]) == ("GET", "/api/v1/comments/", 200)
+    assert entry["level"] == "INFO" and entry["time"].endswith("Z")
+
+
+def test_access_sampler_keeps_errors():
+    sampler = AccessLogSampler(rate=0)
+    assert not sampler.filter(_access_record(200))
+    assert sampler.filter(_access_record(500))
+    assert AccessLogSampler(rate=1).filter(_access_record(200))
+
+
+def test_queueing_handler_writes_in_background_and_counts_drops():
+    stream = io.StringIO()
+    target = logging.StreamHandler(stream)
+    target.setFormatter(logging.Formatter("%(message)s"))
+    log_queue = queue.Queue(maxsize=2)
+    handler = QueueingHandler(log_queue, target)
+    logger = logging.getLogger("tests.log_writer")
+    logger.propagate = False
+    logger.addHandler(handler)
+
+    dropped = QueueingHandler.dropped
+    for i in range(3):
+        logger.warning("line %d", i)
+    assert QueueingHandler.dropped == dropped + 1
+
+    writer = LogWriter(log_queue, target)
+    writer.start()
+    writer.stop()
+    logger.removeHandler(handler)
+    assert stream.getvalue().splitlines() == ["line 0", "line 1"]
+
+
+def test_queued_records_do_not_change_or_hold_tracebacks():
+    log_queue = queue.Queue()
+    handler = QueueingHandler(log_queue, logging.StreamHandler(io.StringIO()))
+    tags = ["a"]
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        record = logging.LogRecord("app", logging.ERROR, __file__, 1, "tags %s", (tags,), sys.exc_info())
+    handler.handle(record)
+    handler.handle(_access_record(200))
+    tags.append("b")
+
+    _, queued = log_queue.get_nowait()
+    assert (queued.getMessage(), queued.args, queued.exc_info) == ("tags ['a']", None, None)
+    assert "ValueError: boom" in queued.exc_text
+    assert record.exc_info is not None
+    # Plain arguments are kept for the access formatter
+    _, access = log_queue.get_nowait()
+    assert access.args[4] == 200
+
+
+def test_log_writer_stop_gives_up_on_a_stuck_writer():
+    release = threading.Event()
+
+    class StuckHandler(logging.Handler):
+        def emit(self, record):
+            release.wait()
+
+    target = StuckHandler()
+    log_queue = queue.Queue(maxsize=1)
+    writer = LogWriter(log_queue, target)
+    writer.stop_timeout = 0.1
+    writer.start()
+    log_queue.put((target, _access_record(200)))
+    log_queue.put((target, _access_record(200)))
+    try:
+        writer.stop()
+    finally:
+        release.set()
@@ -0,0 +1,25 @@
+"""Unit tests for the application factory in main.py"""
+import app.main as main
+
+
+def test_fastapp_is_built_on_first_access(monkeypatch):
+    existing = vars(main).pop("fastapp", None)
+    calls = []
+    monkeypatch.setattr(main, "create_app", lambda: calls.append(1) or "app")
+    try:
+        assert main.fastapp == "app"
+        assert main.fastapp == "app"
+        assert calls == [1]
+    finally:
+        vars(main).pop("fastapp", None)
+        if existing is not None:
+            main.fastapp = existing
+
+
+def test_openapi_schema_is_cached():
+    app = main.create_app()
+    body = main.openapi_body(app)
+
+    assert body.startswith(b'{"openapi"')
+    assert main.openapi_body(app) is body
+    assert "create_app" in main.startup_timings
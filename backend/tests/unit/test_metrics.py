@@ -0,0 +1,65 @@
+"""Unit tests for core/metrics.py"""
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+
+from app.core.metrics import (LATENCY_BUCKETS, MetricsMiddleware,
+                              MetricsRegistry, instrument_engine)
+
+
+def _registry() -> MetricsRegistry:
+    registry = MetricsRegistry()
+    registry.counter("http_requests_total", "Requests")
+    registry.gauge("http_requests_in_flight", "In flight")
+    for name in (
+        "http_request_duration_seconds",
+        "http_response_size_bytes",
+        "db_statements_per_request",
+        "db_duration_seconds_per_request",
+    ):
+        registry.histogram(name, "Histogram", LATENCY_BUCKETS)
+    return registry
+
+
+def test_render_histogram():
+    registry = MetricsRegistry()
+    registry.histogram("latency_seconds", "Latency", (0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        registry.observe("latency_seconds", value, (("route", '/a"b'),))
+    registry.gauge("queue_depth", "Depth", lambda: 7)
+
+    lines = registry.render().splitlines()
+    assert "# TYPE latency_seconds histogram" in lines
+    assert 'latency_seconds_bucket{route="/a\\"b",le="0.1"} 2' in lines
+    assert 'latency_seconds_bucket{route="/a\\"b",le="1.0"} 3' in lines
+    assert 'latency_seconds_bucket{route="/a\\"b",le="+Inf"} 4' in lines
+    assert 'latency_seconds_count{route="/a\\"b"} 4' in lines
+    assert "queue_depth 7" in lines
+
+
+def test_middleware_records_route_status_and_sql():
+    engine = create_engine("sqlite://")
+    instrument_engine(engine)
+    registry = _registry()
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware, registry=registry)
+
+    @app.get("/items/{item_id}")
+    def read_item(item_id: int):
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+            conn.execute(text("SELECT 2"))
+        return {"id": item_id}
+
+    client = TestClient(app)
+    client.get("/items/1")
+    client.get("/items/2")
+    client.get("/random/path")
+
+    lines = registry.render().splitlines()
+    route = 'method="GET",route="/items/{item_id}"'
+    assert f'http_requests_total{{{route},status="200"}} 2' in lines
+    assert 'http_requests_total{method="GET",route="unmatched",status="404"} 1' in lines
+    assert f"db_statements_per_request_sum{{{route}}} 4.0" in lines
+    assert f"http_response_size_bytes_sum{{{route}}} 16.0" in lines
+    assert "http_requests_in_flight 0" in lines
@@ -0,0 +1,67 @@
+"""Unit tests for core/profiler.py and the query budgets of hot paths"""
+import pytest
+from sqlmodel import Session, create_engine, select
+from sqlmodel.pool import StaticPool
+
+from app.core.profiler import fingerprint, parameter_shape, profile_queries
+from app.core.security import authenticate_user, get_password_hash
+from app.database.models.comment import Comment, CommentCreate
+from app.database.models.user import User
+from app.services.comment_service import (create_comment, get_comment,
+                                          get_comments_tree)
+from app.utils.encoders import comment_tree_dicts
+
+
+@pytest.fixture(name="engine")
+def engine_fixture():
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    Comment.metadata.create_all(engine)
+    with Session(engine) as session:
+        session.add(User(username="alice", email="alice@example.com", hashed_password=get_password_hash("Secret1!")))
+        session.add(User(username="bob", email="bob@example.com", hashed_password="x"))
+        session.commit()
+        for i in range(5):
+            root = create_comment(session, CommentCreate(content=f"Root {i}"), user_id=1)
+            reply = create_comment(session, CommentCreate(content="Reply", parent_id=root.id), user_id=2)
+            create_comment(session, CommentCreate(content="Nested", parent_id=reply.id), user_id=1)
+    return engine
+
+
+def test_fingerprint_normalizes_values():
+    assert fingerprint("SELECT * FROM comment WHERE id = 5 AND content = 'it''s'") == (
+        "SELECT * FROM comment WHERE id = ? AND content = ?"
+    )
+    assert fingerprint("SELECT id FROM t_1 WHERE id IN (?, ?,\n ?)") == fingerprint(
+        "SELECT id FROM t_1 WHERE id IN (?)"
+    )
+    assert parameter_shape((1, "a", None)) == "(int, str, NoneType)"
+    assert parameter_shape([(1,), (2,)], executemany=True) == "2 x (int)"
+
+
+def test_lazy_loading_is_flagged_as_repeated(engine):
+    with Session(engine) as session, profile_queries(engine) as profile:
+        for comment in session.exec(select(Comment)).all():
+            comment.user.username
+
+    # One SELECT per distinct author after the first query
+    [(fp, count)] = profile.repeated(2)
+    assert "FROM user" in fp and count == 2
+    with pytest.raises(AssertionError, match="N\\+1"):
+        profile.assert_budget(10, max_repeats=1)
+
+
+def test_get_comments_tree_budget(engine, query_budget):
+    with Session(engine) as session, query_budget(engine, max_statements=1):
+        comment_tree_dicts(get_comments_tree(session, limit=3))
+
+
+def test_get_comment_budget(engine, query_budget):
+    with Session(engine) as session, query_budget(engine, max_statements=1):
+        comment_tree_dicts([get_comment(session, 1)])
+
+
+def test_authenticate_user_budget(engine, query_budget):
+    with Session(engine) as session, query_budget(engine, max_statements=1):
+        assert authenticate_user(session, "alice", "Secret1!") is not None
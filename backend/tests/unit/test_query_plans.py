@@ -0,0 +1,159 @@
+"""Query plan regression tests
+
+Every statement issued by comment_service, user_service and the auth
+helpers is captured and run through EXPLAIN QUERY PLAN. A plan that scans a
+whole table instead of searching an index fails the test, so index coverage
+keeps up as queries change.
+"""
+import re
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import Session, SQLModel, create_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.security import (authenticate_user, authenticate_user_async,
+                               create_access_token, get_current_user,
+                               principal_cache)
+from app.database.models.comment import Comment, CommentCreate
+from app.database.models.user import UserCreate
+from app.services.comment_service import (create_comment, get_ancestors,
+                                          get_comment, get_comments_page,
+                                          get_root_paths_page_async,
+                                          get_user_comments_page,
+                                          stream_comment_subtrees)
+from app.services.user_service import (create_user, create_user_async,
+                                       get_user_by_email,
+                                       get_user_by_email_async,
+                                       get_user_by_username,
+                                       get_user_by_username_async)
+
+TABLES = set(SQLModel.metadata.tables)
+
+
+@contextmanager
+def captured_statements(engine):
+    """Collect (statement, parameters) for every single execute on `engine`"""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if not executemany:
+            statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+def full_scans(engine, statements):
+    """Return the plan lines of `statements` that scan a whole table"""
+    problems = []
+    with engine.connect() as conn:
+        for statement, parameters in statements:
+            if not statement.lstrip().upper().startswith(("SELECT", "WITH", "UPDATE", "DELETE")):
+                continue
+            plan = conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters).all()
+            for *_, detail in plan:
+                match = re.match(r"SCAN (\w+)", detail)
+                # Aliases show up as e.g. comment_1
+                if match and re.sub(r"_\d+$", "", match.group(1)) in TABLES:
+                    problems.append(f"{detail}\n    in: {' '.join(statement.split())}")
+    return problems
+
+
+@pytest.fixture(name="db_url")
+def db_url_fixture(tmp_path):
+    url = f"sqlite:///{tmp_path / 'plans.db'}"
+    engine = create_engine(url)
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        user = create_user(
+            session, UserCreate(username="planuser", email="plan@example.com", password="Fakepass0o!")
+        )
+        for i in range(20):
+            root = create_comment(session, CommentCreate(content=f"Root {i}"), user.id)
+            reply = create_comment(session, CommentCreate(content="Reply", parent_id=root.id), user.id)
+            create_comment(session, CommentCreate(content="Nested", parent_id=reply.id), user.id)
+    engine.dispose()
+    return url
+
+
+@pytest.fixture(name="engine")
+def engine_fixture(db_url):
+    engine = create_engine(db_url)
+    yield engine
+    engine.dispose()
+
+
+def test_comment_service_plans(engine):
+    with captured_statements(engine) as statements, Session(engine) as session:
+        create_comment(session, CommentCreate(content="Another root"), user_id=1)
+        create_comment(session, CommentCreate(content="Another reply", parent_id=2), user_id=1)
+        page, cursor = get_comments_page(session, limit=5)
+        get_comments_page(session, limit=5, cursor=cursor)
+        get_comment(session, 1)
+        get_comment(session, 1, max_depth=1)
+        history, cursor = get_user_comments_page(session, 1, limit=5)
+        get_user_comments_page(session, 1, limit=5, cursor=cursor)
+        session.expunge_all()
+        get_ancestors(session, 3)
+
+    assert statements
+    assert full_scans(engine, statements) == []
+
+
+def test_user_service_plans(engine):
+    with captured_statements(engine) as statements, Session(engine) as session:
+        create_user(session, UserCreate(username="otheruser", email="other@example.com", password="Fakepass0o!"))
+        get_user_by_username(session, "planuser")
+        get_user_by_email(session, "plan@example.com")
+        authenticate_user(session, "plan@example.com", "Fakepass0o!")
+
+    assert statements
+    assert full_scans(engine, statements) == []
+
+
+@pytest.mark.anyio
+async def test_async_user_and_auth_plans(engine, db_url):
+    principal_cache.clear()
+    async_engine = create_async_engine(db_url.replace("sqlite://", "sqlite+aiosqlite://"))
+    with captured_statements(async_engine.sync_engine) as statements:
+        async with AsyncSession(async_engine) as session:
+            await create_user_async(
+                session, UserCreate(username="asyncuser", email="async@example.com", password="Fakepass0o!")
+            )
+            await get_user_by_username_async(session, "planuser")
+            await get_user_by_email_async(session, "plan@example.com")
+            await authenticate_user_async(session, "planuser", "Fakepass0o!")
+            await get_current_user(create_access_token({"sub": "planuser"}), session)
+    await async_engine.dispose()
+
+    assert statements
+    assert full_scans(engine, statements) == []
+
+
+@pytest.mark.anyio
+async def test_async_comment_stream_plans(engine, db_url):
+    async_engine = create_async_engine(db_url.replace("sqlite://", "sqlite+aiosqlite://"))
+    with captured_statements(async_engine.sync_engine) as statements:
+        async with AsyncSession(async_engine) as session:
+            root_paths, cursor = await get_root_paths_page_async(session, limit=5)
+            await get_root_paths_page_async(session, limit=5, cursor=cursor)
+            async for _ in stream_comment_subtrees(session, root_paths):
+                pass
+    await async_engine.dispose()
+
+    assert statements
+    assert full_scans(engine, statements) == []
+
+
+def test_full_scan_is_detected(engine):
+    """The checker itself must flag a query that cannot use an index"""
+    with captured_statements(engine) as statements, Session(engine) as session:
+        session.query(Comment).filter(Comment.content == "Root 1").all()
+
+    assert full_scans(engine, statements)
@@ -0,0 +1,95 @@
+"""Unit tests for core/rate_limit.py"""
+import pytest
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+
+from app.core import rate_limit
+from app.core.rate_limit import TokenBucketLimiter, limit_by_ip, parse_rate
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(rate_limit.time, "monotonic", fake)
+    return fake
+
+
+def test_parse_rate():
+    assert parse_rate("10/minute") == (10, 60.0)
+    assert parse_rate("") is None
+    for invalid in ("10", "ten/minute", "0/second", "5/fortnight"):
+        with pytest.raises(ValueError):
+            parse_rate(invalid)
+
+
+def test_bucket_allows_burst_then_refills(clock):
+    limiter = TokenBucketLimiter(capacity=3, period=60)
+
+    assert [limiter.acquire("a") for _ in range(3)] == [0, 0, 0]
+    assert limiter.acquire("a") == pytest.approx(20)
+    assert limiter.acquire("b") == 0  # Keys are independent
+
+    clock.now += 20
+    assert limiter.acquire("a") == 0
+    assert limiter.acquire("a") == pytest.approx(20)
+    assert limiter.rejected == 2
+
+
+def test_bucket_never_exceeds_capacity(clock):
+    limiter = TokenBucketLimiter(capacity=2, period=1)
+    limiter.acquire("a")
+
+    clock.now += 3600
+    assert [limiter.acquire("a") for _ in range(3)][-1] > 0
+
+
+def test_keys_are_bounded_lru(clock):
+    limiter = TokenBucketLimiter(capacity=1, period=60, max_keys=2)
+    limiter.acquire("a")
+    limiter.acquire("b")
+    limiter.acquire("a")  # Rejected, and now the most recently used
+    limiter.acquire("c")
+
+    assert len(limiter) == 2
+    assert limiter.acquire("a") > 0  # Still limited
+    assert limiter.acquire("b") == 0  # Evicted, starts with a full bucket
+
+
+def test_dependency_returns_429_with_retry_after(clock):
+    app = FastAPI()
+
+    @app.post("/login", dependencies=[Depends(limit_by_ip("test_login", "2/minute"))])
+    async def login():
+        return {"ok": True}
+
+    client = TestClient(app)
+    try:
+        assert client.post("/login").status_code == 200
+        assert client.post("/login").status_code == 200
+        response = client.post("/login")
+
+        assert response.status_code == 429
+        assert response.headers["retry-after"] == "30"
+    finally:
+        rate_limit.limiters.pop("test_login", None)
+
+
+def test_disabled_limits_are_not_enforced(monkeypatch):
+    monkeypatch.setattr(rate_limit.settings, "RATE_LIMIT_ENABLED", False)
+    app = FastAPI()
+
+    @app.post("/login", dependencies=[Depends(limit_by_ip("test_disabled", "1/hour"))])
+    async def login():
+        return {"ok": True}
+
+    client = TestClient(app)
+    assert [client.post("/login").status_code for _ in range(3)] == [200, 200, 200]
+    assert "test_disabled" not in rate_limit.limiters
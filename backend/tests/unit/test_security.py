@@ -0,0 +1,69 @@
+"""Unit tests for password hashing in core/security.py"""
+import pytest
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import Session, create_engine, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlmodel.pool import StaticPool
+
+from app.core import security
+from app.core.security import (authenticate_user, authenticate_user_async,
+                               make_password_context)
+from app.database.models.comment import Comment  # noqa: F401 (maps User.comments)
+from app.database.models.user import User
+
+
+def rounds_of(hashed_password: str) -> int:
+    return int(hashed_password.split("$")[2])
+
+
+@pytest.fixture
+def cost(monkeypatch):
+    """Hash with 4 rounds from here on, as if BCRYPT_ROUNDS were lowered"""
+    old = make_password_context(5).hash("Secret1!")
+    monkeypatch.setattr(security, "pwd_context", make_password_context(4))
+    return old
+
+
+def test_context_flags_other_costs_in_both_directions():
+    context = make_password_context(5)
+
+    assert not context.needs_update(context.hash("pw"))
+    assert context.needs_update(make_password_context(4).hash("pw"))
+    assert context.needs_update(make_password_context(6).hash("pw"))
+
+
+def test_login_rehashes_password_with_another_cost(cost):
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    User.metadata.create_all(engine)
+    with Session(engine) as session:
+        session.add(User(username="alice", email="alice@example.com", hashed_password=cost))
+        session.commit()
+
+    with Session(engine) as session:
+        assert authenticate_user(session, "alice", "wrong") is None
+        assert rounds_of(session.exec(select(User)).one().hashed_password) == 5
+
+        assert authenticate_user(session, "alice", "Secret1!") is not None
+    with Session(engine) as session:
+        stored = session.exec(select(User)).one().hashed_password
+    assert rounds_of(stored) == 4
+    assert security.verify_password("Secret1!", stored)
+
+
+@pytest.mark.anyio
+async def test_async_login_rehashes_password(cost):
+    engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+    async with engine.begin() as conn:
+        await conn.run_sync(User.metadata.create_all)
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        session.add(User(username="alice", email="alice@example.com", hashed_password=cost))
+        await session.commit()
+
+        user = await authenticate_user_async(session, "alice@example.com", "Secret1!")
+        assert rounds_of(user.hashed_password) == 4
+
+        # Already at the configured cost: nothing to write
+        before = user.hashed_password
+        await authenticate_user_async(session, "alice", "Secret1!")
+        assert user.hashed_password == before
+    await engine.dispose()
@@ -0,0 +1,58 @@
+"""Unit tests for the production launcher in server.py"""
+import asyncio
+import signal
+
+import pytest
+
+from app import server
+from app.core.config import settings
+
+
+def test_worker_count_defaults_to_cpu_count(monkeypatch):
+    monkeypatch.setattr(server.os, "cpu_count", lambda: 6)
+
+    assert server.worker_count(3) == 3
+    assert server.worker_count(0) == 6
+
+
+def test_server_options_come_from_settings(monkeypatch):
+    monkeypatch.setattr(settings, "SERVER_WORKERS", 4)
+    monkeypatch.setattr(settings, "SERVER_MAX_REQUESTS", 0)
+    monkeypatch.setattr(settings, "SERVER_MAX_REQUESTS_JITTER", 50)
+
+    options = server.server_options()
+
+    assert options["workers"] == 4
+    assert options["limit_max_requests"] is None
+    assert options["limit_max_requests_jitter"] == 50
+    assert options["backlog"] == settings.SERVER_BACKLOG
+    assert options["timeout_graceful_shutdown"] == settings.SERVER_GRACEFUL_TIMEOUT_SECONDS
+
+
+@pytest.mark.anyio
+async def test_shutdown_signal_runs_callback_and_server_handler():
+    received, drained = [], []
+    original = signal.signal(signal.SIGTERM, lambda sig, frame: received.append(sig))
+    try:
+        restore = server.on_shutdown_signal(lambda: drained.append(True))
+        signal.raise_signal(signal.SIGTERM)
+        await asyncio.sleep(0)
+
+        assert received == [signal.SIGTERM]
+        assert drained == [True]
+
+        restore()
+        signal.raise_signal(signal.SIGTERM)
+        await asyncio.sleep(0)
+        assert drained == [True]
+    finally:
+        signal.signal(signal.SIGTERM, original)
+
+
+@pytest.mark.anyio
+async def test_shutdown_signal_leaves_default_handlers_alone():
+    assert signal.getsignal(signal.SIGINT) is signal.default_int_handler
+
+    server.on_shutdown_signal(lambda: None)
+
+    assert signal.getsignal(signal.SIGINT) is signal.default_int_handler
@@ -0,0 +1,35 @@
+"""Unit tests for database/session.py"""
+import pytest
+from sqlalchemy import text
+
+from app.database.session import (create_async_db_engine, create_db_engine,
+                                  engine_options, get_async_database_url)
+
+
+def test_get_async_database_url():
+    assert get_async_database_url("sqlite:///./app.db") == "sqlite+aiosqlite:///./app.db"
+    assert get_async_database_url("postgresql://u:p@db/app") == "postgresql+asyncpg://u:p@db/app"
+    assert get_async_database_url("sqlite+aiosqlite://") == "sqlite+aiosqlite://"
+
+
+def test_engine_options_pool_sizing():
+    assert "pool_size" in engine_options("sqlite:///./app.db")
+    assert "pool_size" not in engine_options("sqlite://")
+
+
+def test_sqlite_pragmas_applied(tmp_path):
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'app.db'}")
+    with engine.connect() as conn:
+        assert conn.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        assert conn.execute(text("PRAGMA synchronous")).scalar() == 1  # NORMAL
+        assert conn.execute(text("PRAGMA busy_timeout")).scalar() == 5000
+    engine.dispose()
+
+
+@pytest.mark.anyio
+async def test_sqlite_pragmas_applied_async(tmp_path):
+    engine = create_async_db_engine(f"sqlite+aiosqlite:///{tmp_path / 'app.db'}")
+    async with engine.connect() as conn:
+        assert (await conn.execute(text("PRAGMA journal_mode"))).scalar() == "wal"
+        assert (await conn.execute(text("PRAGMA busy_timeout"))).scalar() == 5000
+    await engine.dispose()
@@ -0,0 +1,144 @@
+"""Unit tests for utils/static.py"""
+import gzip
+import os
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.utils.static import (IMMUTABLE_CACHE_CONTROL, PrecompressedStaticFiles,
+                              brotli, precompress_directory)
+
+SCRIPT = b"console.log('hello');\n" * 200
+
+
+@pytest.fixture
+def static_dir(tmp_path):
+    (tmp_path / "_next" / "static").mkdir(parents=True)
+    (tmp_path / "_next" / "static" / "app-1234.js").write_bytes(SCRIPT)
+    (tmp_path / "index.html").write_bytes(b"<html>" + b"<p>hi</p>" * 200 + b"</html>")
+    (tmp_path / "logo.png").write_bytes(b"\x89PNG" * 500)
+    (tmp_path / "small.css").write_bytes(b"a{}")
+    return tmp_path
+
+
+@pytest.fixture
+def client(static_dir):
+    app = FastAPI()
+    app.mount("/static", PrecompressedStaticFiles(directory=str(static_dir), html=True), name="static")
+    return TestClient(app)
+
+
+def test_precompress_directory_skips_binary_small_and_current_files(static_dir):
+    per_file = 2 if brotli else 1
+
+    assert precompress_directory(str(static_dir)) == (2 * per_file, 0)
+    assert gzip.decompress((static_dir / "_next/static/app-1234.js.gz").read_bytes()) == SCRIPT
+    assert not (static_dir / "logo.png.gz").exists()
+    assert not (static_dir / "small.css.gz").exists()
+    assert precompress_directory(str(static_dir)) == (0, 2 * per_file)
+
+
+def test_precompress_directory_replaces_variants_atomically(static_dir, monkeypatch):
+    variant = static_dir / "index.html.gz"
+    variant.write_bytes(b"old")
+    os.utime(variant, (0, 0))
+
+    def fail(src, dst):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(os, "replace", fail)
+    with pytest.raises(OSError):
+        precompress_directory(str(static_dir))
+
+    # The old variant is untouched and no temporary file is left behind
+    assert variant.read_bytes() == b"old"
+    assert not [p for p in static_dir.rglob("*") if p.suffix == ".tmp"]
+
+def test_serves_gzip_variant_to_clients_that_accept_it(static_dir, client):
+    precompress_directory(str(static_dir))
+
+    response = client.get("/static/_next/static/app-1234.js", headers={"Accept-Encoding": "gzip"})
+
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["content-type"].startswith("text/javascript")
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.headers["cache-control"] == IMMUTABLE_CACHE_CONTROL
+    assert response.content == SCRIPT
+
+
+@pytest.mark.skipif(brotli is None, reason="brotli is not installed")
+def test_prefers_brotli(static_dir, client):
+    precompress_directory(str(static_dir))
+
+    response = client.get("/static/index.html", headers={"Accept-Encoding": "gzip, br"})
+
+    assert response.headers["content-encoding"] == "br"
+    assert response.headers["cache-control"] == "no-cache"
+
+
+def test_serves_identity_without_variants_or_accept_encoding(static_dir, client):
+    response = client.get("/static/_next/static/app-1234.js", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+
+    precompress_directory(str(static_dir))
+    response = client.get("/static/_next/static/app-1234.js", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in response.headers
+    assert response.content == SCRIPT
+
+
+def test_stale_variant_is_ignored(static_dir, client):
+    precompress_directory(str(static_dir))
+    source = static_dir / "_next/static/app-1234.js"
+    source.write_bytes(b"changed")
+    stat = source.stat()
+    os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    response = client.get("/static/_next/static/app-1234.js", headers={"Accept-Encoding": "gzip"})
+
+    assert "content-encoding" not in response.headers
+    assert response.content == b"changed"
+
+
+def test_conditional_requests_get_304(static_dir, client):
+    precompress_directory(str(static_dir))
+    headers = {"Accept-Encoding": "gzip"}
+    first = client.get("/static/index.html", headers=headers)
+
+    again = client.get("/static/index.html", headers={**headers, "If-None-Match": first.headers["etag"]})
+    assert again.status_code == 304
+    assert again.content == b""
+
+    # Each representation has its own ETag
+    identity = client.get("/static/index.html", headers={"Accept-Encoding": "identity"})
+    assert identity.headers["etag"] != first.headers["etag"]
+    other = client.get("/static/index.html", headers={"If-None-Match": first.headers["etag"]})
+    assert other.status_code == 200
+
+    since = client.get("/static/index.html", headers={"If-Modified-Since": first.headers["last-modified"]})
+    assert since.status_code == 304
+
+
+def test_small_files_are_served_from_memory(static_dir):
+    files = PrecompressedStaticFiles(directory=str(static_dir), cache_max_file_size=1024)
+    client = TestClient(files)
+
+    assert client.get("/small.css").content == b"a{}"
+    assert len(files.cache._data) == 1
+    assert client.get("/logo.png").status_code == 200
+    assert len(files.cache._data) == 1  # Too large to keep
+
+    # Edits change the cache key, so they are picked up immediately
+    css = static_dir / "small.css"
+    css.write_bytes(b"b{}")
+    stat = css.stat()
+    os.utime(css, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert client.get("/small.css").content == b"b{}"
+
+
+def test_html_mode_serves_index(client):
+    response = client.get("/static/")
+
+    assert response.status_code == 200
+    assert response.content.startswith(b"<html>")
@@ -1,9 +1,15 @@
+import asyncio
+import threading
+
 import pytest
 from fastapi import HTTPException
-from sqlmodel import Session
-from app.database.models.user import User, UserCreate
+from sqlmodel import Session, SQLModel, create_engine
+from app.database.models.comment import Comment  # noqa: F401 - resolves User.comments
+from app.database.models.user import User, UserCreate, UserSnapshot
 from app.services.user_service import create_user
-from app.core.security import get_password_hash, verify_password
+from app.core.security import (PasswordHasher, create_access_token, get_current_user,
+                               get_password_hash, get_password_hash_async, principal_cache,
+                               verify_password, verify_password_async)
 from app.database.models.user import User
 
 
@@ -112,4 +118,107 @@ def test_validate_username(username, expected_error):
         assert str(exc_info.value) == expected_error
     else:
         result = User.validate_username(username)
-        assert result == username
\ No newline at end of file
+        assert result == username
+
+
+@pytest.mark.anyio
+async def test_password_hash_async_roundtrip():
+    hashed = await get_password_hash_async("Fakepass0o!")
+    assert await verify_password_async("Fakepass0o!", hashed)
+    assert not await verify_password_async("Wrongpass0o!", hashed)
+
+
+@pytest.mark.anyio
+async def test_password_hasher_rejects_excess_work():
+    hasher = PasswordHasher("thread", workers=1, max_pending=1)
+    release = threading.Event()
+    busy = asyncio.ensure_future(hasher.run(release.wait))
+    await asyncio.sleep(0)
+
+    with pytest.raises(HTTPException) as exc_info:
+        await hasher.run(get_password_hash, "Fakepass0o!")
+    assert exc_info.value.status_code == 503
+    assert exc_info.value.headers["Retry-After"] == "1"
+
+    release.set()
+    assert await busy
+    hasher.shutdown()
+
+
+@pytest.mark.anyio
+async def test_password_hasher_counts_jobs_of_cancelled_callers():
+    hasher = PasswordHasher("thread", workers=1, max_pending=2)
+    started, release = threading.Event(), threading.Event()
+
+    def hash_slowly():
+        started.set()
+        return release.wait()
+
+    try:
+        running = asyncio.ensure_future(hasher.run(hash_slowly))
+        queued = asyncio.ensure_future(hasher.run(release.wait))
+        await asyncio.get_running_loop().run_in_executor(None, started.wait)
+
+        # The queued job is dropped with its caller; the running one still counts
+        running.cancel()
+        queued.cancel()
+        await asyncio.gather(running, queued, return_exceptions=True)
+        assert hasher.pending == 1
+        busy = asyncio.ensure_future(hasher.run(release.wait))
+        await asyncio.sleep(0)
+        with pytest.raises(HTTPException) as exc_info:
+            await hasher.run(get_password_hash, "Fakepass0o!")
+        assert exc_info.value.status_code == 503
+    finally:
+        release.set()
+    assert await busy
+    assert hasher.pending == 0
+    hasher.shutdown()
+
+
+@pytest.mark.anyio
+async def test_get_current_user_is_cached(mocker):
+    principal_cache.clear()
+    user = User(id=7, username="testuser", email="test@example.com", hashed_password="x")
+    db = mocker.Mock()
+    db.exec = mocker.AsyncMock(return_value=mocker.Mock(**{"first.return_value": user}))
+    token = create_access_token({"sub": "testuser"})
+
+    first = await get_current_user(token, db)
+    second = await get_current_user(token, db)
+
+    assert first.id == second.id == 7
+    assert second.username == "testuser"
+    db.exec.assert_awaited_once()
+
+
+@pytest.mark.anyio
+async def test_get_current_user_rejects_inactive_user(mocker):
+    principal_cache.clear()
+    user = User(id=8, username="sleepy", email="s@example.com", hashed_password="x", is_active=False)
+    db = mocker.Mock()
+    db.exec = mocker.AsyncMock(return_value=mocker.Mock(**{"first.return_value": user}))
+
+    with pytest.raises(HTTPException) as exc_info:
+        await get_current_user(create_access_token({"sub": "sleepy"}), db)
+    assert exc_info.value.status_code == 401
+
+
+def test_user_update_invalidates_cached_principal():
+    principal_cache.clear()
+    engine = create_engine("sqlite://")
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as db:
+        user = User(username="testuser", email="test@example.com", hashed_password="x")
+        db.add(user)
+        db.commit()
+        snapshot = UserSnapshot(id=user.id, username=user.username, email=user.email)
+        principal_cache.set(b"token", ({}, snapshot), group=user.id)
+        principal_cache.set(b"other", ({}, snapshot), group=user.id + 1)
+
+        user.is_active = False
+        db.add(user)
+        db.commit()
+
+    assert principal_cache.get(b"token") is None
+    assert principal_cache.get(b"other") is not None